@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+from typing import Any, Dict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+CASE_DIR = os.path.join(REPO_ROOT, "mahanadi_test_case")
+
+# The simulation modules import each other by bare name, so make the test
+# case folder importable from the benchmark scripts.
+if CASE_DIR not in sys.path:
+    sys.path.insert(0, CASE_DIR)
+
+DEFAULT_WORK_DIR = os.path.join(BENCH_DIR, "work")
+DEFAULT_DB_PATH = os.path.join(BENCH_DIR, "results", "benchmarks.sqlite")
+
+
+def git_commit() -> str:
+    try:
+        sha = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{sha}-dirty" if dirty else sha
+
+
+def base_sections(paths: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+    """Settings skeleton mirroring mahanadi_test_case/settings.toml."""
+    return {
+        "paths": dict(paths),
+        "mesh": {
+            "max_triangle_area_m2": 900.0,
+            "min_angle_deg": 28.0,
+            # Benchmarks must time meshing, and the cache key ignores the area
+            "use_cached_mesh": False,
+        },
+        "dam_release": {
+            "inlet_radius_m": 150.0,
+            "peak_discharge_cumecs": 800.0,
+            "base_discharge_cumecs": 150.0,
+        },
+        "simulation": {
+            "final_time_hours": 1.0,
+            "yieldstep_s": 600.0,
+            "cfl": 1.0,
+            "print_simulation_logs": False,
+        },
+        "initial_conditions": {
+            "initial_water_level_m": 0.0,
+            "friction_mannings_n": 0.035,
+        },
+        "rainfall": {
+            "enable": False,
+            "intensity_mm_hr": 5.0,
+            "dry_minutes": 30.0,
+            "ramp_up_minutes": 5.0,
+            "hold_minutes": 60.0,
+            "taper_minutes": 30.0,
+        },
+        "parallel": {"enable": True, "setup_mode": "full"},
+        "postprocessing": {
+            "generate_timeseries": False,
+            "timeseries_steps": 25,
+            "timeseries_cellsize": 10,
+            "rasterizer": "native",
+            "products": ["max_depth", "max_velocity", "max_hazard", "arrival_time", "inundation_duration"],
+        },
+        "boundary": {
+            "use_polygon_boundary": True,
+            "boundary_type": "transmissive",
+        },
+    }
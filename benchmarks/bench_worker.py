@@ -0,0 +1,80 @@
+"""Single benchmark point: run one settings file and dump timings as JSON.
+
+Launched by run_benchmarks.py, either directly or under ``mpirun``.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+
+import _common  # noqa: F401  (puts mahanadi_test_case on sys.path)
+from settings_loader import load_config
+from simulate import broadcast
+from simulation import peak_rss_mb, run_simulation
+
+
+def _file_size(path: str) -> int:
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("settings", help="settings.toml for this benchmark point")
+    parser.add_argument("result_dir", help="Directory receiving the per-rank JSON files")
+    parser.add_argument("--skip-post", action="store_true", help="Do not time post-processing")
+    parser.add_argument("--run-id", help="Use this run id instead of minting one")
+    args = parser.parse_args()
+
+    from anuga import myid
+
+    # Every rank must use the same run id: rank 0 mints it, as in simulate.py
+    settings_dir = os.path.dirname(os.path.abspath(args.settings))
+    run_id = args.run_id
+    if run_id is None:
+        run_id = broadcast(load_config(args.settings, settings_dir).paths.output_file if myid == 0 else None)
+    cfg = load_config(args.settings, settings_dir, run_id=run_id)
+
+    phases = run_simulation(cfg)
+
+    os.makedirs(args.result_dir, exist_ok=True)
+    result = {
+        "rank": myid,
+        "run_id": cfg.paths.output_file,
+        "phases": phases,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+    if myid == 0:
+        sww_path = os.path.join(cfg.paths.output_dir, f"{cfg.paths.output_file}.sww")
+        result["sww_bytes"] = _file_size(sww_path)
+
+        if not args.skip_post:
+            # Only the rasterisation is timed; GeoServer is never contacted
+            from bridge import AnugaGeoserverBridge
+
+            bridge = AnugaGeoserverBridge(args.settings, settings_dir)
+
+            start = time.time()
+            products, ts_dir = bridge.generate_products(
+                sww_path, cfg.paths.output_file, cfg.postprocessing.generate_timeseries
+            )
+            phases["post_products"] = time.time() - start
+
+            product_bytes = sum(_file_size(path) for path in products.values())
+            if ts_dir:
+                product_bytes += sum(
+                    _file_size(os.path.join(ts_dir, name)) for name in os.listdir(ts_dir)
+                )
+
+            result["product_bytes"] = product_bytes
+            # Post-processing runs after MPI finalize, so re-sample the peak
+            result["peak_rss_mb"] = peak_rss_mb()
+
+    with open(os.path.join(args.result_dir, f"rank_{myid:04d}.json"), "w") as f:
+        json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
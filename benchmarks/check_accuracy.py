@@ -0,0 +1,265 @@
+"""Accuracy regression check: tiny generated cases against stored references.
+
+Each case is a small generated valley (DEM, AOI, dam, two gauges and one
+cross-section) that runs ``run_simulation`` plus the bridge rasterisation
+in seconds. Its max-depth grid and probe series are compared with the
+outputs recorded under ``benchmarks/reference/<case>/``, so a faster engine
+or post-processor can be validated offline before it replaces the current
+one. Runtimes are stored in the results database under suite ``accuracy``.
+
+Probe series are compared on the reference time axis (the candidate is
+interpolated), since a different engine need not take the same internal
+steps.
+
+Examples:
+    python3 benchmarks/check_accuracy.py                  # compare every case
+    python3 benchmarks/check_accuracy.py --cases tiny_dam --ranks 2
+    python3 benchmarks/check_accuracy.py --update         # record new references
+"""
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import os
+import shutil
+import sys
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from _common import BENCH_DIR, DEFAULT_DB_PATH, DEFAULT_WORK_DIR, base_sections, git_commit
+from compare_refinement import depth_agreement, read_asc
+import results_db
+from run_benchmarks import collect, launch
+from settings_loader import load_config, write_settings
+import synthetic
+
+REFERENCE_DIR = os.path.join(BENCH_DIR, "reference")
+
+# 2.4 x 1.5 km valley; at 3600 m^2 triangles the mesh has about a thousand
+TINY_GRID = {"ncols": 80, "nrows": 50, "cellsize": 30.0}
+
+# Case name -> rainfall on/off (the dam release always runs)
+CASES = {
+    "tiny_dam": False,
+    "tiny_rain": True,
+}
+
+POINT_QUANTITIES = ("stage", "depth", "xvelocity", "yvelocity")
+
+
+def case_sections(paths: Dict[str, str], probe_shps: List[str], rainfall: bool) -> Dict[str, Dict[str, Any]]:
+    sections = base_sections(paths)
+    sections["mesh"]["max_triangle_area_m2"] = 3600.0
+    sections["simulation"].update({"final_time_hours": 0.25, "yieldstep_s": 300.0})
+    sections["rainfall"].update({
+        "enable": rainfall,
+        "intensity_mm_hr": 50.0,
+        "dry_minutes": 0.0,
+        "ramp_up_minutes": 2.0,
+        "hold_minutes": 8.0,
+        "taper_minutes": 5.0,
+    })
+    sections["postprocessing"].update({
+        "products": ["max_depth"],
+        "product_cellsize": 30,
+        "clip_to_aoi": True,
+        "vector_products": False,
+    })
+    sections["probes"] = {"shapefiles": list(probe_shps), "interval_s": 0.0}
+    return sections
+
+
+def comparable(sections: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Settings that define the case, without machine-specific paths."""
+    return {
+        name: {k: v for k, v in values.items() if k != "mesh_cache_dir"}
+        for name, values in sections.items() if name not in ("paths", "probes")
+    }
+
+
+def probe_series(nc_path: str) -> Tuple[np.ndarray, Dict[str, Dict[str, np.ndarray]]]:
+    """(times, {quantity: {probe name: series}}) from a <run_id>_probes.nc."""
+    import netCDF4
+
+    with netCDF4.Dataset(nc_path, "r") as nc:
+        nc.set_auto_mask(False)
+        times = np.asarray(nc.variables["time"][:], dtype=float)
+        point_names = [str(n) for n in nc.variables["point_name"][:]]
+        line_names = [str(n) for n in nc.variables["line_name"][:]]
+
+        series = {}
+        for quantity in POINT_QUANTITIES:
+            values = np.asarray(nc.variables[quantity][:], dtype=float)
+            series[quantity] = {name: values[:, i] for i, name in enumerate(point_names)}
+        values = np.asarray(nc.variables["discharge"][:], dtype=float)
+        series["discharge"] = {name: values[:, i] for i, name in enumerate(line_names)}
+    return times, series
+
+
+def compare_probes(reference_nc: str, candidate_nc: str, abs_tol: float,
+                   discharge_rel_tol: float) -> List[Tuple[str, float, float]]:
+    """(check, error, limit) per quantity: max |diff| on the reference time axis."""
+    ref_times, reference = probe_series(reference_nc)
+    cand_times, candidate = probe_series(candidate_nc)
+
+    checks = []
+    for quantity, probes in reference.items():
+        worst, scale = 0.0, 1.0
+        for name, ref in probes.items():
+            if name not in candidate[quantity]:
+                checks.append((f"{quantity}[{name}] missing", np.inf, 0.0))
+                continue
+            cand = np.interp(ref_times, cand_times, candidate[quantity][name])
+            if quantity == "discharge":
+                scale = max(scale, float(np.nanmax(np.abs(ref))) if np.isfinite(ref).any() else 1.0)
+            diff = np.abs(cand - ref)
+            if np.isfinite(diff).any():
+                worst = max(worst, float(np.nanmax(diff)))
+        if quantity == "discharge":
+            checks.append(("discharge max |diff| / peak", worst / scale, discharge_rel_tol))
+        else:
+            checks.append((f"{quantity} max |diff|", worst, abs_tol))
+    return checks
+
+
+def run_case(args, case: str, rainfall: bool, conn, commit: str) -> str:
+    """Run one case and compare it (or record it with --update); returns its status."""
+    input_dir = os.path.join(args.work_dir, "accuracy", "inputs")
+    paths = synthetic.make_synthetic_case(input_dir, aoi_vertices=32, name_stem="tiny", **TINY_GRID)
+    probe_shps = synthetic.write_probe_shps(input_dir, "tiny", **TINY_GRID)
+
+    point_dir = os.path.join(args.work_dir, "accuracy", case)
+    shutil.rmtree(point_dir, ignore_errors=True)
+    sections = case_sections(paths, probe_shps, rainfall)
+    sections["paths"]["output_dir"] = os.path.join(point_dir, "outputs")
+    sections["mesh"]["mesh_cache_dir"] = os.path.join(point_dir, "mesh_cache")
+    sections["parallel"]["enable"] = args.ranks > 1
+    settings_path = write_settings(os.path.join(point_dir, "settings.toml"), sections)
+    # Fail here, not inside mpirun, if the generated settings stop loading
+    load_config(settings_path, point_dir)
+
+    reference_dir = os.path.join(REFERENCE_DIR, case)
+    reference_json = os.path.join(reference_dir, "reference.json")
+    reference = None
+    if not args.update:
+        if not os.path.exists(reference_json):
+            print(f"  {case}: no reference in {reference_dir} (record one with --update)")
+            return "missing"
+        with open(reference_json, "r", encoding="utf-8") as f:
+            reference = json.load(f)
+        if reference["settings"] != json.loads(json.dumps(comparable(sections))):
+            print(f"  {case}: reference was recorded with different case settings; re-record with --update")
+            return "missing"
+
+    print(f"  {case:<12s}", end="", flush=True)
+    returncode, wall_s = launch(args, settings_path, point_dir, args.ranks)
+    metrics = collect(point_dir) if returncode == 0 else {}
+    if not metrics:
+        print(f" FAILED (exit {returncode}, see {os.path.join(point_dir, 'worker.log')})")
+        status = "failed"
+    else:
+        with open(os.path.join(point_dir, "rank_0000.json"), "r", encoding="utf-8") as f:
+            run_id = json.load(f)["run_id"]
+        output_dir = sections["paths"]["output_dir"]
+        outputs = {
+            "max_depth.asc": os.path.join(output_dir, f"{run_id}_max_depth.asc"),
+            "probes.nc": os.path.join(output_dir, f"{run_id}_probes.nc"),
+        }
+        print(f" tris={metrics['triangles']:>6,d} steps={metrics['steps']:>6,d} wall={wall_s:6.1f}s", end="")
+
+        if args.update:
+            os.makedirs(reference_dir, exist_ok=True)
+            for name, path in outputs.items():
+                shutil.copyfile(path, os.path.join(reference_dir, name))
+            with open(reference_json, "w", encoding="utf-8") as f:
+                json.dump({
+                    "commit": commit,
+                    "recorded_at": datetime.datetime.now().isoformat(timespec="seconds"),
+                    "ranks": args.ranks,
+                    "wall_s": wall_s,
+                    "phases": metrics["phases"],
+                    "settings": comparable(sections),
+                }, f, indent=1)
+            print(" -> reference recorded")
+            status = "ok"
+        else:
+            status = "ok" if report(args, reference_dir, reference, outputs, wall_s) else "mismatch"
+
+    results_db.insert_result(conn, {
+        "commit_sha": commit,
+        "suite": "accuracy",
+        "case_name": case,
+        "max_triangle_area_m2": sections["mesh"]["max_triangle_area_m2"],
+        "ranks": args.ranks,
+        "yieldstep_s": sections["simulation"]["yieldstep_s"],
+        "final_time_hours": sections["simulation"]["final_time_hours"],
+        "status": status,
+        "wall_s": wall_s,
+        **metrics,
+    })
+    return status
+
+
+def report(args, reference_dir: str, reference: dict, outputs: Dict[str, str], wall_s: float) -> bool:
+    """Print every check against the reference; True when all pass."""
+    ref_depth = read_asc(os.path.join(reference_dir, "max_depth.asc"))
+    depth = read_asc(outputs["max_depth.asc"])
+    if ref_depth.shape != depth.shape:
+        checks = [(f"max_depth grid {depth.shape} vs {ref_depth.shape}", np.inf, 0.0)]
+    else:
+        agreement = depth_agreement(ref_depth, depth, wet_threshold=0.05)
+        checks = [
+            ("max_depth RMSE (m)", agreement["rmse_m"], args.depth_rmse),
+            ("max_depth max |diff| (m)", agreement["max_abs_m"], args.depth_max_abs),
+            # Lower is better for every check, so compare 1 - IoU
+            ("wet extent 1 - IoU", 1.0 - agreement["extent_iou"], 1.0 - args.extent_iou),
+        ]
+    checks += compare_probes(os.path.join(reference_dir, "probes.nc"), outputs["probes.nc"],
+                             args.probe_abs, args.discharge_rel)
+
+    # NaN errors fail too
+    passed = [error <= limit for _, error, limit in checks]
+    speedup = reference["wall_s"] / wall_s if wall_s > 0 else 0.0
+    print(f" ({speedup:.2f}x reference {reference['wall_s']:.1f}s) {'OK' if all(passed) else 'MISMATCH'}")
+    for (name, error, limit), ok in zip(checks, passed):
+        print(f"      {'ok' if ok else 'FAIL':<4s} {name:<32s} {error:10.4g}  (limit {limit:g})")
+    return all(passed)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), default=sorted(CASES))
+    parser.add_argument("--ranks", type=int, default=1)
+    parser.add_argument("--update", action="store_true", help="Record the outputs as the new references")
+    parser.add_argument("--depth-rmse", type=float, default=0.02, help="Max-depth RMSE over wet cells (m)")
+    parser.add_argument("--depth-max-abs", type=float, default=0.10, help="Largest max-depth difference (m)")
+    parser.add_argument("--extent-iou", type=float, default=0.95, help="Minimum wet-extent IoU")
+    parser.add_argument("--probe-abs", type=float, default=0.05,
+                        help="Largest gauge stage/depth (m) or velocity (m/s) difference")
+    parser.add_argument("--discharge-rel", type=float, default=0.05,
+                        help="Largest cross-section discharge difference, relative to the reference peak")
+    parser.add_argument("--mpirun", default=os.environ.get("MPIRUN", "mpirun"))
+    parser.add_argument("--work-dir", default=DEFAULT_WORK_DIR)
+    parser.add_argument("--db", default=DEFAULT_DB_PATH)
+    args = parser.parse_args()
+    # launch() only runs the rasterisation when asked; max_depth is needed here
+    args.skip_post = False
+
+    commit = git_commit()
+    conn = results_db.connect(args.db)
+
+    print("=" * 70)
+    print(f"ACCURACY CHECK | {'update' if args.update else 'compare'} | ranks={args.ranks} | commit={commit}")
+    print("=" * 70)
+
+    statuses = [run_case(args, case, CASES[case], conn, commit) for case in args.cases]
+
+    if "missing" in statuses:
+        sys.exit(2)
+    sys.exit(0 if all(status == "ok" for status in statuses) else 1)
+
+
+if __name__ == "__main__":
+    main()
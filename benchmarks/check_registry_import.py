@@ -0,0 +1,61 @@
+"""Check that legacy ``simulation_history.jsonl`` runs import with the right start times.
+
+Writes a history with one run id in the baseline ``_YYYYMMDD_HHMM`` format
+and one in the current ``_YYYYMMDD_HHMMSS`` format, imports it into a fresh
+registry and fails when a start time or a ``--since/--until`` window is off.
+
+Example:
+    python3 benchmarks/check_registry_import.py
+"""
+from __future__ import annotations
+
+import json
+import os
+import sys
+import tempfile
+
+import _common  # noqa: F401  (puts mahanadi_test_case on sys.path)
+from run_registry import connect, find_runs, import_jsonl
+
+EXPECTED = {
+    "mahanadi_20250801_0630": "2025-08-01T06:30:00",
+    "mahanadi_20250801_063015": "2025-08-01T06:30:15",
+}
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        history = os.path.join(tmp, "simulation_history.jsonl")
+        with open(history, "w", encoding="utf-8") as f:
+            for run_id in EXPECTED:
+                f.write(json.dumps({
+                    "run_id": run_id,
+                    "parameters": {},
+                    "phases": {"evolve": 1.0},
+                    "environment": {"status": "Completed"},
+                }) + "\n")
+
+        conn = connect(os.path.join(tmp, "run_registry.sqlite"))
+        try:
+            imported = import_jsonl(conn, history)
+            started = {row["run_id"]: row["started_at"] for row in find_runs(conn)}
+            window = {row["run_id"] for row in find_runs(conn, since="2025-08-01T06:30:00",
+                                                         until="2025-08-01T06:30:10")}
+        finally:
+            conn.close()
+
+    failed = imported != len(EXPECTED)
+    print(f"Imported {imported} of {len(EXPECTED)} runs")
+    for run_id, expected in EXPECTED.items():
+        ok = started.get(run_id) == expected
+        failed |= not ok
+        print(f"  {'ok' if ok else 'FAIL':<4s} {run_id:<28s} started_at={started.get(run_id)} (expected {expected})")
+
+    ok = window == {"mahanadi_20250801_0630"}
+    failed |= not ok
+    print(f"  {'ok' if ok else 'FAIL':<4s} 06:30:00-06:30:10 window -> {sorted(window)}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
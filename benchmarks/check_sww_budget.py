@@ -0,0 +1,79 @@
+"""Check that post-processing stays within [postprocessing] memory_budget_mb.
+
+Writes a synthetic SWW several times larger than the budget, computes every
+raster product once with the budget and once unbounded, and fails when the
+outputs differ or the traced peak allocation exceeds the budget.
+
+Example:
+    python3 benchmarks/check_sww_budget.py --points-per-side 300 --timesteps 200 --budget-mb 32 20
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import tracemalloc
+
+import numpy as np
+
+from _common import DEFAULT_WORK_DIR
+from sww_raster import PRODUCTS, clear_interpolator_cache, sww_products
+import synthetic
+
+
+def run(sww_path: str, out_dir: str, budget_mb, frames):
+    os.makedirs(out_dir, exist_ok=True)
+    outputs = {name: os.path.join(out_dir, f"{name}.asc") for name in PRODUCTS}
+    frame_paths = {t: os.path.join(out_dir, f"depth_{t:04d}.asc") for t in frames}
+
+    # Measure the interpolator build too, not a copy cached by an earlier run
+    clear_interpolator_cache()
+    tracemalloc.start()
+    sww_products(sww_path, outputs, cellsize=10.0, frames=frame_paths, memory_budget_mb=budget_mb)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {**outputs, **{f"frame_{t}": p for t, p in frame_paths.items()}}, peak / 2**20
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points-per-side", type=int, default=300)
+    parser.add_argument("--timesteps", type=int, default=200)
+    parser.add_argument("--budget-mb", type=float, nargs="+", default=[32.0, 20.0])
+    parser.add_argument("--work-dir", default=DEFAULT_WORK_DIR)
+    args = parser.parse_args()
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=args.work_dir) as tmp:
+        sww_path = synthetic.write_synthetic_sww(
+            os.path.join(tmp, "budget.sww"), args.points_per_side, args.timesteps
+        )
+        sww_mb = os.path.getsize(sww_path) / 2**20
+        frames = [0, args.timesteps // 2, args.timesteps - 1]
+
+        reference, ref_peak = run(sww_path, os.path.join(tmp, "unbounded"), None, frames)
+        print(f"SWW size: {sww_mb:.0f} MB | unbounded peak: {ref_peak:.1f} MB")
+
+        failures = 0
+        for budget in args.budget_mb:
+            outputs, peak = run(sww_path, os.path.join(tmp, f"budget_{budget:g}"), budget, frames)
+
+            mismatched = [
+                name for name, path in outputs.items()
+                if not np.allclose(np.loadtxt(path, skiprows=6), np.loadtxt(reference[name], skiprows=6))
+            ]
+            ok = peak <= budget and not mismatched
+            failures += not ok
+            print(
+                f"budget {budget:6.1f} MB | peak {peak:6.1f} MB | "
+                f"SWW/budget {sww_mb / budget:5.1f}x | "
+                f"{'OK' if ok else 'FAIL'}"
+                + (f" (outputs differ: {', '.join(mismatched)})" if mismatched else "")
+            )
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
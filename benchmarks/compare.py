@@ -0,0 +1,99 @@
+"""Compare two benchmarked commits and flag regressions.
+
+Exits with status 1 when any shared benchmark point regressed by more than
+the threshold, so it can gate a local pre-merge check. Percentages are
+signed so that positive always means worse.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from typing import List, Optional, Tuple
+
+from _common import DEFAULT_DB_PATH, git_commit
+import results_db
+
+# (column, label, True if larger is better)
+METRICS = [
+    ("wall_s", "wall s", False),
+    ("setup_s", "setup s", False),
+    ("evolve_s", "evolve s", False),
+    ("post_s", "post s", False),
+    ("tri_steps_per_s", "tri*steps/s", True),
+    ("peak_rss_rank0_mb", "rss0 MB", False),
+    ("peak_rss_max_mb", "rss max MB", False),
+    ("sww_bytes", "sww bytes", False),
+    ("product_bytes", "product bytes", False),
+]
+
+
+def relative_change(base: Optional[float], head: Optional[float], higher_is_better: bool) -> Optional[float]:
+    """Positive values are regressions, negative values improvements."""
+    if not base or head is None:
+        return None
+    change = (head - base) / base
+    return -change if higher_is_better else change
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--base", help="Baseline commit (default: previous benchmarked commit)")
+    parser.add_argument("--head", help="Candidate commit (default: current checkout)")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative change flagged as regression")
+    parser.add_argument("--suite", choices=["strong", "weak"])
+    parser.add_argument("--db", default=DEFAULT_DB_PATH)
+    args = parser.parse_args()
+
+    conn = results_db.connect(args.db)
+    known = results_db.commits(conn)
+
+    head = args.head or git_commit()
+    if head not in known and known:
+        head = known[-1]
+    base = args.base
+    if base is None:
+        earlier = [c for c in known if c != head]
+        base = earlier[-1] if earlier else None
+
+    if base is None or head is None:
+        print("Need results for two commits; run run_benchmarks.py on both first.")
+        sys.exit(2)
+
+    base_rows = results_db.best_by_key(conn, base, args.suite)
+    head_rows = results_db.best_by_key(conn, head, args.suite)
+    shared = sorted(set(base_rows) & set(head_rows))
+
+    print("=" * 70)
+    print(f"BENCHMARK COMPARISON | base={base} | head={head} | threshold={args.threshold:.0%}")
+    print("=" * 70)
+
+    if not shared:
+        print("No benchmark points in common between the two commits.")
+        sys.exit(2)
+
+    regressions: List[Tuple[tuple, str, float]] = []
+    for key in shared:
+        b, h = base_rows[key], head_rows[key]
+        case_name, area, ranks, yieldstep, hours = key
+        print(f"\n{case_name} | area={area:g} m^2 | ranks={ranks} | yieldstep={yieldstep:g}s | {hours:g} h")
+        for column, label, higher_is_better in METRICS:
+            change = relative_change(b[column], h[column], higher_is_better)
+            if change is None:
+                continue
+            flag = ""
+            if change > args.threshold:
+                flag = "  <-- REGRESSION"
+                regressions.append((key, label, change))
+            elif change < -args.threshold:
+                flag = "  (improved)"
+            print(f"  {label:<14s} {b[column]:>16,.2f} -> {h[column]:>16,.2f} {change:+8.1%}{flag}")
+
+    print("\n" + "=" * 70)
+    if regressions:
+        print(f"{len(regressions)} REGRESSION(S) above {args.threshold:.0%}")
+        sys.exit(1)
+    print("No regressions.")
+
+
+if __name__ == "__main__":
+    main()
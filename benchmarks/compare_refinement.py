@@ -0,0 +1,139 @@
+"""Uniform vs DEM-refined mesh: triangle count, runtime and max-depth agreement.
+
+Runs the same case twice, once with ``[mesh] refinement = "none"`` and once
+with ``"dem"`` (the uniform area is used inside the refinement regions),
+then compares the max-depth rasters cell by cell. Both runs are recorded in
+the results database under suite ``refinement``.
+
+Example:
+    python3 benchmarks/compare_refinement.py --area 900 --background-area 3600 --ranks 4
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import sys
+
+import numpy as np
+
+from _common import DEFAULT_DB_PATH, DEFAULT_WORK_DIR, base_sections, git_commit
+import results_db
+from settings_loader import write_settings
+from run_benchmarks import collect, launch, prepare_case
+
+NODATA = -9999.0
+
+
+def read_asc(path: str) -> np.ndarray:
+    values = np.loadtxt(path, skiprows=6)
+    return np.where(values == NODATA, np.nan, values)
+
+
+def depth_agreement(uniform: np.ndarray, refined: np.ndarray, wet_threshold: float) -> dict:
+    if uniform.shape != refined.shape:
+        raise ValueError(f"Grids differ: {uniform.shape} vs {refined.shape}")
+
+    both = ~np.isnan(uniform) & ~np.isnan(refined)
+    a, b = uniform[both], refined[both]
+    wet_a, wet_b = a >= wet_threshold, b >= wet_threshold
+    wet_any = wet_a | wet_b
+    diff = (b - a)[wet_any]
+
+    return {
+        "rmse_m": float(np.sqrt(np.mean(diff ** 2))) if diff.size else 0.0,
+        "max_abs_m": float(np.max(np.abs(diff))) if diff.size else 0.0,
+        "extent_iou": float((wet_a & wet_b).sum() / max(1, wet_any.sum())),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--case", choices=["synthetic", "mahanadi"], default="synthetic")
+    parser.add_argument("--area", type=float, default=900.0, help="Uniform / refined triangle area (m^2)")
+    parser.add_argument("--background-area", type=float, default=3600.0,
+                        help="Triangle area outside the refinement regions (m^2)")
+    parser.add_argument("--channel-min-area-km2", type=float, default=5.0)
+    parser.add_argument("--ranks", type=int, default=1)
+    parser.add_argument("--final-hours", type=float, default=1.0)
+    parser.add_argument("--max-rmse", type=float, default=0.10,
+                        help="Fail when the max-depth RMSE (m) over wet cells exceeds this")
+    parser.add_argument("--dem-cols", type=int, default=300)
+    parser.add_argument("--dem-rows", type=int, default=200)
+    parser.add_argument("--dem-cellsize", type=float, default=30.0)
+    parser.add_argument("--aoi-vertices", type=int, default=64)
+    parser.add_argument("--downsample", type=int, default=8, help="Mahanadi DEM decimation factor")
+    parser.add_argument("--mpirun", default=os.environ.get("MPIRUN", "mpirun"))
+    parser.add_argument("--work-dir", default=DEFAULT_WORK_DIR)
+    parser.add_argument("--db", default=DEFAULT_DB_PATH)
+    args = parser.parse_args()
+    # launch() only times rasterisation when asked; max_depth is needed here
+    args.skip_post = False
+
+    commit = git_commit()
+    case_name, paths = prepare_case(args)
+    conn = results_db.connect(args.db)
+
+    results = {}
+    for mode in ("none", "dem"):
+        point_dir = os.path.join(args.work_dir, case_name, "runs", f"refinement_{mode}_a{args.area:g}_np{args.ranks}")
+        shutil.rmtree(point_dir, ignore_errors=True)
+
+        sections = base_sections(paths)
+        sections["paths"]["output_dir"] = os.path.join(point_dir, "outputs")
+        sections["mesh"].update({
+            "max_triangle_area_m2": args.area,
+            "mesh_cache_dir": os.path.join(point_dir, "mesh_cache"),
+            "refinement": mode,
+            "background_triangle_area_m2": args.background_area,
+            "channel_min_area_km2": args.channel_min_area_km2,
+        })
+        sections["simulation"]["final_time_hours"] = args.final_hours
+        sections["parallel"]["enable"] = args.ranks > 1
+        sections["postprocessing"]["products"] = ["max_depth"]
+        settings_path = write_settings(os.path.join(point_dir, "settings.toml"), sections)
+
+        print(f"  mesh={mode:<5s}", end="", flush=True)
+        returncode, wall_s = launch(args, settings_path, point_dir, args.ranks)
+        metrics = collect(point_dir) if returncode == 0 else {}
+        if not metrics:
+            print(f" FAILED (exit {returncode}, see {os.path.join(point_dir, 'worker.log')})")
+            sys.exit(1)
+
+        results_db.insert_result(conn, {
+            "commit_sha": commit,
+            "suite": "refinement",
+            "case_name": f"{case_name}_mesh-{mode}",
+            "max_triangle_area_m2": args.area,
+            "ranks": args.ranks,
+            "yieldstep_s": sections["simulation"]["yieldstep_s"],
+            "final_time_hours": args.final_hours,
+            "status": "ok",
+            "wall_s": wall_s,
+            **metrics,
+        })
+
+        max_depth = os.path.join(sections["paths"]["output_dir"], f"{paths['output_file']}_max_depth.asc")
+        results[mode] = {**metrics, "wall_s": wall_s, "max_depth": read_asc(max_depth)}
+        print(f" tris={metrics['triangles']:>9,d} evolve={metrics['evolve_s']:7.1f}s wall={wall_s:7.1f}s")
+
+    uniform, refined = results["none"], results["dem"]
+    agreement = depth_agreement(uniform["max_depth"], refined["max_depth"], wet_threshold=0.05)
+
+    def reduction(key: str) -> float:
+        return 100.0 * (1.0 - refined[key] / uniform[key]) if uniform[key] else 0.0
+
+    print("=" * 70)
+    print(f"Triangles: {uniform['triangles']:,d} -> {refined['triangles']:,d} ({reduction('triangles'):+.1f}% fewer)")
+    print(f"Evolve:    {uniform['evolve_s']:.1f}s -> {refined['evolve_s']:.1f}s ({reduction('evolve_s'):+.1f}% faster)")
+    print(f"Wall:      {uniform['wall_s']:.1f}s -> {refined['wall_s']:.1f}s ({reduction('wall_s'):+.1f}% faster)")
+    print(
+        f"Max depth: RMSE {agreement['rmse_m']:.3f} m | max |diff| {agreement['max_abs_m']:.3f} m | "
+        f"wet extent IoU {agreement['extent_iou']:.3f}"
+    )
+
+    sys.exit(1 if agreement["rmse_m"] > args.max_rmse else 0)
+
+
+if __name__ == "__main__":
+    main()
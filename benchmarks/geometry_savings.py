@@ -0,0 +1,74 @@
+"""Boundary segments, triangles and meshing time with and without AOI simplification.
+
+Meshes the AOI once per simplify factor (no simulation), so the effect of
+``[boundary] simplify_factor`` on densely digitised outlines can be checked
+in seconds. Requires ANUGA for the mesher.
+
+Example:
+    python3 benchmarks/geometry_savings.py --aoi-vertices 5000 --area 900 --factors 0 0.25 0.5 1
+"""
+from __future__ import annotations
+
+import argparse
+import math
+import os
+import time
+
+from _common import DEFAULT_WORK_DIR
+from geometry import prepare_geometry
+import synthetic
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--case", choices=["synthetic", "mahanadi"], default="synthetic")
+    parser.add_argument("--area", type=float, default=900.0, help="Boundary triangle area (m^2)")
+    parser.add_argument("--factors", type=float, nargs="+", default=[0.0, 0.25, 0.5, 1.0])
+    parser.add_argument("--dem-cols", type=int, default=300)
+    parser.add_argument("--dem-rows", type=int, default=200)
+    parser.add_argument("--dem-cellsize", type=float, default=30.0)
+    parser.add_argument("--aoi-vertices", type=int, default=5000)
+    parser.add_argument("--work-dir", default=DEFAULT_WORK_DIR)
+    args = parser.parse_args()
+
+    import anuga
+
+    if args.case == "mahanadi":
+        aoi, dam = synthetic.MAHANADI_AOI, synthetic.MAHANADI_DAM
+    else:
+        case_dir = os.path.join(
+            args.work_dir, f"synthetic_{args.dem_cols}x{args.dem_rows}_v{args.aoi_vertices}"
+        )
+        paths = synthetic.make_synthetic_case(
+            case_dir, ncols=args.dem_cols, nrows=args.dem_rows,
+            cellsize=args.dem_cellsize, aoi_vertices=args.aoi_vertices,
+        )
+        aoi, dam = paths["aoi_shp_path"], paths["dam_shp_path"]
+
+    print(f"{'factor':>6s} {'tol m':>7s} {'segments':>9s} {'triangles':>10s} {'mesh s':>7s}")
+    baseline = None
+    for factor in args.factors:
+        tolerance = factor * math.sqrt(2.0 * args.area)
+        geometry = prepare_geometry(aoi, dam, tolerance)
+
+        start = time.time()
+        domain = anuga.create_domain_from_regions(
+            geometry.bounding_polygon,
+            boundary_tags={"exterior": list(range(len(geometry.bounding_polygon) - 1))},
+            maximum_triangle_area=args.area,
+            interior_holes=geometry.interior_holes or None,
+            verbose=False,
+        )
+        elapsed = time.time() - start
+
+        triangles = domain.number_of_elements
+        baseline = baseline or (geometry.segments, triangles)
+        print(
+            f"{factor:6.2f} {tolerance:7.1f} {geometry.segments:9,d} {triangles:10,d} {elapsed:7.2f}"
+            f"  ({100.0 * (1 - geometry.segments / baseline[0]):.0f}% fewer segments,"
+            f" {100.0 * (1 - triangles / baseline[1]):.1f}% fewer triangles)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Cold import cost of the pipeline modules, each in a fresh interpreter.
+
+Example:
+    python3 benchmarks/import_time.py bridge simulation sww_raster
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+from _common import CASE_DIR
+
+HEAVY_MODULES = ["anuga", "mpi4py", "netCDF4", "numpy", "requests", "shapefile"]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "seconds": elapsed,
+    "loaded": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+
+def measure(module: str) -> dict:
+    code = PROBE.format(module=module, heavy=HEAVY_MODULES)
+    proc = subprocess.run(
+        [sys.executable, "-c", code], cwd=CASE_DIR, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        last_line = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "unknown error"
+        return {"error": last_line}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=["bridge", "sww_raster", "simulation"])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'module':<14s} {'median ms':>10s}  heavy modules loaded")
+    for module in args.modules:
+        runs = [measure(module) for _ in range(args.repeat)]
+        failed = [r for r in runs if "error" in r]
+        if failed:
+            print(f"{module:<14s} {'-':>10s}  import failed: {failed[0]['error']}")
+            continue
+        median_ms = 1000.0 * statistics.median(r["seconds"] for r in runs)
+        print(f"{module:<14s} {median_ms:10.1f}  {', '.join(runs[0]['loaded']) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS benchmark_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL DEFAULT (datetime('now')),
+    commit_sha TEXT NOT NULL,
+    suite TEXT NOT NULL,
+    case_name TEXT NOT NULL,
+    max_triangle_area_m2 REAL NOT NULL,
+    ranks INTEGER NOT NULL,
+    yieldstep_s REAL NOT NULL,
+    final_time_hours REAL NOT NULL,
+    status TEXT NOT NULL,
+    triangles INTEGER,
+    steps INTEGER,
+    wall_s REAL,
+    setup_s REAL,
+    evolve_s REAL,
+    post_s REAL,
+    tri_steps_per_s REAL,
+    peak_rss_rank0_mb REAL,
+    peak_rss_max_mb REAL,
+    sww_bytes INTEGER,
+    product_bytes INTEGER,
+    phases_json TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_benchmark_commit ON benchmark_runs (commit_sha);
+CREATE INDEX IF NOT EXISTS idx_benchmark_key
+    ON benchmark_runs (case_name, max_triangle_area_m2, ranks, yieldstep_s, final_time_hours);
+"""
+
+# Columns identifying "the same benchmark" across commits
+KEY_COLUMNS = ("case_name", "max_triangle_area_m2", "ranks", "yieldstep_s", "final_time_hours")
+
+
+def connect(db_path: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def insert_result(conn: sqlite3.Connection, row: Dict[str, Any]) -> int:
+    row = dict(row)
+    if "phases" in row:
+        row["phases_json"] = json.dumps(row.pop("phases"))
+
+    columns = ", ".join(row)
+    placeholders = ", ".join("?" for _ in row)
+    cur = conn.execute(
+        f"INSERT INTO benchmark_runs ({columns}) VALUES ({placeholders})",
+        list(row.values()),
+    )
+    conn.commit()
+    return int(cur.lastrowid)
+
+
+def commits(conn: sqlite3.Connection) -> List[str]:
+    """Benchmarked commits, oldest first."""
+    rows = conn.execute(
+        "SELECT commit_sha, MAX(created_at) AS last FROM benchmark_runs "
+        "GROUP BY commit_sha ORDER BY last"
+    ).fetchall()
+    return [r["commit_sha"] for r in rows]
+
+
+def best_by_key(conn: sqlite3.Connection, commit_sha: str,
+                suite: Optional[str] = None) -> Dict[tuple, sqlite3.Row]:
+    """Fastest successful run per benchmark key for one commit.
+
+    Taking the best of repeated runs keeps noisy neighbours on the shared box
+    from showing up as regressions.
+    """
+    query = "SELECT * FROM benchmark_runs WHERE commit_sha = ? AND status = 'ok'"
+    params: List[Any] = [commit_sha]
+    if suite:
+        query += " AND suite = ?"
+        params.append(suite)
+
+    best: Dict[tuple, sqlite3.Row] = {}
+    for row in conn.execute(query, params):
+        key = tuple(row[c] for c in KEY_COLUMNS)
+        current = best.get(key)
+        if current is None or (row["wall_s"] or 0) < (current["wall_s"] or 0):
+            best[key] = row
+    return best
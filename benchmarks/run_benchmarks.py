@@ -0,0 +1,195 @@
+"""Weak/strong scaling sweeps over run_simulation, recorded into SQLite.
+
+Examples:
+    python3 benchmarks/run_benchmarks.py --suite strong --ranks 1 2 4 8 16
+    python3 benchmarks/run_benchmarks.py --suite weak --areas 3600 --ranks 1 4 16
+    python3 benchmarks/run_benchmarks.py --case mahanadi --downsample 8 --areas 3600 900
+"""
+from __future__ import annotations
+
+import argparse
+import glob
+import itertools
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+from _common import (
+    BENCH_DIR,
+    DEFAULT_DB_PATH,
+    DEFAULT_WORK_DIR,
+    base_sections,
+    git_commit,
+)
+import results_db
+from settings_loader import write_settings
+import synthetic
+
+WORKER = os.path.join(BENCH_DIR, "bench_worker.py")
+
+
+def sweep_points(args) -> List[Tuple[float, int, float]]:
+    """(max_triangle_area_m2, ranks, yieldstep_s) tuples for the chosen suite."""
+    if args.suite == "weak":
+        # Triangle count scales ~1/area, so shrink the area with the rank count
+        # to hold triangles per rank constant.
+        base_ranks = args.ranks[0]
+        return [
+            (area * base_ranks / ranks, ranks, ys)
+            for area in args.areas
+            for ranks in args.ranks
+            for ys in args.yieldsteps
+        ]
+    return list(itertools.product(args.areas, args.ranks, args.yieldsteps))
+
+
+def prepare_case(args) -> Tuple[str, Dict[str, str]]:
+    if args.case == "mahanadi":
+        case_name = f"mahanadi_ds{args.downsample}"
+        paths = synthetic.make_mahanadi_case(os.path.join(args.work_dir, case_name), args.downsample)
+    else:
+        case_name = f"synthetic_{args.dem_cols}x{args.dem_rows}_v{args.aoi_vertices}"
+        paths = synthetic.make_synthetic_case(
+            os.path.join(args.work_dir, case_name),
+            ncols=args.dem_cols,
+            nrows=args.dem_rows,
+            cellsize=args.dem_cellsize,
+            aoi_vertices=args.aoi_vertices,
+        )
+    return case_name, paths
+
+
+def launch(args, settings_path: str, result_dir: str, ranks: int) -> Tuple[int, float]:
+    cmd = [sys.executable, WORKER, settings_path, result_dir]
+    if args.skip_post:
+        cmd.append("--skip-post")
+    if ranks > 1:
+        cmd = [args.mpirun, "-np", str(ranks)] + cmd
+
+    log_path = os.path.join(result_dir, "worker.log")
+    start = time.time()
+    with open(log_path, "w") as log:
+        proc = subprocess.run(cmd, stdout=log, stderr=subprocess.STDOUT)
+    return proc.returncode, time.time() - start
+
+
+def collect(result_dir: str) -> Dict[str, Any]:
+    ranks = []
+    for path in sorted(glob.glob(os.path.join(result_dir, "rank_*.json"))):
+        with open(path) as f:
+            ranks.append(json.load(f))
+
+    root = next((r for r in ranks if r["rank"] == 0), None)
+    if root is None:
+        return {}
+
+    phases = root["phases"]
+    triangles = int(phases.get("triangles", 0))
+    steps = int(phases.get("steps", 0))
+    evolve_s = phases.get("evolve", 0.0)
+
+    return {
+        "triangles": triangles,
+        "steps": steps,
+        "setup_s": sum(phases.get(k, 0.0) for k in ("mesh", "elevation", "distribute")),
+        "evolve_s": evolve_s,
+        "post_s": sum(v for k, v in phases.items() if k.startswith("post_")),
+        "tri_steps_per_s": triangles * steps / evolve_s if evolve_s > 0 else None,
+        "peak_rss_rank0_mb": root["peak_rss_mb"],
+        "peak_rss_max_mb": max(r["peak_rss_mb"] for r in ranks),
+        "sww_bytes": root.get("sww_bytes"),
+        "product_bytes": root.get("product_bytes"),
+        "phases": phases,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suite", choices=["strong", "weak"], default="strong")
+    parser.add_argument("--case", choices=["synthetic", "mahanadi"], default="synthetic")
+    parser.add_argument("--areas", type=float, nargs="+", default=[3600.0],
+                        help="max_triangle_area_m2 values (weak: area at the first rank count)")
+    parser.add_argument("--ranks", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--yieldsteps", type=float, nargs="+", default=[600.0])
+    parser.add_argument("--final-hours", type=float, default=1.0)
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per sweep point")
+    parser.add_argument("--timeseries", action="store_true", help="Also time depth frame export")
+    parser.add_argument("--skip-post", action="store_true", help="Do not time post-processing")
+    parser.add_argument("--dem-cols", type=int, default=300)
+    parser.add_argument("--dem-rows", type=int, default=200)
+    parser.add_argument("--dem-cellsize", type=float, default=30.0)
+    parser.add_argument("--aoi-vertices", type=int, default=64)
+    parser.add_argument("--downsample", type=int, default=8, help="Mahanadi DEM decimation factor")
+    parser.add_argument("--setup-mode", choices=["full", "lean", "streamed"], default="full",
+                        help="[parallel] setup_mode used for every run")
+    parser.add_argument("--mpirun", default=os.environ.get("MPIRUN", "mpirun"))
+    parser.add_argument("--work-dir", default=DEFAULT_WORK_DIR)
+    parser.add_argument("--db", default=DEFAULT_DB_PATH)
+    args = parser.parse_args()
+
+    commit = git_commit()
+    case_name, paths = prepare_case(args)
+    point_root = os.path.join(args.work_dir, case_name, "runs")
+    if args.setup_mode != "full":
+        # Keep setup modes apart so compare.py only matches like with like
+        case_name = f"{case_name}_{args.setup_mode}"
+    conn = results_db.connect(args.db)
+
+    print("=" * 70)
+    print(f"BENCHMARK | suite={args.suite} | case={case_name} | commit={commit}")
+    print("=" * 70)
+
+    for area, ranks, yieldstep in sweep_points(args):
+        for rep in range(args.repeat):
+            tag = f"a{area:g}_np{ranks}_ys{yieldstep:g}_r{rep}"
+            point_dir = os.path.join(point_root, f"{args.setup_mode}_{tag}")
+            shutil.rmtree(point_dir, ignore_errors=True)
+
+            sections = base_sections(paths)
+            sections["paths"]["output_dir"] = os.path.join(point_dir, "outputs")
+            sections["mesh"]["max_triangle_area_m2"] = area
+            sections["mesh"]["mesh_cache_dir"] = os.path.join(point_dir, "mesh_cache")
+            sections["simulation"]["final_time_hours"] = args.final_hours
+            sections["simulation"]["yieldstep_s"] = yieldstep
+            sections["parallel"]["enable"] = ranks > 1
+            sections["parallel"]["setup_mode"] = args.setup_mode
+            sections["postprocessing"]["generate_timeseries"] = args.timeseries
+            settings_path = write_settings(os.path.join(point_dir, "settings.toml"), sections)
+
+            print(f"  {tag:<40s}", end="", flush=True)
+            returncode, wall_s = launch(args, settings_path, point_dir, ranks)
+            metrics = collect(point_dir) if returncode == 0 else {}
+            status = "ok" if metrics else "failed"
+
+            results_db.insert_result(conn, {
+                "commit_sha": commit,
+                "suite": args.suite,
+                "case_name": case_name,
+                "max_triangle_area_m2": area,
+                "ranks": ranks,
+                "yieldstep_s": yieldstep,
+                "final_time_hours": args.final_hours,
+                "status": status,
+                "wall_s": wall_s,
+                **metrics,
+            })
+
+            if status == "ok":
+                rate = metrics["tri_steps_per_s"] or 0.0
+                print(
+                    f" tris={metrics['triangles']:>9,d} wall={wall_s:7.1f}s "
+                    f"evolve={metrics['evolve_s']:7.1f}s tri*steps/s={rate:,.0f} "
+                    f"rss0={metrics['peak_rss_rank0_mb']:.0f}MB"
+                )
+            else:
+                print(f" FAILED (exit {returncode}, see {os.path.join(point_dir, 'worker.log')})")
+
+    print(f"Results stored in: {args.db}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+import math
+import os
+import shutil
+from typing import Dict, List, Tuple
+
+import numpy as np
+import shapefile
+
+from _common import CASE_DIR
+
+# Same UTM 45N origin as the Mahanadi DEM so GeoServer/SRS handling is unchanged
+DEFAULT_ORIGIN = (392635.0, 2248090.0)
+MAHANADI_ASC = os.path.join(CASE_DIR, "input_files", "dem", "mahanadi.asc")
+MAHANADI_PRJ = os.path.join(CASE_DIR, "input_files", "dem", "mahanadi.prj")
+MAHANADI_AOI = os.path.join(CASE_DIR, "input_files", "shapfile", "AOI_Anuga.shp")
+MAHANADI_DAM = os.path.join(
+    CASE_DIR, "input_files", "shapfile", "Mahanadi_Barrage_Upstream_Location1.shp"
+)
+NODATA = -9999
+
+
+def _write_prj(stem: str) -> None:
+    if os.path.exists(MAHANADI_PRJ):
+        shutil.copyfile(MAHANADI_PRJ, f"{stem}.prj")
+
+
+def write_asc(path: str, z: np.ndarray, xll: float, yll: float, cellsize: float) -> str:
+    """Write ``z`` (row 0 = north) as an ESRI ASCII grid plus .prj."""
+    nrows, ncols = z.shape
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"ncols {ncols}\n")
+        f.write(f"nrows {nrows}\n")
+        f.write(f"xllcorner {xll:.1f}\n")
+        f.write(f"yllcorner {yll:.1f}\n")
+        f.write(f"cellsize {cellsize:.1f}\n")
+        f.write(f"NODATA_value {NODATA}\n")
+        np.savetxt(f, z, fmt="%.3f")
+    _write_prj(os.path.splitext(path)[0])
+    return path
+
+
+def valley_surface(ncols: int, nrows: int, cellsize: float) -> np.ndarray:
+    """River valley draining west -> east with a meandering channel.
+
+    Elevations are in metres; row 0 is the northern edge as in an ASC grid.
+    """
+    x = (np.arange(ncols) + 0.5) * cellsize
+    y = (np.arange(nrows) + 0.5) * cellsize
+    xx, yy = np.meshgrid(x, y[::-1])
+
+    width = ncols * cellsize
+    height = nrows * cellsize
+
+    centreline = 0.5 * height + 0.15 * height * np.sin(2.0 * math.pi * xx / width)
+    offset = np.abs(yy - centreline)
+
+    downstream_slope = 20.0 * (1.0 - xx / width)
+    floodplain = 0.004 * offset
+    channel = -4.0 * np.exp(-((offset / (0.02 * height + cellsize)) ** 2))
+
+    return 10.0 + downstream_slope + floodplain + channel
+
+
+def channel_point(xll: float, yll: float, ncols: int, nrows: int, cellsize: float,
+                  fraction: float = 0.1) -> Tuple[float, float]:
+    """Point on the synthetic channel centreline ``fraction`` of the way downstream."""
+    width = ncols * cellsize
+    height = nrows * cellsize
+    x = fraction * width
+    y = 0.5 * height + 0.15 * height * math.sin(2.0 * math.pi * x / width)
+    return xll + x, yll + y
+
+
+def aoi_ring(xll: float, yll: float, ncols: int, nrows: int, cellsize: float,
+             vertices: int = 64, inset: float = 0.05) -> List[Tuple[float, float]]:
+    """Closed super-ellipse ring inset inside the DEM extent."""
+    width = ncols * cellsize
+    height = nrows * cellsize
+    cx, cy = xll + 0.5 * width, yll + 0.5 * height
+    rx, ry = (0.5 - inset) * width, (0.5 - inset) * height
+
+    ring = []
+    for k in range(vertices):
+        theta = 2.0 * math.pi * k / vertices
+        c, s = math.cos(theta), math.sin(theta)
+        # Exponent 0.25 gives a rounded rectangle that covers most of the valley
+        px = cx + rx * math.copysign(abs(c) ** 0.25, c)
+        py = cy + ry * math.copysign(abs(s) ** 0.25, s)
+        ring.append((px, py))
+    ring.append(ring[0])
+    # Shapefile outer rings are clockwise
+    ring.reverse()
+    return ring
+
+
+def write_polygon_shp(path: str, ring: List[Tuple[float, float]]) -> str:
+    stem = os.path.splitext(path)[0]
+    w = shapefile.Writer(stem, shapeType=shapefile.POLYGON)
+    w.field("id", "N")
+    w.poly([ring])
+    w.record(1)
+    w.close()
+    _write_prj(stem)
+    return f"{stem}.shp"
+
+
+def write_point_shp(path: str, x: float, y: float) -> str:
+    stem = os.path.splitext(path)[0]
+    w = shapefile.Writer(stem, shapeType=shapefile.POINT)
+    w.field("id", "N")
+    w.point(x, y)
+    w.record(1)
+    w.close()
+    _write_prj(stem)
+    return f"{stem}.shp"
+
+
+def write_probe_shps(out_dir: str, name_stem: str, ncols: int, nrows: int,
+                     cellsize: float) -> List[str]:
+    """Two gauges on the channel and one cross-section across it, for ``[probes]``."""
+    xll, yll = DEFAULT_ORIGIN
+    gauges_stem = os.path.join(out_dir, f"{name_stem}_gauges")
+    w = shapefile.Writer(gauges_stem, shapeType=shapefile.POINT)
+    w.field("name", "C", size=32)
+    for fraction in (0.3, 0.6):
+        w.point(*channel_point(xll, yll, ncols, nrows, cellsize, fraction))
+        w.record(f"gauge_{int(fraction * 100)}")
+    w.close()
+    _write_prj(gauges_stem)
+
+    # South -> north across the valley, so the west -> east flow is positive
+    x, y = channel_point(xll, yll, ncols, nrows, cellsize, 0.5)
+    half_span = 0.3 * nrows * cellsize
+    section_stem = os.path.join(out_dir, f"{name_stem}_section")
+    w = shapefile.Writer(section_stem, shapeType=shapefile.POLYLINE)
+    w.field("name", "C", size=32)
+    w.line([[(x, y - half_span), (x, y + half_span)]])
+    w.record("section_50")
+    w.close()
+    _write_prj(section_stem)
+    return [f"{gauges_stem}.shp", f"{section_stem}.shp"]
+
+
+def make_synthetic_case(out_dir: str, ncols: int = 300, nrows: int = 200,
+                        cellsize: float = 30.0, aoi_vertices: int = 64,
+                        name_stem: str = "synthetic") -> Dict[str, str]:
+    """Generate DEM, AOI and dam inputs; returns a ``[paths]`` settings section."""
+    os.makedirs(out_dir, exist_ok=True)
+    xll, yll = DEFAULT_ORIGIN
+
+    asc_path = os.path.join(out_dir, f"{name_stem}.asc")
+    aoi_path = os.path.join(out_dir, f"{name_stem}_aoi.shp")
+    dam_path = os.path.join(out_dir, f"{name_stem}_dam.shp")
+
+    if not os.path.exists(asc_path):
+        write_asc(asc_path, valley_surface(ncols, nrows, cellsize), xll, yll, cellsize)
+    write_polygon_shp(aoi_path, aoi_ring(xll, yll, ncols, nrows, cellsize, aoi_vertices))
+    write_point_shp(dam_path, *channel_point(xll, yll, ncols, nrows, cellsize))
+
+    return {
+        "name_stem": name_stem,
+        "output_file": name_stem,
+        "asc_path": asc_path,
+        "dam_shp_path": dam_path,
+        "output_dir": os.path.join(out_dir, "outputs"),
+        "aoi_shp_path": aoi_path,
+    }
+
+
+def downsample_asc(src: str, dst: str, factor: int) -> str:
+    """Keep every ``factor``-th row/column of ``src`` without loading it whole."""
+    if factor < 1:
+        raise ValueError("factor must be >= 1")
+
+    with open(src, "r", encoding="utf-8") as fin:
+        header = {}
+        for _ in range(6):
+            k, v = fin.readline().strip().split()
+            header[k.lower()] = v
+
+        ncols = int(header["ncols"])
+        nrows = int(header["nrows"])
+        cellsize = float(header["cellsize"])
+        # Keep the grid anchored on the original upper-left corner
+        out_rows = (nrows + factor - 1) // factor
+        out_cols = (ncols + factor - 1) // factor
+        yll = float(header["yllcorner"]) + nrows * cellsize - out_rows * cellsize * factor
+
+        with open(dst, "w", encoding="utf-8") as fout:
+            fout.write(f"ncols {out_cols}\n")
+            fout.write(f"nrows {out_rows}\n")
+            fout.write(f"xllcorner {header['xllcorner']}\n")
+            fout.write(f"yllcorner {yll}\n")
+            fout.write(f"cellsize {cellsize * factor}\n")
+            fout.write(f"NODATA_value {header.get('nodata_value', NODATA)}\n")
+
+            for i, line in enumerate(fin):
+                if i % factor:
+                    continue
+                fout.write(" ".join(line.split()[::factor]) + "\n")
+
+    _write_prj(os.path.splitext(dst)[0])
+    return dst
+
+
+def make_mahanadi_case(out_dir: str, factor: int) -> Dict[str, str]:
+    """Downsampled Mahanadi DEM with the real AOI and dam shapefiles."""
+    os.makedirs(out_dir, exist_ok=True)
+    name_stem = f"mahanadi_ds{factor}"
+    asc_path = os.path.join(out_dir, f"{name_stem}.asc")
+    if not os.path.exists(asc_path):
+        downsample_asc(MAHANADI_ASC, asc_path, factor)
+
+    return {
+        "name_stem": name_stem,
+        "output_file": name_stem,
+        "asc_path": asc_path,
+        "dam_shp_path": MAHANADI_DAM,
+        "output_dir": os.path.join(out_dir, "outputs"),
+        "aoi_shp_path": MAHANADI_AOI,
+    }
+
+
+def write_synthetic_sww(path: str, n: int = 200, num_timesteps: int = 100,
+                        spacing: float = 10.0, interval_s: float = 600.0) -> str:
+    """Regular-mesh SWW with a spreading flood wave, written timestep by timestep.
+
+    The file layout follows ANUGA's (smoothed vertex values, float32 record
+    variables), so its size is about ``12 * n**2 * num_timesteps`` bytes and
+    can exceed RAM without ever being held in memory here.
+    """
+    import netCDF4
+
+    xs, ys = np.meshgrid(np.arange(n) * spacing, np.arange(n) * spacing)
+    x, y = xs.ravel(), ys.ravel()
+
+    idx = np.arange(n * n).reshape(n, n)
+    a, b = idx[:-1, :-1].ravel(), idx[:-1, 1:].ravel()
+    c, d = idx[1:, :-1].ravel(), idx[1:, 1:].ravel()
+    volumes = np.concatenate([np.column_stack((a, b, d)), np.column_stack((a, d, c))])
+
+    length = (n - 1) * spacing
+    elevation = 0.01 * x
+    radius = np.hypot(x - 0.25 * length, y - 0.5 * length)
+
+    with netCDF4.Dataset(path, "w") as nc:
+        nc.xllcorner, nc.yllcorner = DEFAULT_ORIGIN
+        nc.zone = 45
+        nc.false_easting = 500000
+        nc.false_northing = 10000000
+        nc.createDimension("number_of_points", len(x))
+        nc.createDimension("number_of_volumes", len(volumes))
+        nc.createDimension("number_of_vertices", 3)
+        nc.createDimension("number_of_timesteps", None)
+
+        nc.createVariable("x", "f4", ("number_of_points",))[:] = x
+        nc.createVariable("y", "f4", ("number_of_points",))[:] = y
+        nc.createVariable("volumes", "i4", ("number_of_volumes", "number_of_vertices"))[:] = volumes
+        nc.createVariable("elevation", "f4", ("number_of_points",))[:] = elevation
+
+        time = nc.createVariable("time", "f8", ("number_of_timesteps",))
+        stage = nc.createVariable("stage", "f4", ("number_of_timesteps", "number_of_points"))
+        xmom = nc.createVariable("xmomentum", "f4", ("number_of_timesteps", "number_of_points"))
+        ymom = nc.createVariable("ymomentum", "f4", ("number_of_timesteps", "number_of_points"))
+
+        for k in range(num_timesteps):
+            front = length * (0.05 + 0.6 * k / max(1, num_timesteps - 1))
+            depth = np.clip(1.0 - radius / front, 0.0, None) * 2.0
+            time[k] = k * interval_s
+            stage[k, :] = elevation + depth
+            xmom[k, :] = 0.8 * depth
+            ymom[k, :] = 0.3 * depth
+
+    return path
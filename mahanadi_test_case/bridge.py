@@ -1,24 +1,45 @@
 import os
 import sys
+import json
 import datetime
-import requests
-from requests.auth import HTTPBasicAuth
-import anuga
+from dataclasses import replace
 from settings_loader import load_config
 from logger import log_run_metadata
 
+# anuga, netCDF4, numpy and requests are imported inside the methods that need
+# them, so re-publishing a run does not pay the ANUGA/MPI start-up cost.
+
+# GeoServer style (SLD file next to this script) for each raster product
+PRODUCT_STYLES = {
+    "max_depth": "flood_depth_style",
+    "max_velocity": "flood_velocity_style",
+    "max_hazard": "flood_hazard_style",
+    "arrival_time": "flood_arrival_style",
+    "inundation_duration": "flood_duration_style",
+}
+
+# Style for each vector layer suffix (see sww_contours.VECTOR_LAYERS)
+VECTOR_STYLES = {
+    "flood_extent": "flood_extent_style",
+    "depth_bands": "flood_depth_bands_style",
+    "flood_extent_frames": "flood_extent_style",
+    "depth_bands_frames": "flood_depth_bands_style",
+}
+
 class AnugaGeoserverBridge:
     def __init__(self, settings_path: str, script_dir: str):
         self.cfg = load_config(settings_path, script_dir)
         self.gs_url = "http://localhost:8080/geoserver/rest"
-        self.auth = HTTPBasicAuth("admin", "geoserver")
+        self.auth = ("admin", "geoserver")  # HTTP basic auth
         self.workspace = "anuga"
         
         self.target_layer = "mahanadi_dam_release_max_depth"
         self.store_name = "mahanadi_max_depth_store"
         
     def upload_style(self, style_name="flood_depth_style"):
-        style_file = os.path.join(os.path.dirname(__file__), "flood_depth_style.sld")
+        import requests
+
+        style_file = os.path.join(os.path.dirname(__file__), f"{style_name}.sld")
         
         if not os.path.exists(style_file):
             print(f"Warning: Style file not found: {style_file}")
@@ -64,7 +85,7 @@ class AnugaGeoserverBridge:
             print(f"Failed to upload style: {upload_resp.status_code} - {upload_resp.text}")
             return False
 
-    def generate_timeseries_asc(self, sww_path: str, run_id: str):
+    def plan_timeseries(self, sww_path: str, run_id: str):
         import netCDF4
         import numpy as np
         
@@ -73,14 +94,12 @@ class AnugaGeoserverBridge:
         
         print(f"Generating time series in: {output_dir}")
         
-        # Read timesteps from SWW
-        nc = netCDF4.Dataset(sww_path, "r")
-        times = nc.variables["time"][:]
-        nc.close()
-        
+        # Only the time axis is needed here
+        with netCDF4.Dataset(sww_path, "r") as nc:
+            times = np.asarray(nc.variables["time"][:], dtype=float)
         num_timesteps = len(times)
+        
         max_exports = self.cfg.postprocessing.timeseries_steps
-        cellsize = self.cfg.postprocessing.timeseries_cellsize
         
         print(f"Total timesteps: {num_timesteps}, Exporting: {max_exports}")
         
@@ -90,22 +109,26 @@ class AnugaGeoserverBridge:
         else:
             export_indices = np.linspace(0, num_timesteps - 1, max_exports, dtype=int).tolist()
         
-        # Generate ASC files
-        for i, timestep_idx in enumerate(export_indices, start=1):
-            step = f"{i:04d}"
-            asc_out = os.path.join(output_dir, f"depth_{step}.asc")
-            
-            print(f"  {i}/{len(export_indices)}: timestep {timestep_idx} -> depth_{step}.asc")
-            
-            anuga.sww2dem(
-                name_in=sww_path,
-                name_out=asc_out,
-                quantity='depth',
-                reduction=timestep_idx,
-                cellsize=cellsize,
-                verbose=False,
-            )
-        
+        # File names carry the frame's actual date/time for the mosaic time dimension
+        start = self.frame_start(run_id)
+        frames = {}
+        for timestep_idx in export_indices:
+            stamp = start + datetime.timedelta(seconds=float(times[timestep_idx]))
+            frames[timestep_idx] = os.path.join(output_dir, f"depth_{stamp:%Y%m%dT%H%M%S}.asc")
+        return output_dir, frames
+
+    def frame_start(self, run_id: str) -> datetime.datetime:
+        """Date/time of simulation t = 0, as recorded in <run_id>_frames.json when available."""
+        from output_scheduler import start_datetime
+
+        start = None
+        frame_log = os.path.join(self.cfg.paths.output_dir, f"{run_id}_frames.json")
+        if os.path.exists(frame_log):
+            with open(frame_log, "r", encoding="utf-8") as f:
+                start = json.load(f).get("start_datetime")
+        return datetime.datetime.fromisoformat(start or start_datetime(self.cfg.simulation.start_datetime, run_id))
+
+    def write_mosaic_properties(self, output_dir: str):
         # Create indexer.properties
         indexer_content = (
                 "Name=timeseries\n"
@@ -120,19 +143,90 @@ class AnugaGeoserverBridge:
         
         # Create timeregex.properties
         timeregex_content = (
-            "regex=([0-9]{4})\n"
-            "format=yyyy\n"
+            "regex=[0-9]{8}T[0-9]{6}\n"
+            "format=yyyyMMdd'T'HHmmss\n"
         )
         
         with open(os.path.join(output_dir, "timeregex.properties"), "w") as f:
             f.write(timeregex_content)
+
+    def generate_timeseries_asc(self, sww_path: str, run_id: str):
+        output_dir, frames = self.plan_timeseries(sww_path, run_id)
+        cellsize = self.cfg.postprocessing.timeseries_cellsize
+        
+        # Generate ASC files
+        for i, (timestep_idx, asc_out) in enumerate(frames.items(), start=1):
+            print(f"  {i}/{len(frames)}: timestep {timestep_idx} -> {os.path.basename(asc_out)}")
+            self.export_depth(sww_path, asc_out, reduction=timestep_idx, cellsize=cellsize)
         
-        print(f" Time series generation complete: {len(export_indices)} files")
+        self.write_mosaic_properties(output_dir)
+        
+        print(f" Time series generation complete: {len(frames)} files")
         return output_dir
 
+    def generate_products(self, sww_path: str, run_id: str, generate_timeseries: bool = False):
+        """Write every configured product (and optionally depth frames).
+
+        With the native rasterizer all products and frames come from a single
+        pass over the SWW timesteps. Returns ({product: asc_path}, timeseries_dir).
+        """
+        pp = self.cfg.postprocessing
+        outputs = {
+            product: os.path.join(self.cfg.paths.output_dir, f"{run_id}_{product}.asc")
+            for product in pp.products
+        }
+        
+        if pp.rasterizer == "anuga":
+            # sww2dem loads whole quantity arrays and rasterizes the full mesh
+            # bounding box, so memory_budget_mb and clip_to_aoi do not apply
+            skipped = [p for p in outputs if p != "max_depth"]
+            if pp.vector_products:
+                skipped.append("vector products")
+            if skipped:
+                print(f"Warning: rasterizer 'anuga' only produces max_depth; skipping {', '.join(skipped)}")
+            products = {}
+            if "max_depth" in outputs:
+                products["max_depth"] = self.export_max_depth(sww_path, outputs["max_depth"])
+            timeseries_dir = self.generate_timeseries_asc(sww_path, run_id) if generate_timeseries else None
+            return products, timeseries_dir
+        
+        from sww_raster import sww_products
+        
+        timeseries_dir, frames = None, {}
+        if generate_timeseries:
+            timeseries_dir, frames = self.plan_timeseries(sww_path, run_id)
+        
+        vectors = None
+        if pp.vector_products:
+            from sww_contours import FloodVectors
+            
+            vectors = FloodVectors(self.vector_path(run_id), run_id, pp.wet_threshold_m,
+                                   pp.depth_bands_m, self.frame_start(run_id))
+        
+        print(f"Computing {', '.join(outputs)} in one pass"
+              + (f" (+{len(frames)} depth frames)" if frames else "")
+              + (" with extent/depth-band polygons" if vectors else "") + "...")
+        products = sww_products(
+            sww_path,
+            outputs,
+            cellsize=pp.product_cellsize,
+            wet_threshold=pp.wet_threshold_m,
+            frames=frames,
+            frame_cellsize=pp.timeseries_cellsize,
+            memory_budget_mb=pp.memory_budget_mb,
+            aoi_polygon=self.aoi_polygon(),
+            vectors=vectors,
+        )
+        
+        if timeseries_dir:
+            self.write_mosaic_properties(timeseries_dir)
+            print(f" Time series generation complete: {len(frames)} files")
+        return products, timeseries_dir
+
     def deploy_timeseries_to_geoserver(self, timeseries_dir: str, run_id: str):
         import zipfile
         import tempfile
+        import requests
         
         store_name = f"{run_id}_timeseries_store"
         layer_name = f"{run_id}_timeseries"
@@ -253,67 +347,316 @@ class AnugaGeoserverBridge:
                         print(f" Style applied to time series layer")
                 
                 print(f"SUCCESS: Time series layer '{self.workspace}:{layer_name}' deployed")
-            else:
-                print(f"ERROR: GeoServer responded with {resp.status_code}: {resp.text}")
+                return True
+            print(f"ERROR: GeoServer responded with {resp.status_code}: {resp.text}")
+            return False
         
         finally:
             # Cleanup temp zip
             if os.path.exists(zip_path):
                 os.remove(zip_path)
             
-    def run_post_processing(self, target_sww_name: str = None, generate_timeseries: bool = False):
-        run_id = target_sww_name if target_sww_name else self.cfg.paths.output_file
-        sww_path = os.path.join(self.cfg.paths.output_dir, f"{run_id}.sww")
+    def deploy_vectors_to_geoserver(self, gpkg_path: str, run_id: str):
+        """Publish every layer of <run_id>_flood_vectors.gpkg from one GeoPackage store.
+
+        Frame layers get a time dimension on their ``time`` attribute. Vector
+        tiles are enabled in the layers' tile cache when GeoServer has the
+        vector tiles extension; without it the layers are still served as
+        WMS/WFS and only a warning is printed.
+        """
+        import requests
+        from sww_contours import VECTOR_LAYERS
         
-        asc_path = os.path.join(self.cfg.paths.output_dir, f"{run_id}_max_depth.asc")
+        store_name = f"{run_id}_vectors_store"
+        print(f"Deploying {os.path.basename(gpkg_path)} to GeoServer workspace: {self.workspace}...")
         
-        print(f"--- Starting Post-Processing for: {run_id} ---")
+        requests.post(f"{self.gs_url}/workspaces", json={"workspace": {"name": self.workspace}}, auth=self.auth)
         
-        if not os.path.exists(sww_path):
-            print(f"Error: Source file not found: {sww_path}")
-            return
+        upload_url = (
+            f"{self.gs_url}/workspaces/{self.workspace}/"
+            f"datastores/{store_name}/file.gpkg?configure=all"
+        )
+        with open(gpkg_path, "rb") as f:
+            resp = requests.put(
+                upload_url,
+                data=f,
+                headers={"Content-type": "application/x-sqlite3"},
+                auth=self.auth
+            )
+        if resp.status_code not in [200, 201]:
+            print(f"ERROR: GeoServer responded with {resp.status_code}: {resp.text}")
+            return False
         
-        print(f"Converting {run_id}.sww to ASCII Grid...")
-        try:
+        for suffix, (_, per_frame) in VECTOR_LAYERS.items():
+            layer_name = f"{run_id}_{suffix}"
+            feature_type = {
+                "srs": "EPSG:32645",
+                "projectionPolicy": "REPROJECT_TO_DECLARED",
+            }
+            if per_frame:
+                feature_type["metadata"] = {
+                    "entry": [
+                        {
+                            "@key": "time",
+                            "dimensionInfo": {
+                                "enabled": True,
+                                "attribute": "time",
+                                "presentation": "LIST",
+                                "units": "ISO8601",
+                                "defaultValue": {
+                                    "strategy": "MINIMUM"
+                                },
+                                "nearestMatchEnabled": True
+                            }
+                        }
+                    ]
+                }
+            
+            feature_url = f"{self.gs_url}/workspaces/{self.workspace}/datastores/{store_name}/featuretypes/{layer_name}.json"
+            update_resp = requests.put(
+                feature_url,
+                json={"featureType": feature_type},
+                headers={"Content-type": "application/json"},
+                auth=self.auth
+            )
+            if update_resp.status_code != 200:
+                print(f"WARNING: Layer '{layer_name}' update responded with {update_resp.status_code}: {update_resp.text}")
+                return False
+            
+            style_name = VECTOR_STYLES[suffix]
+            if self.upload_style(style_name):
+                style_resp = requests.put(
+                    f"{self.gs_url}/layers/{self.workspace}:{layer_name}.json",
+                    json={"layer": {"defaultStyle": {"name": f"{self.workspace}:{style_name}"}}},
+                    headers={"Content-type": "application/json"},
+                    auth=self.auth
+                )
+                if style_resp.status_code != 200:
+                    print(f"Warning: Failed to apply style: {style_resp.status_code}")
+            
+            self.enable_vector_tiles(layer_name)
+            print(f"SUCCESS: Vector layer '{self.workspace}:{layer_name}' deployed")
+        return True
+    
+    def enable_vector_tiles(self, layer_name: str):
+        """Add Mapbox vector tiles to the layer's GeoWebCache formats (needs the vector tiles extension)."""
+        import requests
+        
+        gwc_url = f"{self.gs_url.rsplit('/rest', 1)[0]}/gwc/rest/layers/{self.workspace}:{layer_name}.xml"
+        layer_xml = (
+            "<GeoServerLayer>"
+            "<enabled>true</enabled>"
+            f"<name>{self.workspace}:{layer_name}</name>"
+            "<mimeFormats>"
+            "<string>image/png</string>"
+            "<string>application/vnd.mapbox-vector-tile</string>"
+            "</mimeFormats>"
+            "<gridSubsets>"
+            "<gridSubset><gridSetName>EPSG:900913</gridSetName></gridSubset>"
+            "<gridSubset><gridSetName>EPSG:4326</gridSetName></gridSubset>"
+            "</gridSubsets>"
+            "</GeoServerLayer>"
+        )
+        # GeoServer normally creates the tile layer on publish (modify it); else add it
+        resp = requests.post(gwc_url, data=layer_xml, headers={"Content-type": "text/xml"}, auth=self.auth)
+        if resp.status_code == 404:
+            resp = requests.put(gwc_url, data=layer_xml, headers={"Content-type": "text/xml"}, auth=self.auth)
+        if resp.status_code not in [200, 201]:
+            print(f" Warning: vector tiles not enabled for '{layer_name}' ({resp.status_code}); "
+                  "is the GeoServer vector tiles extension installed?")
+            return False
+        return True
+            
+    def aoi_polygon(self):
+        """AOI ring used to clip the native rasters, or None when clipping is off."""
+        if not self.cfg.postprocessing.clip_to_aoi:
+            return None
+        if not os.path.exists(self.cfg.paths.aoi_shp_path):
+            print(f"Warning: AOI shapefile not found ({self.cfg.paths.aoi_shp_path}); rasters are not clipped")
+            return None
+        from geometry import read_polygon_from_shapefile
+
+        return read_polygon_from_shapefile(self.cfg.paths.aoi_shp_path)
+
+    def export_depth(self, sww_path: str, asc_path: str, reduction=max, cellsize: float = 10):
+        if self.cfg.postprocessing.rasterizer == "anuga":
+            import anuga
+
             anuga.sww2dem(
-                sww_path, 
-                asc_path, 
-                quantity='depth', 
-                reduction=max, 
-                cellsize=10
+                sww_path,
+                asc_path,
+                quantity='depth',
+                reduction=reduction,
+                cellsize=cellsize,
+                verbose=False,
             )
-        except Exception as e:
-            print(f" ANUGA sww2dem failed: {e}")
-            return
+        else:
+            from sww_raster import sww_to_asc
+
+            sww_to_asc(
+                sww_path,
+                asc_path,
+                quantity='depth',
+                reduction=reduction,
+                cellsize=cellsize,
+                memory_budget_mb=self.cfg.postprocessing.memory_budget_mb,
+                aoi_polygon=self.aoi_polygon(),
+            )
+        return asc_path
+
+    def export_max_depth(self, sww_path: str, asc_path: str):
+        return self.export_depth(sww_path, asc_path, reduction=max, cellsize=self.cfg.postprocessing.product_cellsize)
+
+    def existing_products(self, run_id: str, generate_timeseries: bool = False):
+        """({product: asc_path}, timeseries_dir) already on disk for ``run_id``, or None if incomplete.
 
-        print(f"Deploying ASCII Grid to GeoServer...")
+        Products written with different [postprocessing] settings (or before
+        they were stamped) count as missing.
+        """
+        from run_cache import products_key
+
+        output_dir = self.cfg.paths.output_dir
         try:
-            # Use run_id to create unique store and layer names
-            self.deploy_to_geoserver(asc_path, run_id)
-        except Exception as e:
-            print(f" X GeoServer Deployment failed: {e}")
-            
+            with open(self.products_stamp_path(run_id), "r", encoding="utf-8") as f:
+                if json.load(f).get("products_key") != products_key(self.cfg):
+                    return None
+        except (OSError, ValueError):
+            return None
+        products = {
+            product: os.path.join(output_dir, f"{run_id}_{product}.asc")
+            for product in self.cfg.postprocessing.products
+        }
+        if not all(os.path.exists(path) for path in products.values()):
+            return None
+        
+        timeseries_dir = None
         if generate_timeseries:
-            print(f"\n--- Generating Time Series for: {run_id} ---")
+            timeseries_dir = os.path.join(output_dir, f"{run_id}_timeseries")
+            if not os.path.isdir(timeseries_dir):
+                return None
+        if self.cfg.postprocessing.vector_products and self.cfg.postprocessing.rasterizer == "native" \
+                and not os.path.exists(self.vector_path(run_id)):
+            return None
+        return products, timeseries_dir
+
+    def products_stamp_path(self, run_id: str) -> str:
+        return os.path.join(self.cfg.paths.output_dir, f"{run_id}_products.json")
+
+    def vector_path(self, run_id: str) -> str:
+        return os.path.join(self.cfg.paths.output_dir, f"{run_id}_flood_vectors.gpkg")
+
+    def run_post_processing(self, target_sww_name: str = None, generate_timeseries: bool = False,
+                            deploy: bool = True, reuse_existing: bool = False, phases=None):
+        """Write the rasters, deploy them and record the run; returns the registry status.
+
+        ``phases`` are the simulation timings, stored alongside the
+        post-processing ones.
+        """
+        import time
+        from run_cache import products_key
+
+        run_id = target_sww_name if target_sww_name else self.cfg.paths.output_file
+        sww_path = os.path.join(self.cfg.paths.output_dir, f"{run_id}.sww")
+        # Log under the id actually processed, not the one minted for this bridge
+        cfg = replace(self.cfg, paths=replace(self.cfg.paths, output_file=run_id))
+        phases = dict(phases or {})
+        
+        print(f"--- Starting Post-Processing for: {run_id} ---")
+        
+        if not os.path.exists(sww_path):
+            print(f"Error: Source file not found: {sww_path}")
+            if not reuse_existing:
+                log_run_metadata(cfg, run_id, status="sww_missing", phases=phases,
+                                 error=f"Source file not found: {sww_path}")
+            return "sww_missing"
+        
+        existing = self.existing_products(run_id, generate_timeseries) if reuse_existing else None
+        if existing:
+            print(f"Reusing rasters already written for {run_id}")
+            products, timeseries_dir = existing
+        else:
+            print(f"Converting {run_id}.sww to ASCII Grids...")
+            phase_start = time.time()
             try:
-                timeseries_dir = self.generate_timeseries_asc(sww_path, run_id)
-                print(f"Deploying Time Series to GeoServer...")
-                self.deploy_timeseries_to_geoserver(timeseries_dir, run_id)
+                products, timeseries_dir = self.generate_products(sww_path, run_id, generate_timeseries)
             except Exception as e:
-                print(f"X Time series generation/deployment failed: {e}")
-        
-        log_run_metadata(self.cfg, run_id) 
+                print(f" Raster generation failed: {e}")
+                log_run_metadata(cfg, run_id, {"sww": sww_path}, status="postprocess_failed",
+                                 phases=phases, error=f"Raster generation failed: {e}")
+                return "postprocess_failed"
+            phases["rasters"] = time.time() - phase_start
 
-        print(f"--- Finished. Result saved as: {os.path.basename(asc_path)} ---")
+            with open(self.products_stamp_path(run_id), "w", encoding="utf-8") as f:
+                json.dump({"products_key": products_key(self.cfg)}, f)
+
+        failures = []
+        if deploy:
+            phase_start = time.time()
+            for product, product_path in products.items():
+                print(f"Deploying {product} to GeoServer...")
+                try:
+                    # Use run_id to create unique store and layer names
+                    if not self.deploy_to_geoserver(product_path, run_id, product):
+                        failures.append(f"{product}: rejected by GeoServer")
+                except Exception as e:
+                    print(f" X GeoServer Deployment failed: {e}")
+                    failures.append(f"{product}: {e}")
+            
+            if timeseries_dir:
+                print(f"\n--- Deploying Time Series for: {run_id} ---")
+                try:
+                    if not self.deploy_timeseries_to_geoserver(timeseries_dir, run_id):
+                        failures.append("timeseries: rejected by GeoServer")
+                except Exception as e:
+                    print(f"X Time series deployment failed: {e}")
+                    failures.append(f"timeseries: {e}")
+            
+            if self.cfg.postprocessing.vector_products and os.path.exists(self.vector_path(run_id)):
+                print(f"\n--- Deploying Flood Vectors for: {run_id} ---")
+                try:
+                    if not self.deploy_vectors_to_geoserver(self.vector_path(run_id), run_id):
+                        failures.append("vectors: rejected by GeoServer")
+                except Exception as e:
+                    print(f"X Vector deployment failed: {e}")
+                    failures.append(f"vectors: {e}")
+            phases["deploy"] = time.time() - phase_start
+
+        if failures:
+            status = "deploy_failed"
+        else:
+            status = "completed" if deploy else "processed"
+        error = "; ".join(failures) or None
+
+        if existing:
+            # Already in the history; only the deployment outcome is new
+            from run_registry import record_run
+            record_run(cfg, run_id, status, phases=phases, error=error)
+        else:
+            outputs = {"sww": sww_path, **products}
+            if timeseries_dir:
+                outputs["timeseries"] = timeseries_dir
+            for name, suffix in (("probes", "_probes.nc"), ("probes_summary", "_probes_summary.geojson"),
+                                 ("frames", "_frames.json"), ("vectors", "_flood_vectors.gpkg"),
+                                 ("mass_balance", "_mass_balance.jsonl")):
+                probe_path = os.path.join(self.cfg.paths.output_dir, f"{run_id}{suffix}")
+                if os.path.exists(probe_path):
+                    outputs[name] = probe_path
+            log_run_metadata(cfg, run_id, outputs, status=status, phases=phases, error=error)
+
+        print(f"--- Finished ({status}). Results saved as: {', '.join(os.path.basename(p) for p in products.values())} ---")
         print(f"Check your React dashboard for layer: {run_id}")
+        return status
+
+    def deploy_to_geoserver(self, file_path, run_id, product="max_depth"):
+        import requests
 
-    def deploy_to_geoserver(self, file_path, run_id):
         filename = os.path.basename(file_path)
         is_asc = file_path.lower().endswith('.asc')
         
-        # Create unique names for this run
-        store_name = f"{run_id}_store"
-        layer_name = f"{run_id}_max_depth"
+        # Create unique names for this run (max depth keeps its original store name)
+        store_name = f"{run_id}_store" if product == "max_depth" else f"{run_id}_{product}_store"
+        layer_name = f"{run_id}_{product}"
+        style_name = PRODUCT_STYLES.get(product, "flood_depth_style")
         
         if is_asc:
             content_type = "application/arcgrid"
@@ -369,12 +712,12 @@ class AnugaGeoserverBridge:
             
             if update_resp.status_code == 200:
                 print(f"SUCCESS: Layer '{self.workspace}:{layer_name}' configured with EPSG:32645")
-                if self.upload_style():
+                if self.upload_style(style_name):
                     style_url = f"{self.gs_url}/layers/{self.workspace}:{layer_name}.json"
                     style_data = {
                         "layer": {
                             "defaultStyle": {
-                                "name": f"{self.workspace}:flood_depth_style"
+                                "name": f"{self.workspace}:{style_name}"
                             }
                         }
                     }
@@ -390,10 +733,11 @@ class AnugaGeoserverBridge:
                         print(f"Style applied to layer '{layer_name}'")
                     else:
                         print(f"Warning: Failed to apply style: {style_resp.status_code}")
-            else:
-                print(f"WARNING: SRS update responded with {update_resp.status_code}: {update_resp.text}")
+                return True
+            print(f"WARNING: SRS update responded with {update_resp.status_code}: {update_resp.text}")
         else:
             print(f"ERROR: GeoServer responded with {resp.status_code}: {resp.text}")
+        return False
 
 if __name__ == "__main__":
     import argparse
@@ -401,18 +745,21 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Post-process ANUGA output and deploy to GeoServer")
     parser.add_argument("run_id", nargs="?", help="Name of the .sww file to process (without extension)")
     parser.add_argument("--timeseries", action="store_true", help="Generate and deploy time series layer")
+    parser.add_argument("--no-deploy", action="store_true", help="Only write the rasters, do not contact GeoServer")
+    parser.add_argument("--settings", help="settings.toml to use (default: the one next to bridge.py)")
     
     args = parser.parse_args()
     
     current_dir = os.path.dirname(os.path.abspath(__file__))
-    settings = os.path.join(current_dir, "settings.toml")
+    settings = args.settings or os.path.join(current_dir, "settings.toml")
     
-    bridge = AnugaGeoserverBridge(settings, current_dir)
+    bridge = AnugaGeoserverBridge(settings, os.path.dirname(os.path.abspath(settings)))
     
     # Determine if we should generate timeseries
     generate_ts = args.timeseries or bridge.cfg.postprocessing.generate_timeseries
     
-    if args.run_id:
-        bridge.run_post_processing(target_sww_name=args.run_id, generate_timeseries=generate_ts)
-    else:
-        bridge.run_post_processing(generate_timeseries=generate_ts)
\ No newline at end of file
+    bridge.run_post_processing(
+        target_sww_name=args.run_id,
+        generate_timeseries=generate_ts,
+        deploy=not args.no_deploy,
+    )
\ No newline at end of file
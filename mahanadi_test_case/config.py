@@ -1,6 +1,10 @@
 from __future__ import annotations
 
+import datetime
 from dataclasses import dataclass
+from typing import Tuple
+
+RASTER_PRODUCTS = ("max_depth", "max_velocity", "max_hazard", "arrival_time", "inundation_duration")
 
 
 @dataclass(frozen=True)
@@ -19,6 +23,12 @@ class MeshConfig:
     min_angle_deg: float
     use_cached_mesh: bool
     mesh_cache_dir: str
+    refinement: str
+    background_triangle_area_m2: float
+    channel_min_area_km2: float
+    steep_slope: float
+    channel_buffer_m: float
+    dam_buffer_m: float
 
 
 @dataclass(frozen=True)
@@ -34,6 +44,13 @@ class SimulationConfig:
     yieldstep_s: float
     cfl: float
     print_simulation_logs: bool
+    output_mode: str
+    min_output_interval_s: float
+    max_output_interval_s: float
+    wet_area_change: float
+    depth_change: float
+    start_datetime: str
+    mass_balance_threshold_pct: float
 
 
 @dataclass(frozen=True)
@@ -54,17 +71,33 @@ class RainfallConfig:
 @dataclass(frozen=True)
 class ParallelConfig:
     enable: bool
+    setup_mode: str
     
 @dataclass(frozen=True)
 class PostprocessingConfig:
     generate_timeseries: bool
     timeseries_steps: int
     timeseries_cellsize: float
+    rasterizer: str
+    products: Tuple[str, ...]
+    product_cellsize: float
+    wet_threshold_m: float
+    memory_budget_mb: float
+    clip_to_aoi: bool
+    vector_products: bool
+    depth_bands_m: Tuple[float, ...]
     
 @dataclass(frozen=True)
 class BoundaryConfig:
     use_polygon_boundary: bool
     boundary_type: str
+    simplify_factor: float
+    
+@dataclass(frozen=True)
+class ProbesConfig:
+    shapefiles: Tuple[str, ...]
+    buffer_steps: int
+    interval_s: float
     
 @dataclass(frozen=True)
 class Config:
@@ -77,12 +110,34 @@ class Config:
     parallel: ParallelConfig
     postprocessing: PostprocessingConfig
     boundary: BoundaryConfig
+    probes: ProbesConfig
 
 def validate_config(cfg: Config) -> None:
     """Fail early with friendly errors if settings are invalid."""
     if cfg.mesh.max_triangle_area_m2 <= 0:
         raise ValueError("mesh.max_triangle_area_m2 must be > 0")
 
+    if cfg.mesh.refinement not in ["none", "dem"]:
+        raise ValueError("mesh.refinement must be 'none' or 'dem'")
+
+    if cfg.mesh.refinement == "dem":
+        if cfg.mesh.background_triangle_area_m2 < cfg.mesh.max_triangle_area_m2:
+            raise ValueError("mesh.background_triangle_area_m2 must be >= mesh.max_triangle_area_m2")
+
+        for field_name, value in [
+            ("mesh.channel_min_area_km2", cfg.mesh.channel_min_area_km2),
+            ("mesh.steep_slope", cfg.mesh.steep_slope),
+        ]:
+            if value <= 0:
+                raise ValueError(f"{field_name} must be > 0")
+
+        for field_name, value in [
+            ("mesh.channel_buffer_m", cfg.mesh.channel_buffer_m),
+            ("mesh.dam_buffer_m", cfg.mesh.dam_buffer_m),
+        ]:
+            if value < 0:
+                raise ValueError(f"{field_name} must be >= 0")
+
     if cfg.dam_release.inlet_radius_m <= 0:
         raise ValueError("dam_release.inlet_radius_m must be > 0")
 
@@ -98,6 +153,28 @@ def validate_config(cfg: Config) -> None:
     if cfg.simulation.cfl <= 0:
         raise ValueError("simulation.cfl must be > 0")
 
+    if cfg.simulation.mass_balance_threshold_pct <= 0:
+        raise ValueError("simulation.mass_balance_threshold_pct must be > 0")
+
+    if cfg.simulation.output_mode not in ["fixed", "adaptive"]:
+        raise ValueError("simulation.output_mode must be 'fixed' or 'adaptive'")
+
+    if cfg.simulation.output_mode == "adaptive":
+        if cfg.simulation.min_output_interval_s <= 0:
+            raise ValueError("simulation.min_output_interval_s must be > 0")
+
+        if cfg.simulation.max_output_interval_s < cfg.simulation.min_output_interval_s:
+            raise ValueError("simulation.max_output_interval_s must be >= simulation.min_output_interval_s")
+
+        if cfg.simulation.wet_area_change <= 0 or cfg.simulation.depth_change <= 0:
+            raise ValueError("simulation.wet_area_change and simulation.depth_change must be > 0")
+
+    if cfg.simulation.start_datetime:
+        try:
+            datetime.datetime.fromisoformat(cfg.simulation.start_datetime)
+        except ValueError:
+            raise ValueError("simulation.start_datetime must be an ISO date/time, e.g. 2025-08-01T06:00:00")
+
     if cfg.initial_conditions.friction_mannings_n < 0:
         raise ValueError("initial_conditions.friction_mannings_n must be >= 0")
 
@@ -115,5 +192,37 @@ def validate_config(cfg: Config) -> None:
             if minutes < 0:
                 raise ValueError(f"{field_name} must be >= 0")
             
+    if cfg.postprocessing.rasterizer not in ["native", "anuga"]:
+        raise ValueError("postprocessing.rasterizer must be 'native' or 'anuga'")
+
+    unknown_products = set(cfg.postprocessing.products) - set(RASTER_PRODUCTS)
+    if unknown_products:
+        raise ValueError(f"postprocessing.products has unknown entries: {sorted(unknown_products)}")
+
+    if cfg.postprocessing.product_cellsize <= 0:
+        raise ValueError("postprocessing.product_cellsize must be > 0")
+
+    if cfg.postprocessing.wet_threshold_m <= 0:
+        raise ValueError("postprocessing.wet_threshold_m must be > 0")
+
+    if cfg.postprocessing.memory_budget_mb <= 0:
+        raise ValueError("postprocessing.memory_budget_mb must be > 0")
+
+    bands = (cfg.postprocessing.wet_threshold_m,) + cfg.postprocessing.depth_bands_m
+    if any(hi <= lo for lo, hi in zip(bands, bands[1:])):
+        raise ValueError("postprocessing.depth_bands_m must be ascending and above wet_threshold_m")
+
+    if cfg.parallel.setup_mode not in ["full", "lean", "streamed"]:
+        raise ValueError("parallel.setup_mode must be 'full', 'lean' or 'streamed'")
+
     if cfg.boundary.boundary_type not in ["transmissive", "reflective"]:
-        raise ValueError("boundary.boundary_type must be 'transmissive' or 'reflective'")
\ No newline at end of file
+        raise ValueError("boundary.boundary_type must be 'transmissive' or 'reflective'")
+
+    if cfg.boundary.simplify_factor < 0:
+        raise ValueError("boundary.simplify_factor must be >= 0")
+
+    if cfg.probes.buffer_steps < 1:
+        raise ValueError("probes.buffer_steps must be >= 1")
+
+    if cfg.probes.interval_s < 0:
+        raise ValueError("probes.interval_s must be >= 0")
\ No newline at end of file
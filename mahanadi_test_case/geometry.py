@@ -0,0 +1,344 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import shapefile
+
+# Bump when prepare_geometry output changes so stale caches are ignored
+GEOMETRY_CACHE_VERSION = 1
+
+
+# =============================================================================
+# Shapefile readers
+# =============================================================================
+
+def read_first_point(shp_path: str) -> Tuple[float, float]:
+    sf = shapefile.Reader(shp_path)
+    shapes = sf.shapes()
+
+    if not shapes:
+        raise ValueError("Shapefile has no features")
+
+    shp = shapes[0]
+
+    if shp.shapeType not in (shapefile.POINT, shapefile.POINTZ, shapefile.POINTM):
+        raise ValueError("Expected point shapefile")
+
+    x, y = shp.points[0]
+    return float(x), float(y)
+
+def read_polygon_parts(shp_path: str) -> List[List[Tuple[float, float]]]:
+    """Every ring of every polygon feature, each closed (first == last)."""
+    sf = shapefile.Reader(shp_path)
+    shapes = sf.shapes()
+
+    if not shapes:
+        raise ValueError("Shapefile has no features")
+
+    rings = []
+    for shp in shapes:
+        if shp.shapeType not in (shapefile.POLYGON, shapefile.POLYGONZ, shapefile.POLYGONM):
+            raise ValueError(f"Expected polygon shapefile, got shapeType {shp.shapeType}")
+
+        bounds = list(shp.parts) + [len(shp.points)]
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            ring = [(float(x), float(y)) for x, y in shp.points[start:stop]]
+            if len(ring) < 3:
+                continue
+            if ring[0] != ring[-1]:
+                ring.append(ring[0])
+            rings.append(ring)
+
+    if not rings:
+        raise ValueError("Shapefile has no polygon rings")
+    return rings
+
+def read_polygon_from_shapefile(shp_path: str) -> List[Tuple[float, float]]:
+    """Largest ring of the AOI shapefile (multi-part inputs keep their main part)."""
+    rings = read_polygon_parts(shp_path)
+    return max(rings, key=lambda ring: abs(ring_area(ring)))
+
+# =============================================================================
+# Point-in-polygon
+# =============================================================================
+
+def polygon_edges(polygon: Sequence[Tuple[float, float]]) -> Tuple[np.ndarray, ...]:
+    """(x0, y0, x1, y1) arrays for every edge of a closed ring."""
+    ring = np.asarray(polygon, dtype=float)
+    if not np.array_equal(ring[0], ring[-1]):
+        ring = np.vstack([ring, ring[:1]])
+    return ring[:-1, 0], ring[:-1, 1], ring[1:, 0], ring[1:, 1]
+
+
+def scanline_crossings(polygon: Sequence[Tuple[float, float]], y: np.ndarray) -> List[np.ndarray]:
+    """Sorted x positions where each horizontal line ``y[i]`` crosses the polygon.
+
+    Uses the half-open rule (y0 <= y < y1) so vertices on a scanline are
+    counted once; consecutive pairs of crossings bound the inside spans.
+    """
+    x0, y0, x1, y1 = polygon_edges(polygon)
+    y = np.asarray(y, dtype=float)
+
+    lo, hi = np.minimum(y0, y1), np.maximum(y0, y1)
+    crosses = (y[:, np.newaxis] >= lo) & (y[:, np.newaxis] < hi)
+    rows, edges = np.nonzero(crosses)
+
+    t = (y[rows] - y0[edges]) / (y1[edges] - y0[edges])
+    xs = x0[edges] + t * (x1[edges] - x0[edges])
+
+    order = np.lexsort((xs, rows))
+    splits = np.searchsorted(rows[order], np.arange(1, len(y)))
+    return np.split(xs[order], splits)
+
+
+def points_in_polygon(x: np.ndarray, y: np.ndarray, polygon: Sequence[Tuple[float, float]],
+                      max_elements: int = 4_000_000) -> np.ndarray:
+    """Even-odd test of many points against one ring, vectorised over edges."""
+    x0, y0, x1, y1 = polygon_edges(polygon)
+    x = np.atleast_1d(np.asarray(x, dtype=float))
+    y = np.atleast_1d(np.asarray(y, dtype=float))
+
+    # Horizontal edges never cross a horizontal ray
+    sloped = y0 != y1
+    x0, y0, x1, y1 = x0[sloped], y0[sloped], x1[sloped], y1[sloped]
+    inv_slope = (x1 - x0) / (y1 - y0)
+
+    # (points x edges) temporaries are kept to about max_elements entries
+    chunk_size = max(1, max_elements // max(1, len(x0)))
+    inside = np.zeros(len(x), dtype=bool)
+    for start in range(0, len(x), chunk_size):
+        px = x[start:start + chunk_size, np.newaxis]
+        py = y[start:start + chunk_size, np.newaxis]
+        spans = (y0 <= py) != (y1 <= py)
+        crossing = px < x0 + (py - y0) * inv_slope
+        inside[start:start + chunk_size] = np.count_nonzero(spans & crossing, axis=1) % 2 == 1
+    return inside
+
+
+def ring_area(ring: Sequence[Tuple[float, float]]) -> float:
+    """Signed shoelace area: positive for counter-clockwise rings."""
+    x0, y0, x1, y1 = polygon_edges(ring)
+    return 0.5 * float(np.sum(x0 * y1 - x1 * y0))
+
+
+# =============================================================================
+# Simplification
+# =============================================================================
+
+def segments_cross(p0: np.ndarray, p1: np.ndarray, q0: np.ndarray, q1: np.ndarray) -> np.ndarray:
+    """Proper crossings between segments p0-p1 and q0-q1 (broadcasting, shape (..., 2))."""
+    def cross(o, a, b):
+        return (a[..., 0] - o[..., 0]) * (b[..., 1] - o[..., 1]) - (a[..., 1] - o[..., 1]) * (b[..., 0] - o[..., 0])
+
+    d1, d2 = cross(p0, p1, q0), cross(p0, p1, q1)
+    d3, d4 = cross(q0, q1, p0), cross(q0, q1, p1)
+    return (d1 * d2 < 0) & (d3 * d4 < 0)
+
+
+def _point_segment_distance(points: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    ab = b - a
+    length2 = float(np.dot(ab, ab))
+    if length2 == 0.0:
+        return np.hypot(*(points - a).T)
+    t = np.clip(((points - a) @ ab) / length2, 0.0, 1.0)
+    return np.hypot(*(points - (a + t[:, np.newaxis] * ab)).T)
+
+
+def _self_crossings(ring: np.ndarray, max_elements: int = 4_000_000) -> np.ndarray:
+    """Indices of segments of a closed ring that properly cross another segment."""
+    a, b = ring[:-1], ring[1:]
+    bad = np.zeros(len(a), dtype=bool)
+    chunk = max(1, max_elements // max(1, len(a)))
+    for start in range(0, len(a), chunk):
+        hits = segments_cross(a[start:start + chunk, np.newaxis], b[start:start + chunk, np.newaxis], a, b)
+        bad[start:start + chunk] |= hits.any(axis=1)
+    return np.flatnonzero(bad)
+
+
+def simplify_ring(ring: Sequence[Tuple[float, float]], tolerance: float,
+                  obstacles: Optional[np.ndarray] = None, max_repairs: int = 20) -> List[Tuple[float, float]]:
+    """Douglas-Peucker that never lets a shortcut cross the original outline.
+
+    A span is replaced by its chord only when every dropped vertex is within
+    ``tolerance`` and the chord crosses neither the original ring nor the
+    ``obstacles`` segments ((m, 2, 2) array, e.g. the other rings). Any
+    crossings left between chords are removed by restoring vertices, so
+    the result is a simple ring whenever the input was.
+    """
+    pts = np.asarray(ring, dtype=float)
+    if np.array_equal(pts[0], pts[-1]):
+        pts = pts[:-1]
+    n = len(pts)
+    if tolerance <= 0 or n <= 4:
+        return [tuple(p) for p in np.vstack([pts, pts[:1]])]
+
+    closed = np.vstack([pts, pts[:1]])
+    seg_a, seg_b = closed[:-1], closed[1:]
+    if obstacles is not None and len(obstacles):
+        obs_a, obs_b = obstacles[:, 0], obstacles[:, 1]
+    else:
+        obs_a = obs_b = np.zeros((0, 2))
+
+    def chord_ok(i: int, j: int) -> bool:
+        # Ring segments other than the span itself and its two neighbours
+        others = np.ones(n, dtype=bool)
+        others[max(0, i - 1):min(n, j + 1)] = False
+        if i == 0:
+            others[n - 1] = False
+        if j == n:
+            others[0] = False
+        a, b = closed[i], closed[j]
+        if segments_cross(a, b, seg_a[others], seg_b[others]).any():
+            return False
+        return not segments_cross(a, b, obs_a, obs_b).any()
+
+    keep = np.zeros(n + 1, dtype=bool)
+    far = int(np.argmax(np.hypot(*(pts - pts[0]).T)))
+    keep[[0, far, n]] = True
+
+    stack = [(0, far), (far, n)]
+    while stack:
+        i, j = stack.pop()
+        if j - i < 2:
+            continue
+        d = _point_segment_distance(closed[i + 1:j], closed[i], closed[j])
+        k = i + 1 + int(np.argmax(d))
+        if d.max() > tolerance or not chord_ok(i, j):
+            keep[k] = True
+            stack.extend([(i, k), (k, j)])
+
+    # Chords can still cross each other; restore the farthest vertex of each
+    # offending span until none do (bounded, in case the input self-crosses)
+    for _ in range(max_repairs):
+        idx = np.flatnonzero(keep)
+        bad = _self_crossings(closed[idx])
+        if not len(bad):
+            break
+        for s in bad:
+            i, j = idx[s], idx[s + 1]
+            if j - i >= 2:
+                d = _point_segment_distance(closed[i + 1:j], closed[i], closed[j])
+                keep[i + 1 + int(np.argmax(d))] = True
+        if np.array_equal(idx, np.flatnonzero(keep)):
+            break
+
+    return [tuple(map(float, p)) for p in closed[keep]]
+
+
+# =============================================================================
+# Domain geometry preprocessing
+# =============================================================================
+
+@dataclass(frozen=True)
+class DomainGeometry:
+    """Mesher-ready AOI: one exterior ring, holes and the dam point."""
+    bounding_polygon: List[Tuple[float, float]]
+    interior_holes: List[List[Tuple[float, float]]]
+    dam_xy: Tuple[float, float]
+    tolerance_m: float
+    parts: int
+    dropped_parts: int
+    original_segments: int
+    segments: int
+
+
+def _file_digest(paths: Sequence[str]) -> str:
+    digest = hashlib.sha1()
+    for path in paths:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _segments(rings: Sequence[Sequence[Tuple[float, float]]]) -> np.ndarray:
+    """(m, 2, 2) array of the edges of closed rings."""
+    if not rings:
+        return np.zeros((0, 2, 2))
+    return np.concatenate([
+        np.stack([np.asarray(r, dtype=float)[:-1], np.asarray(r, dtype=float)[1:]], axis=1) for r in rings
+    ])
+
+
+def prepare_geometry(aoi_shp_path: str, dam_shp_path: str, tolerance_m: float,
+                     cache_dir: Optional[str] = None) -> DomainGeometry:
+    """Read, validate and simplify the AOI and dam shapefiles once.
+
+    The exterior is the ring containing the dam (the largest ring if none
+    does); rings inside it become holes and disjoint parts are dropped.
+    Rings are simplified to ``tolerance_m`` without changing their topology.
+    Results are cached in ``cache_dir`` keyed on the shapefile contents.
+    """
+    cache_path = None
+    if cache_dir:
+        stems = [os.path.splitext(p)[0] for p in (aoi_shp_path, dam_shp_path)]
+        key = _file_digest([f"{stem}.shp" for stem in stems])
+        cache_path = os.path.join(
+            cache_dir, f"geometry_v{GEOMETRY_CACHE_VERSION}_{key[:16]}_{tolerance_m:g}.json"
+        )
+        if os.path.exists(cache_path):
+            with open(cache_path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+            return DomainGeometry(
+                bounding_polygon=[tuple(p) for p in raw["bounding_polygon"]],
+                interior_holes=[[tuple(p) for p in hole] for hole in raw["interior_holes"]],
+                dam_xy=tuple(raw["dam_xy"]),
+                **{k: raw[k] for k in ("tolerance_m", "parts", "dropped_parts", "original_segments", "segments")},
+            )
+
+    dam_x, dam_y = read_first_point(dam_shp_path)
+    rings = read_polygon_parts(aoi_shp_path)
+
+    # Of the rings containing the dam the largest is the exterior; a smaller
+    # one would be an island inside a hole
+    contains_dam = [bool(points_in_polygon([dam_x], [dam_y], ring)[0]) for ring in rings]
+    if any(contains_dam):
+        candidates = [r for r, inside in zip(rings, contains_dam) if inside]
+    else:
+        candidates = rings
+    exterior = max(candidates, key=lambda ring: abs(ring_area(ring)))
+
+    others = [ring for ring in rings if ring is not exterior]
+    probes = np.array([ring[0] for ring in others]) if others else np.zeros((0, 2))
+    inside = points_in_polygon(probes[:, 0], probes[:, 1], exterior) if others else np.zeros(0, bool)
+    holes = [ring for ring, keep in zip(others, inside) if keep]
+
+    in_hole = any(points_in_polygon([dam_x], [dam_y], hole)[0] for hole in holes)
+    if not points_in_polygon([dam_x], [dam_y], exterior)[0] or in_hole:
+        raise ValueError(f"Dam point ({dam_x:.1f}, {dam_y:.1f}) is outside the AOI polygon")
+
+    original_segments = sum(len(ring) - 1 for ring in [exterior] + holes)
+
+    simplified_exterior = simplify_ring(exterior, tolerance_m, obstacles=_segments(holes))
+    simplified_holes = []
+    for k, hole in enumerate(holes):
+        obstacles = _segments([simplified_exterior] + simplified_holes + holes[k + 1:])
+        simplified_holes.append(simplify_ring(hole, tolerance_m, obstacles=obstacles))
+
+    # Simplification may move the outline past the dam; keep the input then
+    if not points_in_polygon([dam_x], [dam_y], simplified_exterior)[0] or any(
+        points_in_polygon([dam_x], [dam_y], hole)[0] for hole in simplified_holes
+    ):
+        print("Warning: simplified AOI no longer contains the dam; using the original outline")
+        simplified_exterior, simplified_holes = exterior, holes
+
+    geometry = DomainGeometry(
+        bounding_polygon=simplified_exterior,
+        interior_holes=simplified_holes,
+        dam_xy=(dam_x, dam_y),
+        tolerance_m=float(tolerance_m),
+        parts=len(rings),
+        dropped_parts=len(others) - len(holes),
+        original_segments=original_segments,
+        segments=sum(len(ring) - 1 for ring in [simplified_exterior] + simplified_holes),
+    )
+
+    if cache_path:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(cache_path, "w", encoding="utf-8") as f:
+            json.dump(asdict(geometry), f)
+    return geometry
@@ -2,9 +2,12 @@ import os
 import json
 import datetime
 from dataclasses import asdict
+from typing import Dict, Optional
 from config import Config
 
-def log_run_metadata(cfg: Config, run_id: str):
+def log_run_metadata(cfg: Config, run_id: str, outputs: Optional[Dict[str, str]] = None,
+                     status: str = "completed", phases: Optional[Dict[str, float]] = None,
+                     error: Optional[str] = None):
 
     log_dir = cfg.paths.output_dir
     history_file = os.path.join(log_dir, "simulation_history.jsonl")
@@ -12,16 +15,28 @@ def log_run_metadata(cfg: Config, run_id: str):
     parts = run_id.split('_')
     timestamp_str = "_".join(parts[-2:]) if len(parts) >= 2 else "unknown"
     
+    try:
+        from run_cache import cache_key
+        key = cache_key(cfg)
+    except OSError as e:
+        print(f"Warning: Could not compute cache key: {e}")
+        key = None
+
     entry = {
         "timestamp": timestamp_str,
         "run_id": run_id,
+        "cache_key": key,
+        "outputs": outputs or {},
+        "phases": phases or {},
         "parameters": asdict(cfg),
         "environment": {
             "hpc": "Param Shavak",
             "os": "BOSS-OS",
-            "status": "Completed"
+            "status": status
         }
     }
+    if error:
+        entry["error"] = error
 
     try:
         with open(history_file, "a") as f:
@@ -33,4 +48,11 @@ def log_run_metadata(cfg: Config, run_id: str):
             
         print(f"Metadata logged to: {history_file}")
     except Exception as e:
-        print(f"Warning: Could not write metadata: {e}")
\ No newline at end of file
+        print(f"Warning: Could not write metadata: {e}")
+
+    try:
+        from run_registry import record_run, registry_path
+        record_run(cfg, run_id, status, phases=phases, outputs=outputs, cache_key=key, error=error)
+        print(f"Run registered in: {registry_path(log_dir)} (status: {status})")
+    except Exception as e:
+        print(f"Warning: Could not update run registry: {e}")
@@ -0,0 +1,107 @@
+"""When to store an SWW frame: on flow change rather than a fixed yieldstep.
+
+The state is checked every ``min_interval_s`` of simulated time and a frame
+is stored when, since the last stored frame,
+
+* the wet/dry state flipped over more than ``wet_area_change`` of the
+  wetted area (area of cells that flipped / area wet in either frame), or
+* the area-weighted L2 change in depth exceeds ``depth_change`` of the
+  previous frame's depth norm,
+
+or when ``max_interval_s`` has passed (rounded up to the next check). The
+first and last checks always store. The metrics are sums over triangles, so
+in parallel each rank passes its own full triangles and ``reduce`` adds the
+partial sums across ranks, giving every rank the same decision.
+"""
+from __future__ import annotations
+
+import json
+import math
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+
+def change_sums(depth: np.ndarray, last_depth: np.ndarray, area: np.ndarray,
+                wet_threshold: float) -> np.ndarray:
+    """[flipped area, wetted area, sum a*dh^2, sum a*h_last^2] for one rank's triangles."""
+    wet = depth >= wet_threshold
+    last_wet = last_depth >= wet_threshold
+    diff = depth - last_depth
+    return np.array([
+        float(area[wet ^ last_wet].sum()),
+        float(area[wet | last_wet].sum()),
+        float(np.dot(area, diff * diff)),
+        float(np.dot(area, last_depth * last_depth)),
+    ])
+
+
+class OutputScheduler:
+    def __init__(self, min_interval_s: float, max_interval_s: float, wet_area_change: float,
+                 depth_change: float, wet_threshold: float, final_time: float,
+                 reduce: Optional[Callable[[np.ndarray], np.ndarray]] = None):
+        self.min_interval_s = min_interval_s
+        self.max_interval_s = max_interval_s
+        self.wet_area_change = wet_area_change
+        self.depth_change = depth_change
+        self.wet_threshold = wet_threshold
+        self.final_time = final_time
+        self.reduce = reduce or (lambda sums: sums)
+
+        self.last_time: Optional[float] = None
+        self.last_depth: Optional[np.ndarray] = None
+        self.frames: List[Tuple[float, str]] = []
+
+    def check(self, t: float, depth: np.ndarray, area: np.ndarray) -> Optional[str]:
+        """Why a frame should be stored at ``t`` (None: skip it).
+
+        Must be called on every rank at every check, since the decision may
+        need a collective reduction.
+        """
+        if self.last_depth is None:
+            reason = "start"
+        elif t >= self.final_time - 1e-6:
+            reason = "end"
+        else:
+            flipped, wetted, diff2, norm2 = self.reduce(
+                change_sums(depth, self.last_depth, area, self.wet_threshold)
+            )
+            wet_change = flipped / wetted if wetted > 0 else 0.0
+            if norm2 > 0:
+                depth_change = math.sqrt(diff2 / norm2)
+            else:
+                depth_change = math.inf if diff2 > 0 else 0.0
+
+            if wet_change > self.wet_area_change:
+                reason = f"wet area {wet_change:.1%}"
+            elif depth_change > self.depth_change:
+                reason = f"depth {depth_change:.1%}"
+            elif t - self.last_time >= self.max_interval_s - 1e-6:
+                reason = "max interval"
+            else:
+                return None
+
+        self.last_time = t
+        self.last_depth = np.array(depth, dtype=float, copy=True)
+        self.frames.append((t, reason))
+        return reason
+
+
+def start_datetime(configured: str, run_id: str) -> str:
+    """ISO date/time of t = 0: the configured one, else the time in the run id."""
+    if configured:
+        return configured
+    from run_registry import run_started_at
+
+    return run_started_at(run_id) or "1970-01-01T00:00:00"
+
+
+def write_frame_log(path: str, mode: str, start: str, frames: List[Tuple[float, str]]) -> None:
+    """``<run_id>_frames.json``: the stored frame times, used for the GeoServer time dimension."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "mode": mode,
+            "start_datetime": start,
+            "times_s": [t for t, _ in frames],
+            "reasons": [reason for _, reason in frames],
+        }, f, indent=1)
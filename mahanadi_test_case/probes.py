@@ -0,0 +1,406 @@
+"""Point gauges and cross-section discharge sampled at every internal timestep.
+
+Probes come from point and polyline shapefiles. After ``distribute`` every
+rank locates the probes on its own full (non-ghost) triangles once and keeps
+the owning triangle and barycentric weights, so a sample is a handful of
+fancy-indexed reads of the vertex values:
+
+* points: stage, depth and x/y velocity interpolated at the gauge;
+* lines: the line is cut into pieces per triangle and the normal unit-width
+  discharge at each piece midpoint (exact for the linear reconstruction)
+  times the piece length is summed. Positive discharge crosses the line
+  from its left to its right, looking along the digitised direction.
+  A line running exactly along mesh edges is counted on both sides, so
+  digitise cross-sections across the flow, not along breaklines.
+
+Samples go into a fixed-size buffer per rank that is appended to a raw
+file whenever it fills. After evolve, rank 0 merges the rank files into
+``<run_id>_probes.nc`` and writes ``<run_id>_probes_summary.geojson``
+(peaks, timings and volumes) for the dashboard.
+"""
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import shapefile
+
+from sww_raster import VELOCITY_MIN_DEPTH
+
+# Barycentric weights this far below zero still count as inside (edge points)
+_INSIDE_TOLERANCE = 1e-9
+
+# Per point probe columns in the sample buffer
+POINT_QUANTITIES = ("stage", "depth", "xvelocity", "yvelocity")
+
+_NAME_FIELDS = ("name", "Name", "NAME", "label", "id")
+
+
+@dataclass
+class ProbeFeatures:
+    """Probe geometry read from the shapefiles (identical on every rank)."""
+    point_names: List[str] = field(default_factory=list)
+    points: List[Tuple[float, float]] = field(default_factory=list)
+    line_names: List[str] = field(default_factory=list)
+    lines: List[List[Tuple[float, float]]] = field(default_factory=list)
+
+
+def read_probe_features(shp_paths: Sequence[str]) -> ProbeFeatures:
+    """Points and polylines from each shapefile, named by their ``name`` attribute."""
+    features = ProbeFeatures()
+    for shp_path in shp_paths:
+        sf = shapefile.Reader(shp_path)
+        field_names = [f[0] for f in sf.fields[1:]]
+        name_field = next((f for f in _NAME_FIELDS if f in field_names), None)
+        stem = os.path.splitext(os.path.basename(shp_path))[0]
+
+        for i, shape_record in enumerate(sf.iterShapeRecords()):
+            shape = shape_record.shape
+            name = str(shape_record.record[name_field]) if name_field else f"{stem}_{i}"
+            if shape.shapeType in (shapefile.POINT, shapefile.POINTZ, shapefile.POINTM):
+                x, y = shape.points[0][:2]
+                features.point_names.append(name)
+                features.points.append((float(x), float(y)))
+            elif shape.shapeType in (shapefile.POLYLINE, shapefile.POLYLINEZ, shapefile.POLYLINEM):
+                parts = list(shape.parts) + [len(shape.points)]
+                # Multi-part lines become one probe per part
+                for k in range(len(parts) - 1):
+                    vertices = [(float(p[0]), float(p[1])) for p in shape.points[parts[k]:parts[k + 1]]]
+                    if len(vertices) >= 2:
+                        features.line_names.append(name if len(parts) == 2 else f"{name}_{k}")
+                        features.lines.append(vertices)
+            else:
+                raise ValueError(f"{shp_path}: probes must be points or polylines")
+    return features
+
+
+def barycentric_weights(triangles_xy: np.ndarray, px: float, py: float) -> np.ndarray:
+    """(n, 3) weights of point (px, py) in each of the (n, 3, 2) triangles."""
+    x0, y0 = triangles_xy[:, 0, 0], triangles_xy[:, 0, 1]
+    x1, y1 = triangles_xy[:, 1, 0], triangles_xy[:, 1, 1]
+    x2, y2 = triangles_xy[:, 2, 0], triangles_xy[:, 2, 1]
+    det = (y1 - y2) * (x0 - x2) + (x2 - x1) * (y0 - y2)
+    det = np.where(det == 0.0, np.nan, det)
+    w0 = ((y1 - y2) * (px - x2) + (x2 - x1) * (py - y2)) / det
+    w1 = ((y2 - y0) * (px - x2) + (x0 - x2) * (py - y2)) / det
+    return np.column_stack([w0, w1, 1.0 - w0 - w1])
+
+
+def locate_points(triangles_xy: np.ndarray, points: Sequence[Tuple[float, float]]
+                  ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(probe ids found, owning triangle, (n, 3) weights) for the points inside the triangles."""
+    lo, hi = triangles_xy.min(axis=1), triangles_xy.max(axis=1)
+    found, owners, weights = [], [], []
+    for i, (px, py) in enumerate(points):
+        candidates = np.flatnonzero(
+            (lo[:, 0] <= px) & (px <= hi[:, 0]) & (lo[:, 1] <= py) & (py <= hi[:, 1])
+        )
+        if candidates.size == 0:
+            continue
+        w = barycentric_weights(triangles_xy[candidates], px, py)
+        inside = np.flatnonzero(np.all(w >= -_INSIDE_TOLERANCE, axis=1))
+        if inside.size:
+            found.append(i)
+            owners.append(candidates[inside[0]])
+            weights.append(w[inside[0]])
+    return (np.asarray(found, dtype=np.int64), np.asarray(owners, dtype=np.int64),
+            np.asarray(weights, dtype=float).reshape(-1, 3))
+
+
+def clip_segment(triangles_xy: np.ndarray, p0: np.ndarray, p1: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Entry/exit parameters of segment p0->p1 in each triangle (exit <= entry: misses)."""
+    d = p1 - p0
+    t_enter = np.zeros(len(triangles_xy))
+    t_exit = np.ones(len(triangles_xy))
+
+    a, b, c = triangles_xy[:, 0], triangles_xy[:, 1], triangles_xy[:, 2]
+    orientation = np.sign((b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0]))
+    for start, end in ((a, b), (b, c), (c, a)):
+        edge = end - start
+        # Inward normal of a counter-clockwise edge, flipped for clockwise triangles
+        nx, ny = -edge[:, 1] * orientation, edge[:, 0] * orientation
+        num = nx * (p0[0] - start[:, 0]) + ny * (p0[1] - start[:, 1])
+        den = nx * d[0] + ny * d[1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = -num / den
+        entering = den > 0
+        leaving = den < 0
+        parallel_outside = (den == 0) & (num < 0)
+        t_enter = np.where(entering, np.maximum(t_enter, t), t_enter)
+        t_exit = np.where(leaving, np.minimum(t_exit, t), t_exit)
+        t_exit = np.where(parallel_outside, -1.0, t_exit)
+    return t_enter, t_exit
+
+
+def line_pieces(triangles_xy: np.ndarray, lines: Sequence[Sequence[Tuple[float, float]]]) -> Dict[str, np.ndarray]:
+    """Pieces of every line inside the triangles.
+
+    Returns ``line`` (probe id), ``triangle``, ``weights`` (n, 3) at the piece
+    midpoint, ``length`` and the right-hand unit normal ``nx``/``ny``.
+    """
+    lo, hi = triangles_xy.min(axis=1), triangles_xy.max(axis=1)
+    pieces: Dict[str, list] = {k: [] for k in ("line", "triangle", "weights", "length", "nx", "ny")}
+    for line_id, vertices in enumerate(lines):
+        for p0, p1 in zip(vertices[:-1], vertices[1:]):
+            p0, p1 = np.asarray(p0, dtype=float), np.asarray(p1, dtype=float)
+            seg_len = float(np.hypot(*(p1 - p0)))
+            if seg_len == 0.0:
+                continue
+            seg_lo, seg_hi = np.minimum(p0, p1), np.maximum(p0, p1)
+            candidates = np.flatnonzero(np.all((lo <= seg_hi) & (hi >= seg_lo), axis=1))
+            if candidates.size == 0:
+                continue
+
+            t_enter, t_exit = clip_segment(triangles_xy[candidates], p0, p1)
+            hit = np.flatnonzero(t_exit - t_enter > 1e-12)
+            for k in hit:
+                tri = candidates[k]
+                mid = p0 + 0.5 * (t_enter[k] + t_exit[k]) * (p1 - p0)
+                pieces["line"].append(line_id)
+                pieces["triangle"].append(tri)
+                pieces["weights"].append(barycentric_weights(triangles_xy[tri:tri + 1], mid[0], mid[1])[0])
+                pieces["length"].append((t_exit[k] - t_enter[k]) * seg_len)
+                pieces["nx"].append((p1[1] - p0[1]) / seg_len)
+                pieces["ny"].append(-(p1[0] - p0[0]) / seg_len)
+
+    return {
+        "line": np.asarray(pieces["line"], dtype=np.int64),
+        "triangle": np.asarray(pieces["triangle"], dtype=np.int64),
+        "weights": np.asarray(pieces["weights"], dtype=float).reshape(-1, 3),
+        "length": np.asarray(pieces["length"], dtype=float),
+        "nx": np.asarray(pieces["nx"], dtype=float),
+        "ny": np.asarray(pieces["ny"], dtype=float),
+    }
+
+
+class ProbeSampler:
+    """One rank's share of the probes and its sample buffer.
+
+    ``triangles_xy`` are the rank's triangles in absolute coordinates and
+    ``full`` flags the ones it owns (ghosts are skipped so every probe is
+    sampled once). Rank 0 always records the sample times, even without
+    probes of its own.
+    """
+
+    def __init__(self, features: ProbeFeatures, triangles_xy: np.ndarray, full: Optional[np.ndarray],
+                 raw_prefix: str, rank: int = 0, buffer_steps: int = 2048, interval_s: float = 0.0):
+        owned = np.flatnonzero(full) if full is not None else np.arange(len(triangles_xy))
+        local_xy = triangles_xy[owned]
+
+        self.point_ids, point_tri, self.point_weights = locate_points(local_xy, features.points)
+        self.point_tri = owned[point_tri]
+
+        pieces = line_pieces(local_xy, features.lines)
+        self.line_ids, piece_line = np.unique(pieces["line"], return_inverse=True)
+        self.piece_line = piece_line.reshape(-1)
+        self.piece_tri = owned[pieces["triangle"]]
+        self.piece_weights = pieces["weights"]
+        self.piece_nx_len = pieces["nx"] * pieces["length"]
+        self.piece_ny_len = pieces["ny"] * pieces["length"]
+
+        self.rank = rank
+        self.interval_s = interval_s
+        self.active = rank == 0 or self.point_ids.size > 0 or self.line_ids.size > 0
+        self.columns = 1 + len(POINT_QUANTITIES) * self.point_ids.size + self.line_ids.size
+        self.buffer = np.empty((buffer_steps if self.active else 0, self.columns))
+        self.count = 0
+        self.rows_written = 0
+        self.last_time = -np.inf
+        self.raw_path = f"{raw_prefix}_rank{rank}.bin"
+        self.layout_path = f"{raw_prefix}_rank{rank}.json"
+
+        if self.active:
+            with open(self.raw_path, "wb"):
+                pass
+            with open(self.layout_path, "w", encoding="utf-8") as f:
+                json.dump({"points": self.point_ids.tolist(), "lines": self.line_ids.tolist()}, f)
+
+    def sample(self, t: float, stage: np.ndarray, elevation: np.ndarray,
+               xmomentum: np.ndarray, ymomentum: np.ndarray) -> None:
+        """Record one timestep from the quantities' (n_triangles, 3) vertex values.
+
+        Every rank must call this at the same times so the rank files line up.
+        A second call at an already recorded time is ignored.
+        """
+        if not self.active or t <= self.last_time or t - self.last_time < self.interval_s:
+            return
+        self.last_time = t
+
+        row = self.buffer[self.count]
+        row[0] = t
+        n = self.point_ids.size
+        if n:
+            tri, w = self.point_tri, self.point_weights
+            s = np.einsum("ij,ij->i", stage[tri], w)
+            h = np.maximum(s - np.einsum("ij,ij->i", elevation[tri], w), 0.0)
+            uh = np.einsum("ij,ij->i", xmomentum[tri], w)
+            vh = np.einsum("ij,ij->i", ymomentum[tri], w)
+            wet = h > VELOCITY_MIN_DEPTH
+            safe_h = np.where(wet, h, 1.0)
+            row[1:1 + n] = s
+            row[1 + n:1 + 2 * n] = h
+            row[1 + 2 * n:1 + 3 * n] = np.where(wet, uh / safe_h, 0.0)
+            row[1 + 3 * n:1 + 4 * n] = np.where(wet, vh / safe_h, 0.0)
+        if self.line_ids.size:
+            tri, w = self.piece_tri, self.piece_weights
+            q = (np.einsum("ij,ij->i", xmomentum[tri], w) * self.piece_nx_len
+                 + np.einsum("ij,ij->i", ymomentum[tri], w) * self.piece_ny_len)
+            row[1 + 4 * n:] = np.bincount(self.piece_line, weights=q, minlength=self.line_ids.size)
+
+        self.count += 1
+        if self.count == len(self.buffer):
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.active or self.count == 0:
+            return
+        with open(self.raw_path, "ab") as f:
+            self.buffer[:self.count].tofile(f)
+        self.rows_written += self.count
+        self.count = 0
+
+
+def merge_probe_files(features: ProbeFeatures, raw_prefix: str, nc_path: str, summary_path: str,
+                      wet_threshold_m: float, epsg: int = 32645) -> Dict[str, int]:
+    """Combine the rank files into one NetCDF series plus a GeoJSON summary; deletes the rank files.
+
+    Points found on two ranks (on a partition edge) keep the first rank's
+    samples; a line crossing several partitions is the sum of their parts.
+    """
+    from glob import glob
+
+    from netCDF4 import Dataset
+
+    layouts = sorted(glob(f"{raw_prefix}_rank*.json"), key=lambda p: int(p.rsplit("_rank", 1)[1][:-5]))
+    ranks = []
+    for layout_path in layouts:
+        with open(layout_path, "r", encoding="utf-8") as f:
+            layout = json.load(f)
+        raw_path = layout_path[:-5] + ".bin"
+        columns = 1 + len(POINT_QUANTITIES) * len(layout["points"]) + len(layout["lines"])
+        data = np.memmap(raw_path, dtype=float, mode="r").reshape(-1, columns) if os.path.getsize(raw_path) else None
+        ranks.append((layout, data, raw_path, layout_path))
+
+    times = next((data[:, 0] for layout, data, _, _ in ranks if data is not None), np.zeros(0))
+    n_times, n_points, n_lines = len(times), len(features.points), len(features.lines)
+
+    with Dataset(nc_path, "w") as nc:
+        nc.createDimension("time", n_times)
+        nc.createDimension("point", n_points)
+        nc.createDimension("line", n_lines)
+        nc.probe_epsg = epsg
+        nc.createVariable("time", "f8", ("time",))[:] = times
+        nc["time"].units = "seconds since simulation start"
+
+        names = nc.createVariable("point_name", str, ("point",))
+        for i, name in enumerate(features.point_names):
+            names[i] = name
+        nc.createVariable("point_x", "f8", ("point",))[:] = [p[0] for p in features.points]
+        nc.createVariable("point_y", "f8", ("point",))[:] = [p[1] for p in features.points]
+        line_names = nc.createVariable("line_name", str, ("line",))
+        for i, name in enumerate(features.line_names):
+            line_names[i] = name
+
+        units = {"stage": "m", "depth": "m", "xvelocity": "m/s", "yvelocity": "m/s"}
+        point_vars = {}
+        for quantity in POINT_QUANTITIES:
+            var = nc.createVariable(quantity, "f4", ("time", "point"), zlib=True, fill_value=np.nan,
+                                    chunksizes=(min(max(n_times, 1), 4096), 1) if n_points else None)
+            var.units = units[quantity]
+            point_vars[quantity] = var
+        discharge = nc.createVariable("discharge", "f4", ("time", "line"), zlib=True, fill_value=np.nan,
+                                      chunksizes=(min(max(n_times, 1), 4096), 1) if n_lines else None)
+        discharge.units = "m3/s"
+
+        summary_points = [None] * n_points
+        line_totals = np.zeros((n_times, n_lines))
+        line_seen = np.zeros(n_lines, dtype=bool)
+        for layout, data, _, _ in ranks:
+            n = len(layout["points"])
+            for j, point_id in enumerate(layout["points"]):
+                if summary_points[point_id] is not None:
+                    continue
+                if data is None:
+                    # Located on this rank, but no samples were written
+                    summary_points[point_id] = {}
+                    continue
+                series = {q: np.asarray(data[:, 1 + k * n + j]) for k, q in enumerate(POINT_QUANTITIES)}
+                for quantity, values in series.items():
+                    point_vars[quantity][:, point_id] = values
+                summary_points[point_id] = _point_summary(times, series, wet_threshold_m)
+            for j, line_id in enumerate(layout["lines"]):
+                if data is not None:
+                    line_totals[:, line_id] += data[:, 1 + 4 * n + j]
+                    line_seen[line_id] = True
+        for line_id in np.flatnonzero(line_seen):
+            discharge[:, line_id] = line_totals[:, line_id]
+
+    features_json = []
+    for i, (x, y) in enumerate(features.points):
+        props = {"name": features.point_names[i], "kind": "gauge"}
+        if summary_points[i] is None:
+            props["outside_domain"] = True
+        else:
+            props.update(summary_points[i])
+        features_json.append({"type": "Feature", "geometry": {"type": "Point", "coordinates": [x, y]},
+                              "properties": props})
+    for i, vertices in enumerate(features.lines):
+        props = {"name": features.line_names[i], "kind": "cross_section"}
+        if line_seen[i]:
+            props.update(_line_summary(times, line_totals[:, i]))
+        else:
+            props["outside_domain"] = True
+        features_json.append({"type": "Feature", "geometry": {"type": "LineString", "coordinates": vertices},
+                              "properties": props})
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "type": "FeatureCollection",
+            "crs": {"type": "name", "properties": {"name": f"urn:ogc:def:crs:EPSG::{epsg}"}},
+            "features": features_json,
+        }, f, indent=1)
+
+    leftovers = [(raw_path, layout_path) for _, _, raw_path, layout_path in ranks]
+    ranks.clear()  # drop the memmaps before deleting their files
+    for raw_path, layout_path in leftovers:
+        os.remove(raw_path)
+        os.remove(layout_path)
+
+    return {
+        "samples": n_times,
+        "points_found": sum(s is not None for s in summary_points),
+        "lines_found": int(line_seen.sum()),
+    }
+
+
+def _first_time_above(times: np.ndarray, values: np.ndarray, threshold: float) -> Optional[float]:
+    above = np.flatnonzero(values >= threshold)
+    return round(float(times[above[0]]) / 3600.0, 4) if above.size else None
+
+
+def _point_summary(times: np.ndarray, series: Dict[str, np.ndarray], wet_threshold_m: float) -> dict:
+    if not len(times):
+        return {}
+    depth = series["depth"]
+    speed = np.hypot(series["xvelocity"], series["yvelocity"])
+    peak = int(np.argmax(depth))
+    return {
+        "max_depth_m": round(float(depth[peak]), 4),
+        "max_stage_m": round(float(np.max(series["stage"])), 4),
+        "time_of_max_depth_h": round(float(times[peak]) / 3600.0, 4),
+        "max_speed_ms": round(float(np.max(speed)), 4),
+        "arrival_time_h": _first_time_above(times, depth, wet_threshold_m),
+    }
+
+
+def _line_summary(times: np.ndarray, discharge: np.ndarray) -> dict:
+    if not len(times):
+        return {}
+    peak = int(np.argmax(np.abs(discharge)))
+    return {
+        "peak_discharge_cumecs": round(float(discharge[peak]), 3),
+        "time_of_peak_h": round(float(times[peak]) / 3600.0, 4),
+        "volume_m3": round(float(np.sum(0.5 * (discharge[1:] + discharge[:-1]) * np.diff(times))), 1),
+    }
@@ -0,0 +1,346 @@
+from __future__ import annotations
+
+import heapq
+import math
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from geometry import points_in_polygon
+
+# D8 neighbour offsets (row, col)
+_NEIGHBOURS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+
+
+@dataclass(frozen=True)
+class WorkGrid:
+    """Coarsened DEM used to find the refinement regions (row 0 = north)."""
+    z: np.ndarray
+    xllcorner: float
+    yllcorner: float
+    cellsize: float
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.z.shape
+
+    def cell_centres(self) -> Tuple[np.ndarray, np.ndarray]:
+        nrows, ncols = self.shape
+        x = self.xllcorner + (np.arange(ncols) + 0.5) * self.cellsize
+        y = self.yllcorner + (nrows - np.arange(nrows) - 0.5) * self.cellsize
+        return np.meshgrid(x, y)
+
+
+# =============================================================================
+# DEM analysis
+# =============================================================================
+
+def coarsen_dem(grid: np.ndarray, header: Dict[str, float], cellsize: float,
+                max_cells: int = 250_000) -> WorkGrid:
+    """Block-average the DEM to at least ``cellsize`` and at most ``max_cells`` cells.
+
+    ``grid`` may be a memory-map; it is read one band of block rows at a time.
+    NODATA cells are ignored in the averages and blocks with no data are NaN.
+    """
+    nrows, ncols = grid.shape
+    cs = float(header["cellsize"])
+    nodata = float(header.get("nodata_value", -9999))
+
+    factor = max(1, int(math.ceil(cellsize / cs)))
+    while (nrows // factor) * (ncols // factor) > max_cells:
+        factor += 1
+
+    out_rows, out_cols = max(1, nrows // factor), max(1, ncols // factor)
+    f_rows, f_cols = min(factor, nrows), min(factor, ncols)
+    z = np.empty((out_rows, out_cols))
+
+    for r in range(out_rows):
+        band = np.asarray(grid[r * f_rows:(r + 1) * f_rows, :out_cols * f_cols], dtype=float)
+        band = band.reshape(f_rows, out_cols, f_cols)
+        valid = band != nodata
+        count = valid.sum(axis=(0, 2))
+        total = np.where(valid, band, 0.0).sum(axis=(0, 2))
+        z[r] = np.where(count > 0, total / np.maximum(count, 1), np.nan)
+
+    # Trimmed rows come off the south edge, so shift the origin up
+    yll = float(header["yllcorner"]) + (nrows - out_rows * f_rows) * cs
+    return WorkGrid(z, float(header["xllcorner"]), yll, f_cols * cs)
+
+
+def flow_accumulation(z: np.ndarray) -> np.ndarray:
+    """Upstream cell count per cell (D8) on a depression-filled surface.
+
+    Priority-flood from the grid edge and NODATA: every cell drains to the
+    neighbour that reached it, so pits and flats route out without a
+    separate filling pass. The loop is sequential, hence the coarse grid.
+    """
+    nrows, ncols = z.shape
+    height = np.nan_to_num(z, nan=-np.inf).ravel().tolist()
+    valid = ~np.isnan(z)
+
+    # Seeds: valid cells on the grid edge or next to NODATA
+    padded = np.pad(valid, 1, constant_values=False)
+    interior = np.ones_like(valid)
+    for dr, dc in _NEIGHBOURS:
+        interior &= padded[1 + dr:1 + dr + nrows, 1 + dc:1 + dc + ncols]
+    seeds = np.flatnonzero(valid & ~interior)
+
+    closed = bytearray((~valid).ravel().astype(np.uint8).tobytes())
+    receiver = [-1] * (nrows * ncols)
+    heap = [(height[i], i) for i in seeds.tolist()]
+    heapq.heapify(heap)
+    for i in seeds.tolist():
+        closed[i] = 1
+
+    order = []
+    while heap:
+        level, i = heapq.heappop(heap)
+        order.append(i)
+        r, c = divmod(i, ncols)
+        for dr, dc in _NEIGHBOURS:
+            rr, cc = r + dr, c + dc
+            if 0 <= rr < nrows and 0 <= cc < ncols:
+                j = rr * ncols + cc
+                if not closed[j]:
+                    closed[j] = 1
+                    receiver[j] = i
+                    heapq.heappush(heap, (max(height[j], level), j))
+
+    accumulation = [1] * (nrows * ncols)
+    for i in reversed(order):
+        if receiver[i] >= 0:
+            accumulation[receiver[i]] += accumulation[i]
+
+    acc = np.asarray(accumulation, dtype=float).reshape(nrows, ncols)
+    acc[~valid] = 0.0
+    return acc
+
+
+def slope(work: WorkGrid) -> np.ndarray:
+    """Gradient magnitude (m/m); NaN next to NODATA."""
+    if min(work.shape) < 2:
+        return np.zeros(work.shape)
+    dz_dy, dz_dx = np.gradient(work.z, work.cellsize)
+    return np.hypot(dz_dx, dz_dy)
+
+
+def dilate(mask: np.ndarray, cells: int) -> np.ndarray:
+    """Grow ``mask`` by ``cells`` in every direction (disk structuring element)."""
+    if cells <= 0:
+        return mask.copy()
+    nrows, ncols = mask.shape
+    padded = np.pad(mask, cells, constant_values=False)
+    out = np.zeros_like(mask)
+    for dr in range(-cells, cells + 1):
+        for dc in range(-cells, cells + 1):
+            if dr * dr + dc * dc <= cells * cells:
+                out |= padded[cells + dr:cells + dr + nrows, cells + dc:cells + dc + ncols]
+    return out
+
+
+# =============================================================================
+# Mask -> polygons
+# =============================================================================
+
+def remove_pinches(mask: np.ndarray, allowed: np.ndarray, max_iterations: int = 100) -> np.ndarray:
+    """Fill (or, outside ``allowed``, clear) cells so no two regions touch at a corner.
+
+    Corner-only contacts would make two interior regions share a vertex,
+    which the mesh generator rejects.
+    """
+    mask = mask.copy()
+    for _ in range(max_iterations):
+        a, b = mask[:-1, :-1], mask[:-1, 1:]
+        c, d = mask[1:, :-1], mask[1:, 1:]
+        falling = a & d & ~b & ~c
+        rising = b & c & ~a & ~d
+        if not (falling.any() or rising.any()):
+            break
+
+        for pinch, fill, clear in ((falling, (0, 1), (0, 0)), (rising, (0, 0), (0, 1))):
+            rows, cols = np.nonzero(pinch)
+            fr, fc = rows + fill[0], cols + fill[1]
+            ok = allowed[fr, fc]
+            mask[fr[ok], fc[ok]] = True
+            mask[rows[~ok] + clear[0], cols[~ok] + clear[1]] = False
+    return mask
+
+
+def trace_rings(mask: np.ndarray) -> List[np.ndarray]:
+    """Outlines of ``mask`` as closed rings of (col, row-from-south) corner indices.
+
+    Outer boundaries come out counter-clockwise and holes clockwise.
+    Collinear corners are dropped so straight runs become single edges.
+    """
+    nrows, ncols = mask.shape
+    padded = np.pad(mask, 1, constant_values=False)
+    inside = padded[1:-1, 1:-1]
+
+    r, c = np.nonzero(inside)
+    Y0 = nrows - r - 1  # south edge of the cell in corner coordinates
+    starts, ends = [], []
+
+    def add(out, x0, y0, x1, y1):
+        starts.append(np.column_stack((x0[out], y0[out])))
+        ends.append(np.column_stack((x1[out], y1[out])))
+
+    # Counter-clockwise around each cell, keeping only sides facing outside
+    add(~padded[r + 2, c + 1], c, Y0, c + 1, Y0)                # south
+    add(~padded[r + 1, c + 2], c + 1, Y0, c + 1, Y0 + 1)        # east
+    add(~padded[r, c + 1], c + 1, Y0 + 1, c, Y0 + 1)            # north
+    add(~padded[r + 1, c], c, Y0 + 1, c, Y0)                    # west
+
+    if not starts:
+        return []
+    start = np.concatenate(starts)
+    end = np.concatenate(ends)
+
+    width = ncols + 1
+    start_id = (start[:, 1] * width + start[:, 0]).tolist()
+    end_id = (end[:, 1] * width + end[:, 0]).tolist()
+    next_edge = {s: k for k, s in enumerate(start_id)}
+
+    rings = []
+    used = bytearray(len(start_id))
+    for first in range(len(start_id)):
+        if used[first]:
+            continue
+        ids = []
+        k = first
+        while not used[k]:
+            used[k] = 1
+            ids.append(start_id[k])
+            k = next_edge[end_id[k]]
+
+        ring = np.column_stack((np.asarray(ids) % width, np.asarray(ids) // width))
+        prev = np.roll(ring, 1, axis=0)
+        nxt = np.roll(ring, -1, axis=0)
+        turn = (ring[:, 0] - prev[:, 0]) * (nxt[:, 1] - ring[:, 1]) \
+            - (ring[:, 1] - prev[:, 1]) * (nxt[:, 0] - ring[:, 0])
+        rings.append(ring[turn != 0])
+    return rings
+
+
+def signed_area(ring: np.ndarray) -> float:
+    x, y = ring[:, 0].astype(float), ring[:, 1].astype(float)
+    return 0.5 * float(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)))
+
+
+# =============================================================================
+# Refinement regions
+# =============================================================================
+
+def hole_cells(work: WorkGrid, holes: Sequence[Sequence[Tuple[float, float]]]) -> np.ndarray:
+    """Cells inside an AOI hole or within one cell of its outline."""
+    xc, yc = work.cell_centres()
+    nrows, ncols = work.shape
+    inside = np.zeros(work.shape, dtype=bool)
+    touched = np.zeros(work.shape, dtype=bool)
+    for hole in holes:
+        inside |= points_in_polygon(xc.ravel(), yc.ravel(), hole).reshape(work.shape)
+
+        # Outline sampled at half a cell, so every cell it crosses is hit or adjacent to a hit
+        ring = np.asarray(hole, dtype=float)
+        ring = np.vstack([ring, ring[:1]])
+        seg = np.diff(ring, axis=0)
+        steps = np.maximum(1, np.ceil(np.hypot(seg[:, 0], seg[:, 1]) / (0.5 * work.cellsize)).astype(int))
+        frac = np.concatenate([np.arange(n) / n for n in steps])
+        start = np.repeat(ring[:-1], steps, axis=0)
+        points = start + np.repeat(seg, steps, axis=0) * frac[:, None]
+
+        cols = np.floor((points[:, 0] - work.xllcorner) / work.cellsize).astype(int)
+        rows = nrows - 1 - np.floor((points[:, 1] - work.yllcorner) / work.cellsize).astype(int)
+        ok = (rows >= 0) & (rows < nrows) & (cols >= 0) & (cols < ncols)
+        touched[rows[ok], cols[ok]] = True
+    return inside | dilate(touched, 1)
+
+
+def refinement_mask(work: WorkGrid, bounding_polygon: Sequence[Tuple[float, float]],
+                    dam_xy: Tuple[float, float], channel_min_area_km2: float,
+                    steep_slope: float, channel_buffer_m: float, dam_buffer_m: float,
+                    holes: Sequence[Sequence[Tuple[float, float]]] = ()
+                    ) -> Tuple[np.ndarray, Dict[str, int]]:
+    """Cells of the work grid to mesh finely, plus cell counts per criterion."""
+    cell_area_km2 = work.cellsize ** 2 / 1.0e6
+    channel = flow_accumulation(work.z) * cell_area_km2 >= channel_min_area_km2
+    with np.errstate(invalid="ignore"):
+        steep = np.nan_to_num(slope(work), nan=0.0) >= steep_slope
+
+    mask = dilate(channel | steep, int(math.ceil(channel_buffer_m / work.cellsize)))
+
+    xc, yc = work.cell_centres()
+    dam = np.hypot(xc - dam_xy[0], yc - dam_xy[1]) <= dam_buffer_m + 0.5 * work.cellsize
+    mask |= dam
+
+    # Whole cells (with half a cell of clearance) must sit inside the AOI so
+    # no region edge touches or crosses the exterior boundary
+    allowed = np.ones(work.shape, dtype=bool)
+    h = work.cellsize
+    for dx, dy in ((-h, -h), (h, -h), (h, h), (-h, h)):
+        allowed &= points_in_polygon(
+            (xc + dx).ravel(), (yc + dy).ravel(), bounding_polygon
+        ).reshape(work.shape)
+    allowed &= ~np.isnan(work.z)
+    if holes:
+        # Same for the AOI holes, which are meshed as interior holes
+        allowed &= ~hole_cells(work, holes)
+
+    mask = remove_pinches(mask & allowed, allowed)
+    stats = {
+        "channel_cells": int(channel.sum()),
+        "steep_cells": int(steep.sum()),
+        "dam_cells": int(dam.sum()),
+        "refined_cells": int(mask.sum()),
+        "total_cells": int(allowed.sum()),
+    }
+    return mask, stats
+
+
+def mask_to_regions(work: WorkGrid, mask: np.ndarray) -> List[List[Tuple[float, float]]]:
+    """Non-overlapping outer rings of ``mask`` in map coordinates.
+
+    Holes are filled (refined too) and regions nested in a hole are dropped,
+    since the enclosing ring already covers them.
+    """
+    outers = [ring for ring in trace_rings(mask) if signed_area(ring) > 0]
+    outers.sort(key=signed_area, reverse=True)
+
+    kept: List[np.ndarray] = []
+    for ring in outers:
+        # Separate components never share a corner, so any vertex will do
+        if any(points_in_polygon(ring[:1, 0], ring[:1, 1], other)[0] for other in kept):
+            continue
+        kept.append(ring)
+
+    return [
+        [(work.xllcorner + float(x) * work.cellsize, work.yllcorner + float(y) * work.cellsize)
+         for x, y in ring]
+        for ring in kept
+    ]
+
+
+def dem_refinement_regions(grid: np.ndarray, header: Dict[str, float],
+                           bounding_polygon: Sequence[Tuple[float, float]],
+                           dam_xy: Tuple[float, float], max_triangle_area_m2: float,
+                           channel_min_area_km2: float, steep_slope: float,
+                           channel_buffer_m: float, dam_buffer_m: float,
+                           max_cells: int = 250_000,
+                           holes: Sequence[Sequence[Tuple[float, float]]] = ()) -> Tuple[list, Dict[str, int]]:
+    """``interior_regions`` for create_domain_from_regions, derived from the DEM.
+
+    Channels (flow accumulation above ``channel_min_area_km2``), steep
+    ground such as embankments, a floodplain buffer around both and a disk
+    around the dam inlet are meshed at ``max_triangle_area_m2``. No region
+    overlaps or touches one of the AOI ``holes``.
+    """
+    # Region edges several triangles long keep the staircase outline cheap
+    work = coarsen_dem(grid, header, 4.0 * math.sqrt(2.0 * max_triangle_area_m2), max_cells)
+    mask, stats = refinement_mask(
+        work, bounding_polygon, dam_xy, channel_min_area_km2,
+        steep_slope, channel_buffer_m, dam_buffer_m, holes,
+    )
+    regions = mask_to_regions(work, mask)
+    stats["regions"] = len(regions)
+    stats["work_cellsize_m"] = int(work.cellsize)
+    return [[ring, max_triangle_area_m2] for ring in regions], stats
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from dataclasses import asdict
+from typing import Dict, Optional
+
+from config import Config
+
+# Bump when the simulation changes in a way that invalidates earlier results
+CACHE_KEY_VERSION = 1
+
+# Settings that change where or how fast results are produced, not what they
+# are. [postprocessing] is left out as a whole: the bridge regenerates the
+# products of a cached run whenever products_key changes.
+_IGNORED_FIELDS = {
+    "paths": ("output_file", "output_dir", "name_stem", "asc_path", "dam_shp_path", "aoi_shp_path"),
+    "mesh": ("use_cached_mesh", "mesh_cache_dir"),
+    "simulation": ("print_simulation_logs", "mass_balance_threshold_pct"),
+    "parallel": ("enable",),
+    "probes": ("buffer_steps",),
+}
+
+# Post-processing settings that do not change the products
+_PRODUCT_IGNORED_FIELDS = ("memory_budget_mb",)
+
+DIGESTS_FILE = "input_digests.json"
+
+
+def file_digest(path: str, memo_path: Optional[str] = None) -> str:
+    """SHA-256 of a file, memoised on (size, mtime) in ``memo_path``."""
+    stat = os.stat(path)
+    stamp = [stat.st_size, stat.st_mtime_ns]
+
+    memo: Dict[str, dict] = {}
+    if memo_path and os.path.exists(memo_path):
+        try:
+            with open(memo_path, "r", encoding="utf-8") as f:
+                memo = json.load(f)
+        except (OSError, ValueError):
+            memo = {}
+
+    real = os.path.realpath(path)
+    cached = memo.get(real)
+    if cached and cached.get("stamp") == stamp:
+        return cached["sha256"]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    sha = digest.hexdigest()
+
+    if memo_path:
+        memo[real] = {"stamp": stamp, "sha256": sha}
+        try:
+            with open(memo_path, "w", encoding="utf-8") as f:
+                json.dump(memo, f, indent=2)
+        except OSError:
+            pass
+    return sha
+
+
+def input_digests(cfg: Config) -> Dict[str, str]:
+    memo_path = os.path.join(cfg.paths.output_dir, DIGESTS_FILE)
+    inputs = [
+        ("dem", cfg.paths.asc_path),
+        ("dam", cfg.paths.dam_shp_path),
+        ("aoi", cfg.paths.aoi_shp_path),
+    ]
+    inputs += [(f"probes_{i}", path) for i, path in enumerate(cfg.probes.shapefiles)]
+    return {name: file_digest(path, memo_path) for name, path in inputs}
+
+
+def cache_key(cfg: Config) -> str:
+    """Content hash of the resolved settings plus the DEM/shapefile contents.
+
+    The run id, output location and performance-only knobs are left out,
+    so two runs with this key produce the same results.
+    """
+    params = asdict(cfg)
+    postprocessing = params.pop("postprocessing")
+    for section, fields in _IGNORED_FIELDS.items():
+        for field_name in fields:
+            params[section].pop(field_name, None)
+    if cfg.simulation.output_mode == "adaptive" or cfg.probes.shapefiles:
+        # Adaptive frame selection and the probe summary read the wet threshold during the run
+        params["wet_threshold_m"] = postprocessing["wet_threshold_m"]
+
+    payload = {
+        "version": CACHE_KEY_VERSION,
+        "parameters": params,
+        "inputs": input_digests(cfg),
+    }
+    blob = json.dumps(payload, sort_keys=True, default=list)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def products_key(cfg: Config) -> str:
+    """Hash of the [postprocessing] settings the rasters and vectors depend on."""
+    params = {k: v for k, v in asdict(cfg.postprocessing).items() if k not in _PRODUCT_IGNORED_FIELDS}
+    blob = json.dumps(params, sort_keys=True, default=list)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def find_cached_run(cfg: Config, key: str) -> Optional[dict]:
+    """Latest registered run with ``key`` whose .sww is still on disk."""
+    from run_registry import open_registry
+
+    conn = open_registry(cfg.paths.output_dir)
+    try:
+        rows = conn.execute(
+            "SELECT run_id, status FROM runs WHERE cache_key = ? "
+            "AND status NOT IN ('running', 'simulation_failed', 'sww_missing') "
+            "ORDER BY started_at DESC, run_id DESC",
+            (key,),
+        ).fetchall()
+    finally:
+        conn.close()
+
+    for row in rows:
+        sww_path = os.path.join(cfg.paths.output_dir, f"{row['run_id']}.sww")
+        if os.path.exists(sww_path):
+            return dict(row)
+    return None
@@ -0,0 +1,368 @@
+"""SQLite registry of simulation runs.
+
+One row per run id with its status, per-phase timings and the key
+parameters, plus one row per output file with its size. It replaces
+rescanning ``simulation_history.jsonl`` (still written for compatibility)
+when looking runs up.
+
+Example:
+    python3 run_registry.py list --status deploy_failed --since 2025-01-01
+    python3 run_registry.py list --where max_triangle_area_m2=900
+    python3 run_registry.py show mahanadi_dam_release_20250114_101500
+    python3 run_registry.py import outputs/simulation_history.jsonl
+"""
+from __future__ import annotations
+
+import datetime
+import json
+import os
+import sqlite3
+from dataclasses import asdict
+from typing import Any, Dict, Iterable, List, Optional
+
+REGISTRY_FILE = "run_registry.sqlite"
+HISTORY_FILE = "simulation_history.jsonl"
+
+# Statuses written by simulate.py and the bridge
+STATUSES = (
+    "running",             # simulation started, nothing finished yet
+    "simulation_failed",   # run_simulation raised
+    "sww_missing",         # simulation ended but no .sww to post-process
+    "postprocess_failed",  # rasterisation raised
+    "deploy_failed",       # rasters written, at least one GeoServer upload failed
+    "processed",           # rasters written, deployment not requested
+    "completed",           # rasters written and deployed
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    started_at TEXT,
+    finished_at TEXT,
+    status TEXT NOT NULL,
+    source TEXT NOT NULL DEFAULT 'live',
+    cache_key TEXT,
+    name_stem TEXT,
+    max_triangle_area_m2 REAL,
+    refinement TEXT,
+    peak_discharge_cumecs REAL,
+    final_time_hours REAL,
+    yieldstep_s REAL,
+    rainfall_enabled INTEGER,
+    ranks INTEGER,
+    triangles INTEGER,
+    steps INTEGER,
+    phases_json TEXT,
+    parameters_json TEXT,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS run_outputs (
+    run_id TEXT NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    bytes INTEGER,
+    PRIMARY KEY (run_id, name)
+);
+CREATE INDEX IF NOT EXISTS idx_runs_started ON runs (started_at);
+CREATE INDEX IF NOT EXISTS idx_runs_finished ON runs (finished_at);
+CREATE INDEX IF NOT EXISTS idx_runs_status ON runs (status);
+CREATE INDEX IF NOT EXISTS idx_runs_cache_key ON runs (cache_key);
+CREATE INDEX IF NOT EXISTS idx_runs_params
+    ON runs (max_triangle_area_m2, peak_discharge_cumecs, final_time_hours, yieldstep_s);
+"""
+
+# Columns that can be filtered on from the CLI
+QUERY_COLUMNS = (
+    "status", "source", "cache_key", "name_stem", "max_triangle_area_m2", "refinement",
+    "peak_discharge_cumecs", "final_time_hours", "yieldstep_s", "rainfall_enabled", "ranks",
+)
+
+
+def registry_path(output_dir: str) -> str:
+    return os.path.join(output_dir, REGISTRY_FILE)
+
+
+def connect(db_path: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def open_registry(output_dir: str) -> sqlite3.Connection:
+    """Registry for ``output_dir``, seeded from its JSONL history on first use."""
+    db_path = registry_path(output_dir)
+    is_new = not os.path.exists(db_path)
+    conn = connect(db_path)
+    history_file = os.path.join(output_dir, HISTORY_FILE)
+    if is_new and os.path.exists(history_file):
+        import_jsonl(conn, history_file)
+    return conn
+
+
+def run_started_at(run_id: str) -> Optional[str]:
+    """ISO timestamp encoded in a ``<stem>_YYYYMMDD_HHMMSS`` (or legacy ``_YYYYMMDD_HHMM``) run id."""
+    stamp = "_".join(run_id.split("_")[-2:])
+    # strptime is lenient about digit counts ("0630" parses as 06:03:00), so pick the format by length
+    fmt = "%Y%m%d_%H%M%S" if len(stamp) == 15 else "%Y%m%d_%H%M"
+    try:
+        return datetime.datetime.strptime(stamp, fmt).isoformat()
+    except ValueError:
+        return None
+
+
+def output_size(path: str) -> Optional[int]:
+    """Size of a file, or the total of the files in a directory."""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    if os.path.isdir(path):
+        return sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(path)
+            for name in names
+        )
+    return None
+
+
+def parameter_columns(parameters: Dict[str, Any]) -> Dict[str, Any]:
+    """Indexed columns pulled out of ``asdict(cfg)``."""
+    def get(section: str, key: str) -> Any:
+        return (parameters.get(section) or {}).get(key)
+
+    rainfall = get("rainfall", "enable")
+    return {
+        "name_stem": get("paths", "name_stem"),
+        "max_triangle_area_m2": get("mesh", "max_triangle_area_m2"),
+        "refinement": get("mesh", "refinement"),
+        "peak_discharge_cumecs": get("dam_release", "peak_discharge_cumecs"),
+        "final_time_hours": get("simulation", "final_time_hours"),
+        "yieldstep_s": get("simulation", "yieldstep_s"),
+        "rainfall_enabled": None if rainfall is None else int(bool(rainfall)),
+    }
+
+
+def upsert_run(conn: sqlite3.Connection, run_id: str, fields: Dict[str, Any]) -> None:
+    """Insert ``run_id`` or update the given columns of an existing row."""
+    row = {key: value for key, value in fields.items() if value is not None}
+    if "phases" in row:
+        # Simulation and post-processing report their phases separately
+        existing = conn.execute("SELECT phases_json FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        phases = json.loads(existing["phases_json"]) if existing and existing["phases_json"] else {}
+        phases.update(row.pop("phases"))
+        row["phases_json"] = json.dumps(phases)
+        for column in ("triangles", "steps", "ranks"):
+            if column in phases:
+                row[column] = int(phases[column])
+    if "parameters" in row:
+        parameters = row.pop("parameters")
+        row["parameters_json"] = json.dumps(parameters, default=list)
+        row.update({k: v for k, v in parameter_columns(parameters).items() if v is not None})
+    row.setdefault("status", "running")
+
+    columns = ["run_id", *row]
+    updates = ", ".join(f"{column} = excluded.{column}" for column in row)
+    conn.execute(
+        f"INSERT INTO runs ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)}) "
+        f"ON CONFLICT (run_id) DO UPDATE SET {updates}",
+        [run_id, *row.values()],
+    )
+    conn.commit()
+
+
+def record_outputs(conn: sqlite3.Connection, run_id: str, outputs: Dict[str, str]) -> None:
+    conn.executemany(
+        "INSERT OR REPLACE INTO run_outputs (run_id, name, path, bytes) VALUES (?, ?, ?, ?)",
+        [(run_id, name, path, output_size(path)) for name, path in outputs.items()],
+    )
+    conn.commit()
+
+
+def record_run(cfg, run_id: str, status: str, phases: Optional[Dict[str, float]] = None,
+               outputs: Optional[Dict[str, str]] = None, cache_key: Optional[str] = None,
+               error: Optional[str] = None, finished: bool = True) -> None:
+    """Create or update the registry row for ``run_id`` in ``cfg``'s output dir."""
+    conn = open_registry(cfg.paths.output_dir)
+    try:
+        upsert_run(conn, run_id, {
+            "started_at": run_started_at(run_id),
+            "finished_at": datetime.datetime.now().isoformat(timespec="seconds") if finished else None,
+            "status": status,
+            "cache_key": cache_key,
+            "parameters": asdict(cfg),
+            "phases": phases,
+            "error": error,
+        })
+        if finished and error is None:
+            conn.execute("UPDATE runs SET error = NULL WHERE run_id = ?", (run_id,))
+            conn.commit()
+        if outputs:
+            record_outputs(conn, run_id, outputs)
+    finally:
+        conn.close()
+
+
+def import_jsonl(conn: sqlite3.Connection, history_file: str) -> int:
+    """Load ``simulation_history.jsonl`` entries not yet in the registry.
+
+    Their ``"Completed"`` status was written unconditionally, so imported
+    rows are tagged ``source = 'jsonl'`` to tell them apart.
+    """
+    imported = 0
+    with open(history_file, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            run_id = entry.get("run_id")
+            if not run_id or conn.execute("SELECT 1 FROM runs WHERE run_id = ?", (run_id,)).fetchone():
+                continue
+            status = (entry.get("environment") or {}).get("status") or "completed"
+            upsert_run(conn, run_id, {
+                "started_at": run_started_at(run_id),
+                "status": status.lower(),
+                "source": "jsonl",
+                "cache_key": entry.get("cache_key"),
+                "parameters": entry.get("parameters") or {},
+                "phases": entry.get("phases"),
+            })
+            outputs = entry.get("outputs") or {}
+            if outputs:
+                record_outputs(conn, run_id, outputs)
+            imported += 1
+    return imported
+
+
+def find_runs(conn: sqlite3.Connection, where: Optional[Dict[str, Any]] = None,
+              since: Optional[str] = None, until: Optional[str] = None,
+              limit: Optional[int] = None) -> List[sqlite3.Row]:
+    """Runs matching column equality filters and a start-time window, newest first."""
+    clauses, params = [], []
+    for column, value in (where or {}).items():
+        if column not in QUERY_COLUMNS:
+            raise ValueError(f"Unknown column '{column}'. Options: {', '.join(QUERY_COLUMNS)}")
+        clauses.append(f"{column} = ?")
+        params.append(value)
+    if since:
+        clauses.append("started_at >= ?")
+        params.append(since)
+    if until:
+        clauses.append("started_at < ?")
+        params.append(until)
+
+    query = "SELECT * FROM runs"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    query += " ORDER BY started_at DESC, run_id DESC"
+    if limit:
+        query += f" LIMIT {int(limit)}"
+    return conn.execute(query, params).fetchall()
+
+
+def run_outputs(conn: sqlite3.Connection, run_id: str) -> List[sqlite3.Row]:
+    return conn.execute(
+        "SELECT name, path, bytes FROM run_outputs WHERE run_id = ? ORDER BY name", (run_id,)
+    ).fetchall()
+
+
+def _parse_value(text: str) -> Any:
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    return text
+
+
+def _print_runs(rows: Iterable[sqlite3.Row]) -> None:
+    print(f"{'run id':<44s} {'status':<18s} {'area m2':>8s} {'peak m3/s':>9s} {'hours':>6s} {'evolve s':>9s}")
+    for row in rows:
+        phases = json.loads(row["phases_json"]) if row["phases_json"] else {}
+        evolve = phases.get("evolve")
+        print(
+            f"{row['run_id']:<44s} {row['status']:<18s} "
+            f"{row['max_triangle_area_m2'] or 0:8g} {row['peak_discharge_cumecs'] or 0:9g} "
+            f"{row['final_time_hours'] or 0:6g} {'' if evolve is None else f'{evolve:9.1f}':>9s}"
+        )
+
+
+def _print_run(conn: sqlite3.Connection, run_id: str) -> bool:
+    row = conn.execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+    if row is None:
+        print(f"No run '{run_id}' in the registry")
+        return False
+
+    for column in row.keys():
+        if column.endswith("_json") or row[column] is None:
+            continue
+        print(f"{column:<22s} {row[column]}")
+    if row["phases_json"]:
+        print("phases:")
+        for name, value in json.loads(row["phases_json"]).items():
+            print(f"  {name:<20s} {value:,.1f}")
+    outputs = run_outputs(conn, run_id)
+    if outputs:
+        print("outputs:")
+        for output in outputs:
+            size = "missing" if output["bytes"] is None else f"{output['bytes'] / 1e6:,.1f} MB"
+            print(f"  {output['name']:<20s} {size:>12s}  {output['path']}")
+    return True
+
+
+def main() -> None:
+    import argparse
+    import sys
+
+    from settings_loader import load_config
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--settings", help="settings.toml whose output_dir holds the registry")
+    parser.add_argument("--db", help="Registry file (overrides --settings)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    list_cmd = commands.add_parser("list", help="List runs, newest first")
+    list_cmd.add_argument("--status", choices=STATUSES)
+    list_cmd.add_argument("--since", help="Runs started at or after this ISO date/time")
+    list_cmd.add_argument("--until", help="Runs started before this ISO date/time")
+    list_cmd.add_argument("--where", action="append", default=[], metavar="COLUMN=VALUE",
+                          help=f"Equality filter, repeatable. Columns: {', '.join(QUERY_COLUMNS)}")
+    list_cmd.add_argument("--limit", type=int, default=50)
+
+    show_cmd = commands.add_parser("show", help="Timings and outputs of one run")
+    show_cmd.add_argument("run_id")
+
+    import_cmd = commands.add_parser("import", help="Import a simulation_history.jsonl")
+    import_cmd.add_argument("history_file", nargs="?")
+    args = parser.parse_args()
+
+    if args.db:
+        output_dir = os.path.dirname(os.path.abspath(args.db))
+    else:
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        settings = args.settings or os.path.join(script_dir, "settings.toml")
+        output_dir = load_config(settings, os.path.dirname(os.path.abspath(settings))).paths.output_dir
+    conn = connect(args.db or registry_path(output_dir))
+
+    if args.command == "list":
+        where = {}
+        for item in args.where:
+            column, _, value = item.partition("=")
+            where[column] = _parse_value(value)
+        if args.status:
+            where["status"] = args.status
+        try:
+            rows = find_runs(conn, where, since=args.since, until=args.until, limit=args.limit)
+        except ValueError as e:
+            parser.error(str(e))
+        _print_runs(rows)
+    elif args.command == "show":
+        sys.exit(0 if _print_run(conn, args.run_id) else 1)
+    else:
+        history_file = args.history_file or os.path.join(output_dir, HISTORY_FILE)
+        print(f"Imported {import_jsonl(conn, history_file)} runs from {history_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,543 @@
+"""Local job queue for simulations on the shared node.
+
+Modelers submit a settings.toml plus overrides instead of launching
+``mpirun`` by hand; ``serve`` starts queued jobs through ``simulate.py``
+(and so ``run_simulation``) only while enough cores are free, so the node
+is never oversubscribed. Higher ``priority`` runs first; within a priority
+the user with the fewest cores in use and core-hours over the last day
+goes next. The queue is a SQLite file, so it survives restarts, and a small
+HTTP API lets the dashboard poll it.
+
+Example:
+    python3 scheduler.py serve --cores 16 --port 8765
+    python3 scheduler.py submit --ranks 8 --set mesh.max_triangle_area_m2=900 --set dam_release.peak_discharge_cumecs=1200
+    python3 scheduler.py list
+    python3 scheduler.py cancel 12
+"""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import signal
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from settings_loader import load_config, new_run_id, parse_override, read_settings, write_settings
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_QUEUE_DIR = os.path.join(SCRIPT_DIR, "job_queue")
+DEFAULT_PORT = 8765
+# The React dashboard (Vite dev server)
+DEFAULT_DASHBOARD_ORIGIN = "http://localhost:5173"
+
+# Core-seconds older than this no longer count against a user's fair share
+FAIR_SHARE_WINDOW_S = 24 * 3600
+
+JOB_STATUSES = ("queued", "running", "succeeded", "failed", "cancelled")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    submitted_at REAL NOT NULL,
+    user TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    ranks INTEGER NOT NULL,
+    force INTEGER NOT NULL DEFAULT 0,
+    source_settings TEXT NOT NULL,
+    overrides_json TEXT,
+    settings_path TEXT,
+    log_path TEXT,
+    status TEXT NOT NULL DEFAULT 'queued',
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    run_id TEXT,
+    run_status TEXT,
+    cpus TEXT,
+    pid INTEGER,
+    started_at REAL,
+    finished_at REAL,
+    returncode INTEGER,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, priority, submitted_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_user ON jobs (user, started_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_run_id ON jobs (run_id);
+"""
+
+
+def connect(db_path: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    # The HTTP threads and the scheduler loop each hold their own connection
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def job_dict(row: sqlite3.Row) -> Dict[str, Any]:
+    job = dict(row)
+    job["overrides"] = json.loads(job.pop("overrides_json") or "{}")
+    return job
+
+
+def submit_job(conn: sqlite3.Connection, queue_dir: str, settings_path: str,
+               overrides: Optional[Dict[str, Any]] = None, ranks: int = 1, priority: int = 0,
+               user: str = "unknown", force: bool = False, max_ranks: Optional[int] = None) -> int:
+    """Queue a scenario; raises ValueError if its settings do not load."""
+    if ranks < 1:
+        raise ValueError("ranks must be >= 1")
+    if max_ranks and ranks > max_ranks:
+        raise ValueError(f"ranks={ranks} exceeds the {max_ranks} cores this node schedules")
+
+    settings_path = os.path.abspath(settings_path)
+    sections = read_settings(settings_path, overrides)
+    sections.setdefault("parallel", {})["enable"] = ranks > 1
+
+    cur = conn.execute(
+        "INSERT INTO jobs (submitted_at, user, priority, ranks, force, source_settings, overrides_json) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (time.time(), user, int(priority), int(ranks), int(force), settings_path, json.dumps(overrides or {})),
+    )
+    job_id = int(cur.lastrowid)
+    job_dir = os.path.join(queue_dir, "jobs", str(job_id))
+    job_settings = os.path.join(job_dir, "settings.toml")
+    try:
+        write_settings(job_settings, sections)
+        load_config(job_settings, job_dir, run_id="validation")
+    except Exception:
+        conn.rollback()
+        shutil.rmtree(job_dir, ignore_errors=True)
+        raise
+    conn.execute(
+        "UPDATE jobs SET settings_path = ?, log_path = ? WHERE id = ?",
+        (job_settings, os.path.join(job_dir, "job.log"), job_id),
+    )
+    conn.commit()
+    return job_id
+
+
+def cancel_job(conn: sqlite3.Connection, job_id: int) -> bool:
+    """Cancel a queued job now, or ask the scheduler to stop a running one."""
+    cur = conn.execute(
+        "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'queued'",
+        (time.time(), job_id),
+    )
+    if not cur.rowcount:
+        cur = conn.execute(
+            "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,)
+        )
+    conn.commit()
+    return bool(cur.rowcount)
+
+
+def queue_order(conn: sqlite3.Connection, now: Optional[float] = None) -> List[sqlite3.Row]:
+    """Queued jobs in the order they will start.
+
+    Priority first; then fair share (cores the user has running, then their
+    core-seconds over ``FAIR_SHARE_WINDOW_S``); then submission time.
+    """
+    now = time.time() if now is None else now
+    running = dict(conn.execute(
+        "SELECT user, SUM(ranks) FROM jobs WHERE status = 'running' GROUP BY user"
+    ).fetchall())
+    usage = dict(conn.execute(
+        "SELECT user, SUM(ranks * (COALESCE(finished_at, ?) - started_at)) FROM jobs "
+        "WHERE started_at IS NOT NULL AND COALESCE(finished_at, ?) >= ? GROUP BY user",
+        (now, now, now - FAIR_SHARE_WINDOW_S),
+    ).fetchall())
+    queued = conn.execute("SELECT * FROM jobs WHERE status = 'queued'").fetchall()
+    return sorted(queued, key=lambda job: (
+        -job["priority"], running.get(job["user"], 0), usage.get(job["user"], 0.0),
+        job["submitted_at"], job["id"],
+    ))
+
+
+def queue_state(conn: sqlite3.Connection, total_cores: int) -> Dict[str, Any]:
+    """What the dashboard polls: core usage, running jobs and the queue in start order."""
+    running = [job_dict(r) for r in conn.execute(
+        "SELECT * FROM jobs WHERE status = 'running' ORDER BY started_at"
+    ).fetchall()]
+    used = sum(job["ranks"] for job in running)
+    return {
+        "cores": {"total": total_cores, "used": used, "free": max(0, total_cores - used)},
+        "running": running,
+        "queued": [job_dict(r) for r in queue_order(conn)],
+    }
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _registry_status(job: sqlite3.Row) -> Optional[str]:
+    """The run registry's verdict (e.g. deploy_failed) for a finished job."""
+    if not job["run_id"]:
+        return None
+    try:
+        from run_registry import open_registry
+
+        conn = open_registry(read_settings(job["settings_path"])["paths"]["output_dir"])
+        try:
+            row = conn.execute("SELECT status FROM runs WHERE run_id = ?", (job["run_id"],)).fetchone()
+        finally:
+            conn.close()
+    except (OSError, KeyError, ValueError, sqlite3.Error):
+        return None
+    return row["status"] if row else None
+
+
+class Scheduler:
+    """Starts queued jobs on free cores and reaps finished ones."""
+
+    def __init__(self, db_path: str, cores: int, mpirun: str = "mpirun", poll_s: float = 2.0):
+        self.conn = connect(db_path)
+        self.poll_s = poll_s
+        self.mpirun = mpirun
+
+        try:
+            available = sorted(os.sched_getaffinity(0))
+        except AttributeError:
+            available = list(range(os.cpu_count() or 1))
+        self.cpus = available[:cores]
+        self.total_cores = len(self.cpus)
+        # job id -> Popen for jobs started by this process (None when adopted after a restart)
+        self.procs: Dict[int, Optional[subprocess.Popen]] = {}
+        self._adopt_running()
+
+    def _adopt_running(self) -> None:
+        """Keep tracking jobs left running by a previous scheduler process."""
+        for job in self.conn.execute("SELECT * FROM jobs WHERE status = 'running'").fetchall():
+            if job["pid"] and _pid_alive(job["pid"]):
+                self.procs[job["id"]] = None
+            else:
+                self._finish(job, None, error="Scheduler restarted and the job was no longer running")
+
+    def busy_cpus(self) -> set:
+        busy = set()
+        for row in self.conn.execute("SELECT cpus FROM jobs WHERE status = 'running'"):
+            busy.update(int(c) for c in (row["cpus"] or "").split(",") if c)
+        return busy
+
+    def _command(self, job: sqlite3.Row, run_id: str, cpus: List[int]) -> List[str]:
+        command = [sys.executable, os.path.join(SCRIPT_DIR, "simulate.py"),
+                   "--settings", job["settings_path"], "--run-id", run_id]
+        if job["force"]:
+            command.append("--force")
+        if job["ranks"] > 1:
+            command = [self.mpirun, "-np", str(job["ranks"]), *command]
+        if shutil.which("taskset"):
+            # mpirun and its ranks inherit the core set
+            command = ["taskset", "-c", ",".join(map(str, cpus)), *command]
+        return command
+
+    def _start(self, job: sqlite3.Row, cpus: List[int]) -> None:
+        paths = read_settings(job["settings_path"])["paths"]
+        reserved = {row["run_id"] for row in self.conn.execute(
+            "SELECT run_id FROM jobs WHERE run_id IS NOT NULL AND status = 'running'"
+        )}
+        run_id = new_run_id(str(paths["output_file"]), paths["output_dir"], reserved)
+
+        env = dict(os.environ, OMP_NUM_THREADS="1")
+        with open(job["log_path"], "ab") as log:
+            try:
+                proc = subprocess.Popen(
+                    self._command(job, run_id, cpus), cwd=SCRIPT_DIR, env=env,
+                    stdout=log, stderr=subprocess.STDOUT, start_new_session=True,
+                )
+            except OSError as e:
+                self.conn.execute(
+                    "UPDATE jobs SET status = 'failed', finished_at = ?, error = ? WHERE id = ?",
+                    (time.time(), f"Could not launch: {e}", job["id"]),
+                )
+                self.conn.commit()
+                return
+
+        self.procs[job["id"]] = proc
+        self.conn.execute(
+            "UPDATE jobs SET status = 'running', started_at = ?, run_id = ?, cpus = ?, pid = ? WHERE id = ?",
+            (time.time(), run_id, ",".join(map(str, cpus)), proc.pid, job["id"]),
+        )
+        self.conn.commit()
+        print(f"Started job {job['id']} ({job['user']}, {job['ranks']} ranks) as {run_id}")
+
+    def _finish(self, job: sqlite3.Row, returncode: Optional[int], error: Optional[str] = None) -> None:
+        run_status = _registry_status(job)
+        if job["cancel_requested"]:
+            status = "cancelled"
+        elif returncode is None:
+            # Adopted job: the exit code is lost, so trust the run registry
+            status = "succeeded" if run_status in ("completed", "processed", "deploy_failed") else "failed"
+        else:
+            status = "succeeded" if returncode == 0 else "failed"
+        self.conn.execute(
+            "UPDATE jobs SET status = ?, finished_at = ?, returncode = ?, run_status = ?, "
+            "error = COALESCE(?, error) WHERE id = ?",
+            (status, time.time(), returncode, run_status, error, job["id"]),
+        )
+        self.conn.commit()
+        self.procs.pop(job["id"], None)
+        print(f"Job {job['id']} {status} (exit {returncode}, run {job['run_id']}: {run_status})")
+
+    def reap(self) -> None:
+        for job in self.conn.execute("SELECT * FROM jobs WHERE status = 'running'").fetchall():
+            proc = self.procs.get(job["id"])
+            if job["cancel_requested"] and job["pid"] and _pid_alive(job["pid"]):
+                try:
+                    os.killpg(job["pid"], signal.SIGTERM)
+                except (ProcessLookupError, PermissionError):
+                    pass
+
+            if proc is not None:
+                returncode = proc.poll()
+                if returncode is not None:
+                    self._finish(job, returncode)
+            elif not (job["pid"] and _pid_alive(job["pid"])):
+                self._finish(job, None)
+
+    def schedule(self) -> None:
+        """Start jobs in queue order while they fit.
+
+        A job that does not fit blocks the ones behind it, so a wide job is
+        not starved by a stream of narrow ones.
+        """
+        free = [c for c in self.cpus if c not in self.busy_cpus()]
+        for job in queue_order(self.conn):
+            if job["ranks"] > self.total_cores:
+                self.conn.execute(
+                    "UPDATE jobs SET status = 'failed', finished_at = ?, error = ? WHERE id = ?",
+                    (time.time(), f"Needs {job['ranks']} cores, only {self.total_cores} scheduled", job["id"]),
+                )
+                self.conn.commit()
+                continue
+            if job["ranks"] > len(free):
+                break
+            cpus, free = free[: job["ranks"]], free[job["ranks"]:]
+            self._start(job, cpus)
+
+    def run_forever(self) -> None:
+        while True:
+            self.reap()
+            self.schedule()
+            time.sleep(self.poll_s)
+
+
+def make_http_server(db_path: str, queue_dir: str, total_cores: int, host: str, port: int,
+                     allowed_origins: Sequence[str] = (DEFAULT_DASHBOARD_ORIGIN,)):
+    """JSON API for the dashboard.
+
+    Cross-origin requests are only allowed from ``allowed_origins``. POSTs
+    must be ``application/json``, so a browser always preflights them and
+    other web pages cannot submit or cancel jobs.
+
+    GET  /api/queue              cores in use, running jobs, queue in start order
+    GET  /api/jobs?status=&limit= job history, newest first
+    GET  /api/jobs/<id>          one job plus the tail of its log
+    POST /api/jobs               {"settings", "overrides", "ranks", "priority", "user", "force"}
+    POST /api/jobs/<id>/cancel
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs, urlparse
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, code: int, payload: Any) -> None:
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            # The React dev server runs on another port
+            origin = self.headers.get("Origin")
+            if origin in allowed_origins:
+                self.send_header("Access-Control-Allow-Origin", origin)
+                self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
+                self.send_header("Access-Control-Allow-Headers", "Content-Type")
+            self.send_header("Vary", "Origin")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+        def do_OPTIONS(self) -> None:
+            self._send(204, {})
+
+        def do_GET(self) -> None:
+            url = urlparse(self.path)
+            parts = [p for p in url.path.split("/") if p]
+            conn = connect(db_path)
+            try:
+                if parts == ["api", "queue"]:
+                    self._send(200, queue_state(conn, total_cores))
+                elif parts == ["api", "jobs"]:
+                    query = parse_qs(url.query)
+                    sql, params = "SELECT * FROM jobs", []
+                    if "status" in query:
+                        sql += " WHERE status = ?"
+                        params.append(query["status"][0])
+                    sql += " ORDER BY id DESC LIMIT ?"
+                    params.append(int(query.get("limit", ["100"])[0]))
+                    self._send(200, [job_dict(r) for r in conn.execute(sql, params)])
+                elif len(parts) == 3 and parts[:2] == ["api", "jobs"] and parts[2].isdigit():
+                    row = conn.execute("SELECT * FROM jobs WHERE id = ?", (int(parts[2]),)).fetchone()
+                    if row is None:
+                        self._send(404, {"error": "no such job"})
+                        return
+                    job = job_dict(row)
+                    job["log_tail"] = _log_tail(job["log_path"])
+                    self._send(200, job)
+                else:
+                    self._send(404, {"error": "not found"})
+            finally:
+                conn.close()
+
+        def do_POST(self) -> None:
+            parts = [p for p in urlparse(self.path).path.split("/") if p]
+            origin = self.headers.get("Origin")
+            if origin is not None and origin not in allowed_origins:
+                self._send(403, {"error": f"origin {origin} is not allowed"})
+                return
+            content_type = (self.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+            if content_type != "application/json":
+                self._send(415, {"error": "Content-Type must be application/json"})
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                self._send(400, {"error": "body must be JSON"})
+                return
+
+            conn = connect(db_path)
+            try:
+                if parts == ["api", "jobs"]:
+                    try:
+                        job_id = submit_job(
+                            conn, queue_dir,
+                            settings_path=body.get("settings") or os.path.join(SCRIPT_DIR, "settings.toml"),
+                            overrides=body.get("overrides") or {},
+                            ranks=int(body.get("ranks", 1)),
+                            priority=int(body.get("priority", 0)),
+                            user=str(body.get("user", "dashboard")),
+                            force=bool(body.get("force", False)),
+                            max_ranks=total_cores,
+                        )
+                    except (OSError, ValueError) as e:
+                        self._send(400, {"error": str(e)})
+                        return
+                    row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+                    self._send(201, job_dict(row))
+                elif len(parts) == 4 and parts[:2] == ["api", "jobs"] and parts[3] == "cancel" and parts[2].isdigit():
+                    if cancel_job(conn, int(parts[2])):
+                        self._send(200, {"cancelled": int(parts[2])})
+                    else:
+                        self._send(409, {"error": "job is not queued or running"})
+                else:
+                    self._send(404, {"error": "not found"})
+            finally:
+                conn.close()
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+def _log_tail(path: Optional[str], lines: int = 40) -> List[str]:
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - 64 * 1024))
+        return f.read().decode("utf-8", errors="replace").splitlines()[-lines:]
+
+
+def _print_jobs(rows: List[sqlite3.Row]) -> None:
+    print(f"{'id':>5s} {'status':<10s} {'user':<12s} {'prio':>4s} {'ranks':>5s} {'run id':<40s} {'run status':<18s}")
+    for job in rows:
+        print(
+            f"{job['id']:5d} {job['status']:<10s} {job['user']:<12s} {job['priority']:4d} {job['ranks']:5d} "
+            f"{job['run_id'] or '':<40s} {job['run_status'] or '':<18s}"
+        )
+
+
+def main() -> None:
+    import argparse
+    import getpass
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queue-dir", default=DEFAULT_QUEUE_DIR, help="Queue database and per-job folders")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="Run queued jobs and the HTTP API")
+    serve.add_argument("--cores", type=int, default=os.cpu_count() or 1, help="Cores jobs may use in total")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve.add_argument("--mpirun", default=os.environ.get("MPIRUN", "mpirun"))
+    serve.add_argument("--poll", type=float, default=2.0, help="Seconds between scheduling passes")
+    serve.add_argument("--allow-origin", action="append", metavar="ORIGIN",
+                       help=f"Dashboard origin allowed to call the API, repeatable (default {DEFAULT_DASHBOARD_ORIGIN})")
+
+    submit = commands.add_parser("submit", help="Queue a scenario")
+    submit.add_argument("--settings", default=os.path.join(SCRIPT_DIR, "settings.toml"))
+    submit.add_argument("--set", action="append", default=[], metavar="SECTION.KEY=VALUE",
+                        help="Override a setting, repeatable (value is read as TOML)")
+    submit.add_argument("--ranks", type=int, default=1)
+    submit.add_argument("--priority", type=int, default=0, help="Higher starts first")
+    submit.add_argument("--user", default=getpass.getuser())
+    submit.add_argument("--force", action="store_true", help="Simulate even if an identical run exists")
+
+    list_cmd = commands.add_parser("list", help="Show running and queued jobs")
+    list_cmd.add_argument("--all", action="store_true", help="Include finished jobs")
+
+    cancel = commands.add_parser("cancel", help="Cancel a queued or running job")
+    cancel.add_argument("job_id", type=int)
+    args = parser.parse_args()
+
+    db_path = os.path.join(args.queue_dir, "queue.sqlite")
+
+    if args.command == "serve":
+        scheduler = Scheduler(db_path, args.cores, mpirun=args.mpirun, poll_s=args.poll)
+        server = make_http_server(db_path, args.queue_dir, scheduler.total_cores, args.host, args.port,
+                                  allowed_origins=args.allow_origin or [DEFAULT_DASHBOARD_ORIGIN])
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"Scheduling on {scheduler.total_cores} cores; API at http://{args.host}:{args.port}/api/queue")
+        try:
+            scheduler.run_forever()
+        except KeyboardInterrupt:
+            # Running jobs keep going and are picked up again on the next start
+            server.shutdown()
+        return
+
+    conn = connect(db_path)
+    if args.command == "submit":
+        try:
+            overrides = dict(parse_override(item) for item in args.set)
+            job_id = submit_job(conn, args.queue_dir, args.settings, overrides, ranks=args.ranks,
+                                priority=args.priority, user=args.user, force=args.force,
+                                max_ranks=os.cpu_count())
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"Queued job {job_id}")
+    elif args.command == "list":
+        if args.all:
+            rows = conn.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT 100").fetchall()
+        else:
+            rows = conn.execute("SELECT * FROM jobs WHERE status = 'running' ORDER BY started_at").fetchall()
+            rows += queue_order(conn)
+        _print_jobs(rows)
+    else:
+        if not cancel_job(conn, args.job_id):
+            print(f"Job {args.job_id} is not queued or running")
+            sys.exit(1)
+        print(f"Cancel requested for job {args.job_id}")
+
+
+if __name__ == "__main__":
+    main()
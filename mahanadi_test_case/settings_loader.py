@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import os
-from typing import Any, Dict
+from typing import Any, Dict, Iterable, Optional, Tuple
 import datetime
 
 try:
@@ -20,6 +20,7 @@ from config import (
     ParallelConfig,
     PostprocessingConfig,
     BoundaryConfig,
+    ProbesConfig,
     validate_config,
 )
 
@@ -35,7 +36,99 @@ def _abs_path(script_dir: str, maybe_rel: str) -> str:
     return os.path.join(script_dir, maybe_rel)
 
 
-def load_config(settings_path: str, script_dir: str) -> Config:
+# Settings that load_config resolves against the settings file's folder
+PATH_KEYS = {
+    "paths": ("asc_path", "dam_shp_path", "output_dir", "aoi_shp_path"),
+    "mesh": ("mesh_cache_dir",),
+    "probes": ("shapefiles",),
+}
+
+
+def new_run_id(output_file_name: str, output_dir: str, reserved: Iterable[str] = ()) -> str:
+    """``<output_file>_YYYYMMDD_HHMMSS``, moved on a second at a time past ids already in ``output_dir``.
+
+    Runs started in the same second would otherwise overwrite each other.
+    ``reserved`` adds ids handed out but not yet written (e.g. queued jobs).
+    """
+    now = datetime.datetime.now().replace(microsecond=0)
+    taken = set(reserved)
+    if os.path.isdir(output_dir):
+        taken |= {name.split(".")[0] for name in os.listdir(output_dir)}
+
+    while True:
+        run_id = f"{output_file_name}_{now.strftime('%Y%m%d_%H%M%S')}"
+        if not any(name == run_id or name.startswith(f"{run_id}_") for name in taken):
+            return run_id
+        now += datetime.timedelta(seconds=1)
+
+
+def parse_override(text: str) -> Tuple[str, Any]:
+    """``"section.key=value"`` with ``value`` read as a TOML value (bare text is a string)."""
+    name, sep, value = text.partition("=")
+    if not sep or "." not in name:
+        raise ValueError(f"Override '{text}' must look like section.key=value")
+    try:
+        parsed = tomllib.loads(f"value = {value.strip()}")["value"]
+    except tomllib.TOMLDecodeError:
+        parsed = value.strip()
+    return name.strip(), parsed
+
+
+def read_settings(settings_path: str, overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Dict[str, Any]]:
+    """Raw settings sections with ``{"section.key": value}`` overrides applied.
+
+    Relative paths are made absolute against the settings file's folder, so
+    the result can be written anywhere with ``write_settings``.
+    """
+    with open(settings_path, "rb") as f:
+        sections = tomllib.load(f)
+
+    for name, value in (overrides or {}).items():
+        section, _, key = name.partition(".")
+        if not key:
+            raise ValueError(f"Override '{name}' must look like section.key")
+        sections.setdefault(section, {})[key] = value
+
+    script_dir = os.path.dirname(os.path.abspath(settings_path))
+    sections.setdefault("mesh", {}).setdefault("mesh_cache_dir", "mesh_cache")
+    for section, keys in PATH_KEYS.items():
+        for key in keys:
+            value = sections.get(section, {}).get(key)
+            if isinstance(value, list):
+                sections[section][key] = [_abs_path(script_dir, str(v)) for v in value]
+            elif value is not None:
+                sections[section][key] = _abs_path(script_dir, str(value))
+    return sections
+
+
+def _toml_value(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, (list, tuple)):
+        return "[" + ", ".join(_toml_value(v) for v in value) + "]"
+    escaped = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"'
+
+
+def write_settings(path: str, sections: Dict[str, Dict[str, Any]]) -> str:
+    """Write a settings.toml compatible with ``load_config``."""
+    lines = []
+    for section, values in sections.items():
+        lines.append(f"[{section}]")
+        for key, value in values.items():
+            lines.append(f"{key} = {_toml_value(value)}")
+        lines.append("")
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines))
+    return path
+
+
+def load_config(settings_path: str, script_dir: str, run_id: Optional[str] = None) -> Config:
+    """Read and validate settings; ``run_id`` reuses an id (e.g. from rank 0) instead of minting one."""
     with open(settings_path, "rb") as f:
         raw = tomllib.load(f)
 
@@ -48,10 +141,11 @@ def load_config(settings_path: str, script_dir: str) -> Config:
     parallel = raw.get("parallel", {})
     postproc = raw.get("postprocessing", {})
     boundary = raw.get("boundary", {}) 
+    probes = raw.get("probes", {})
     
     output_file_name = str(_require(paths, "output_file", "paths"))
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M")
-    dynamic_run_id = f"{output_file_name}_{timestamp}"
+    output_dir = _abs_path(script_dir, str(_require(paths, "output_dir", "paths")))
+    dynamic_run_id = run_id or new_run_id(output_file_name, output_dir)
 
     cfg = Config(
         paths=PathsConfig(
@@ -59,7 +153,7 @@ def load_config(settings_path: str, script_dir: str) -> Config:
             output_file=dynamic_run_id,
             asc_path=_abs_path(script_dir, str(_require(paths, "asc_path", "paths"))),
             dam_shp_path=_abs_path(script_dir, str(_require(paths, "dam_shp_path", "paths"))),
-            output_dir=_abs_path(script_dir, str(_require(paths, "output_dir", "paths"))),
+            output_dir=output_dir,
             aoi_shp_path=_abs_path(script_dir, str(paths.get("aoi_shp_path", "paths")))
         ),
         mesh=MeshConfig(
@@ -67,6 +161,14 @@ def load_config(settings_path: str, script_dir: str) -> Config:
             min_angle_deg=float(_require(mesh, "min_angle_deg", "mesh")),
             use_cached_mesh=bool(mesh.get("use_cached_mesh", False)),
             mesh_cache_dir=_abs_path(script_dir, str(mesh.get("mesh_cache_dir", "mesh_cache"))),
+            refinement=str(mesh.get("refinement", "none")),
+            background_triangle_area_m2=float(
+                mesh.get("background_triangle_area_m2", 4 * float(mesh.get("max_triangle_area_m2", 0)))
+            ),
+            channel_min_area_km2=float(mesh.get("channel_min_area_km2", 5.0)),
+            steep_slope=float(mesh.get("steep_slope", 0.05)),
+            channel_buffer_m=float(mesh.get("channel_buffer_m", 300.0)),
+            dam_buffer_m=float(mesh.get("dam_buffer_m", 1000.0)),
         ),
         dam_release=DamReleaseConfig(
             inlet_radius_m=float(_require(dam, "inlet_radius_m", "dam_release")),
@@ -78,6 +180,13 @@ def load_config(settings_path: str, script_dir: str) -> Config:
             yieldstep_s=float(_require(sim, "yieldstep_s", "simulation")),
             cfl=float(_require(sim, "cfl", "simulation")),
             print_simulation_logs=bool(_require(sim, "print_simulation_logs", "simulation")),
+            output_mode=str(sim.get("output_mode", "fixed")),
+            mass_balance_threshold_pct=float(sim.get("mass_balance_threshold_pct", 1.0)),
+            min_output_interval_s=float(sim.get("min_output_interval_s", 600.0)),
+            max_output_interval_s=float(sim.get("max_output_interval_s", sim.get("yieldstep_s", 0.0))),
+            wet_area_change=float(sim.get("wet_area_change", 0.02)),
+            depth_change=float(sim.get("depth_change", 0.05)),
+            start_datetime=str(sim.get("start_datetime", "")),
         ),
         initial_conditions=InitialConditionsConfig(
             initial_water_level_m=float(_require(init, "initial_water_level_m", "initial_conditions")),
@@ -93,15 +202,30 @@ def load_config(settings_path: str, script_dir: str) -> Config:
         ),
         parallel=ParallelConfig(
             enable=bool(_require(parallel, "enable", "parallel")),
+            setup_mode=str(parallel.get("setup_mode", "full")),
         ),
         postprocessing=PostprocessingConfig(
             generate_timeseries=bool(postproc.get("generate_timeseries", False)),
             timeseries_steps=int(postproc.get("timeseries_steps", 25)),
             timeseries_cellsize=float(postproc.get("timeseries_cellsize", 10)),
+            rasterizer=str(postproc.get("rasterizer", "native")),
+            products=tuple(str(p) for p in postproc.get("products", ["max_depth"])),
+            product_cellsize=float(postproc.get("product_cellsize", 10)),
+            wet_threshold_m=float(postproc.get("wet_threshold_m", 0.05)),
+            memory_budget_mb=float(postproc.get("memory_budget_mb", 2048)),
+            clip_to_aoi=bool(postproc.get("clip_to_aoi", True)),
+            vector_products=bool(postproc.get("vector_products", False)),
+            depth_bands_m=tuple(float(b) for b in postproc.get("depth_bands_m", [0.5, 1.0, 2.0, 5.0])),
         ),
         boundary=BoundaryConfig(
             use_polygon_boundary=bool(boundary.get("use_polygon_boundary", False)),
             boundary_type=str(boundary.get("boundary_type", "transmissive")),
+            simplify_factor=float(boundary.get("simplify_factor", 0.0)),
+        ),
+        probes=ProbesConfig(
+            shapefiles=tuple(_abs_path(script_dir, str(p)) for p in probes.get("shapefiles", [])),
+            buffer_steps=int(probes.get("buffer_steps", 2048)),
+            interval_s=float(probes.get("interval_s", 0.0)),
         ),
     )
 
@@ -1,37 +1,89 @@
 import os
+import argparse
 
 from settings_loader import load_config
 from simulation import run_simulation
-from bridge import AnugaGeoserverBridge
+
+def broadcast(value):
+    """Rank 0's ``value`` on every rank (unchanged for serial runs)."""
+    try:
+        from mpi4py import MPI
+    except ImportError:
+        return value
+    return MPI.COMM_WORLD.bcast(value, root=0)
 
 def main():
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    settings_path = os.path.join(script_dir, "settings.toml")
+    parser = argparse.ArgumentParser(description="Run the dam-release simulation and publish it to GeoServer")
+    parser.add_argument("--force", action="store_true",
+                        help="Simulate even if an identical run is already in the run registry")
+    parser.add_argument("--settings", help="settings.toml to use (default: the one next to simulate.py)")
+    parser.add_argument("--run-id", help="Use this run id instead of minting one (set by the job scheduler)")
+    args = parser.parse_args()
+
+    settings_path = os.path.abspath(args.settings or os.path.join(os.path.dirname(os.path.abspath(__file__)), "settings.toml"))
+    script_dir = os.path.dirname(settings_path)
 
-    cfg = load_config(settings_path, script_dir)
-    run_simulation(cfg)
-    
     try:
         from anuga import myid
     except ImportError:
         myid = 0
 
+    # Every rank must agree on the run id and on whether to simulate at all
+    cfg = load_config(settings_path, script_dir, run_id=args.run_id)
+    cached = None
+    if myid == 0 and not args.force:
+        from run_cache import cache_key, find_cached_run
+
+        cached = find_cached_run(cfg, cache_key(cfg))
+    run_id, cached_run_id = broadcast((cfg.paths.output_file, cached["run_id"] if cached else None))
+    cfg = load_config(settings_path, script_dir, run_id=run_id)
+
+    if cached_run_id:
+        if myid == 0:
+            print("=" * 70)
+            print(f"IDENTICAL RUN FOUND: {cached_run_id} (use --force to re-simulate)")
+            print("=" * 70)
+        run_id = cached_run_id
+        timings = None
+    else:
+        if myid == 0:
+            from run_registry import record_run
+
+            record_run(cfg, run_id, "running", finished=False)
+        try:
+            timings = run_simulation(cfg)
+        except Exception as e:
+            if myid == 0:
+                record_run(cfg, run_id, "simulation_failed", error=f"{type(e).__name__}: {e}")
+            raise
+
     if myid == 0:
         print("\n" + "="*70)
         print("SIMULATION FINISHED. STARTING AUTOMATED DEPLOYMENT...")
         print("="*70)
-        
+
         try:
+            # Only rank 0 post-processes, so the other ranks never import the bridge
+            from bridge import AnugaGeoserverBridge
+
             bridge = AnugaGeoserverBridge(settings_path, script_dir)
-            bridge.run_post_processing(
-                target_sww_name=cfg.paths.output_file,
-                generate_timeseries=cfg.postprocessing.generate_timeseries
+            status = bridge.run_post_processing(
+                target_sww_name=run_id,
+                generate_timeseries=cfg.postprocessing.generate_timeseries,
+                reuse_existing=bool(cached_run_id),
+                phases=timings,
             )
-            print("\nDEPLOYMENT COMPLETE. Check your React App.")
+            if status == "completed":
+                print("\nDEPLOYMENT COMPLETE. Check your React App.")
+            else:
+                print(f"\nDEPLOYMENT INCOMPLETE: run recorded as '{status}'")
         except Exception as e:
             print(f"\nDeployment failed: {e}")
-    
+            from run_registry import record_run
+
+            record_run(cfg, run_id, "postprocess_failed", phases=timings, error=str(e))
+
     print("Process finished.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,15 +1,23 @@
 from __future__ import annotations
 
 import os
+import gc
 import math
 import time
-from typing import Callable, Tuple, Dict, List
+import shutil
+import resource
+from typing import Callable, Dict, Optional
 
 import numpy as np
 import anuga
-import shapefile
+from anuga.operators.base_operator import Operator
 
 from config import Config
+from geometry import prepare_geometry, read_first_point
+from mass_balance import MassBalance
+from output_scheduler import OutputScheduler, start_datetime, write_frame_log
+from probes import ProbeSampler, merge_probe_files, read_probe_features
+from refinement import dem_refinement_regions
 
 
 # =============================================================================
@@ -39,41 +47,141 @@ def asc_extent(header):
     return xmin, ymin, xmax, ymax
 
 
-def read_first_point(shp_path: str) -> Tuple[float, float]:
-    sf = shapefile.Reader(shp_path)
-    shapes = sf.shapes()
+def dem_grid_path(asc_path: str) -> str:
+    return os.path.splitext(asc_path)[0] + "_grid.npy"
 
-    if not shapes:
-        raise ValueError("Shapefile has no features")
 
-    shp = shapes[0]
+def asc_to_grid(asc_path: str) -> str:
+    """Stream an ASC DEM into a float32 .npy grid that can be memory-mapped.
 
-    if shp.shapeType not in (shapefile.POINT, shapefile.POINTZ, shapefile.POINTM):
-        raise ValueError("Expected point shapefile")
+    Rows are converted one at a time so the full DEM is never held in RAM.
+    The grid is reused while it is newer than the ASC file.
+    """
+    grid_path = dem_grid_path(asc_path)
+    if os.path.exists(grid_path) and os.path.getmtime(grid_path) >= os.path.getmtime(asc_path):
+        return grid_path
 
-    x, y = shp.points[0]
-    return float(x), float(y)
+    header = read_asc_header(asc_path)
+    nrows, ncols = int(header["nrows"]), int(header["ncols"])
 
-def read_polygon_from_shapefile(shp_path: str) -> List[Tuple[float, float]]:
-    sf = shapefile.Reader(shp_path)
-    shapes = sf.shapes()
-
-    if not shapes:
-        raise ValueError("Shapefile has no features")
-
-    shp = shapes[0]
-
-    if shp.shapeType not in (shapefile.POLYGON, shapefile.POLYGONZ, shapefile.POLYGONM):
-        raise ValueError(f"Expected polygon shapefile, got shapeType {shp.shapeType}")
+    tmp_path = grid_path + ".tmp.npy"
+    grid = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(nrows, ncols))
+    with open(asc_path, "r", encoding="utf-8") as f:
+        for _ in range(6):
+            f.readline()
+        for row, line in enumerate(f):
+            if row >= nrows:
+                break
+            grid[row, :] = np.asarray(line.split(), dtype=np.float32)
+    grid.flush()
+    del grid
+    os.replace(tmp_path, grid_path)
+    return grid_path
+
+
+def build_dem_sampler(asc_path: str, chunk_size: int = 1_000_000) -> Callable:
+    """Bilinear DEM lookup ``f(x, y)`` backed by the memory-mapped grid.
+
+    Only the DEM pages under the requested points are read, so each rank can
+    fill elevation for its own triangles without the DEM point cloud.
+    """
+    header = read_asc_header(asc_path)
+    xll = float(header["xllcorner"])
+    yll = float(header["yllcorner"])
+    cs = float(header["cellsize"])
+    nrows, ncols = int(header["nrows"]), int(header["ncols"])
+    nodata = float(header.get("nodata_value", -9999))
+    ytop = yll + nrows * cs
+
+    grid = np.load(asc_to_grid(asc_path), mmap_mode="r")
+
+    def elevation(x, y):
+        x = np.asarray(x, dtype=float).ravel()
+        y = np.asarray(y, dtype=float).ravel()
+        z = np.zeros(len(x))
+
+        for start in range(0, len(x), chunk_size):
+            sl = slice(start, start + chunk_size)
+
+            # Fractional indices relative to cell centres
+            col = np.clip((x[sl] - xll) / cs - 0.5, 0, ncols - 1)
+            row = np.clip((ytop - y[sl]) / cs - 0.5, 0, nrows - 1)
+            c0 = np.minimum(col.astype(int), ncols - 2) if ncols > 1 else np.zeros(len(col), int)
+            r0 = np.minimum(row.astype(int), nrows - 2) if nrows > 1 else np.zeros(len(row), int)
+            c1 = np.minimum(c0 + 1, ncols - 1)
+            r1 = np.minimum(r0 + 1, nrows - 1)
+            fc = col - c0
+            fr = row - r0
+
+            corners = [
+                (grid[r0, c0], (1 - fr) * (1 - fc)),
+                (grid[r0, c1], (1 - fr) * fc),
+                (grid[r1, c0], fr * (1 - fc)),
+                (grid[r1, c1], fr * fc),
+            ]
+
+            # Drop NODATA corners and renormalise the remaining weights
+            total = np.zeros(len(col))
+            weight = np.zeros(len(col))
+            for values, w in corners:
+                valid = values != nodata
+                total += np.where(valid, values * w, 0.0)
+                weight += np.where(valid, w, 0.0)
+
+            # Weights can all be zero when a point sits exactly on a valid
+            # corner whose neighbours are NODATA; fall back to any valid corner
+            fallback = np.zeros(len(col))
+            found = np.zeros(len(col), dtype=bool)
+            for values, _ in corners:
+                take = (~found) & (values != nodata)
+                fallback[take] = values[take]
+                found |= take
+
+            z[sl] = np.where(weight > 0, total / np.where(weight > 0, weight, 1.0), fallback)
+
+        return z
+
+    return elevation
+
+
+def boundary_tolerance(cfg: Config) -> float:
+    """AOI simplification tolerance: a fraction of the boundary triangle edge."""
+    area = cfg.mesh.background_triangle_area_m2 if cfg.mesh.refinement == "dem" else cfg.mesh.max_triangle_area_m2
+    # Leg of a right isosceles triangle with that area
+    return cfg.boundary.simplify_factor * math.sqrt(2.0 * area)
+
+
+def build_refinement_regions(cfg: Config, bounding_polygon, dam_xy, interior_holes=None) -> list:
+    """DEM-derived ``interior_regions`` meshed at ``max_triangle_area_m2``, clear of the AOI holes."""
+    header = read_asc_header(cfg.paths.asc_path)
+    grid = np.load(asc_to_grid(cfg.paths.asc_path), mmap_mode="r")
+
+    regions, stats = dem_refinement_regions(
+        grid,
+        header,
+        bounding_polygon,
+        dam_xy,
+        max_triangle_area_m2=cfg.mesh.max_triangle_area_m2,
+        channel_min_area_km2=cfg.mesh.channel_min_area_km2,
+        steep_slope=cfg.mesh.steep_slope,
+        channel_buffer_m=cfg.mesh.channel_buffer_m,
+        dam_buffer_m=cfg.mesh.dam_buffer_m,
+        holes=interior_holes or (),
+    )
+
+    share = 100.0 * stats["refined_cells"] / max(1, stats["total_cells"])
+    print(
+        f"[rank 0] DEM refinement: {stats['regions']} regions over {share:.0f}% of the domain "
+        f"(channel={stats['channel_cells']}, steep={stats['steep_cells']}, dam={stats['dam_cells']} "
+        f"cells at {stats['work_cellsize_m']} m)"
+    )
+    return regions
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is reported in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
 
-    points = shp.points
-    
-    polygon = [(float(x), float(y)) for x, y in points]
-    
-    if polygon[0] != polygon[-1]:
-        polygon.append(polygon[0])
-    
-    return polygon
 
 # =============================================================================
 # Forcing builders
@@ -137,6 +245,200 @@ def build_rainfall(cfg: Config) -> Callable[[float], float]:
 
     return rainfall_mps
 
+def configure_domain(domain, cfg: Config) -> None:
+    domain.set_minimum_storable_height(0.01)
+    domain.set_flow_algorithm("DE0")
+    domain.set_CFL(cfg.simulation.cfl)
+
+
+def partition_dir(cfg: Config) -> str:
+    return os.path.join(cfg.paths.output_dir, f"{cfg.paths.output_file}_partitions")
+
+
+def dump_partitions(domain, cfg: Config) -> None:
+    """Rank 0: pickle one submesh per rank to disk, one at a time.
+
+    The caller must drop its own reference to ``domain`` (and collect) before
+    ``load_partition``; a reference held here would keep the full mesh alive.
+    """
+    from anuga import numprocs, sequential_distribute_dump
+
+    os.makedirs(partition_dir(cfg), exist_ok=True)
+    sequential_distribute_dump(domain, numprocs, partition_dir=partition_dir(cfg), verbose=False)
+
+
+def load_partition(cfg: Config):
+    """Every rank loads only its own submesh written by ``dump_partitions``."""
+    from anuga import myid, barrier, sequential_distribute_load
+
+    barrier()
+    domain = sequential_distribute_load(
+        filename=cfg.paths.output_file, partition_dir=partition_dir(cfg), verbose=False
+    )
+    barrier()
+
+    if myid == 0:
+        shutil.rmtree(partition_dir(cfg), ignore_errors=True)
+
+    configure_domain(domain, cfg)
+    return domain
+
+
+# =============================================================================
+# Probes
+# =============================================================================
+
+class Probe_operator(Operator):
+    """Hands the vertex values to a ProbeSampler after every internal timestep."""
+
+    def __init__(self, domain, sampler: ProbeSampler):
+        Operator.__init__(self, domain, description="Point gauges and cross-section discharge", label="probes")
+        self.sampler = sampler
+        self.elapsed = 0.0
+
+    def __call__(self):
+        start = time.perf_counter()
+        q = self.domain.quantities
+        self.sampler.sample(
+            self.domain.get_time(),
+            q["stage"].vertex_values,
+            q["elevation"].vertex_values,
+            q["xmomentum"].vertex_values,
+            q["ymomentum"].vertex_values,
+        )
+        self.elapsed += time.perf_counter() - start
+
+    def parallel_safe(self):
+        return True
+
+    def statistics(self):
+        return f"{self.sampler.point_ids.size} point and {self.sampler.line_ids.size} line probes"
+
+    def timestepping_statistics(self):
+        return f"probes: {self.sampler.rows_written + self.sampler.count} samples"
+
+
+def probe_prefix(cfg: Config) -> str:
+    return os.path.join(cfg.paths.output_dir, f"{cfg.paths.output_file}_probes")
+
+
+def attach_probes(domain, cfg: Config, rank: int) -> Probe_operator:
+    """Locate the probes on this rank's (distributed) triangles and sample every step."""
+    features = read_probe_features(cfg.probes.shapefiles)
+    triangles_xy = np.asarray(domain.get_vertex_coordinates(absolute=True)).reshape(-1, 3, 2)
+    full = getattr(domain, "tri_full_flag", None)
+    sampler = ProbeSampler(
+        features,
+        triangles_xy,
+        None if full is None else np.asarray(full) == 1,
+        probe_prefix(cfg),
+        rank=rank,
+        buffer_steps=cfg.probes.buffer_steps,
+        interval_s=cfg.probes.interval_s,
+    )
+    operator = Probe_operator(domain, sampler)
+    operator()  # initial state; the evolve loop's own t = 0 call is then skipped
+    return operator
+
+
+# =============================================================================
+# Adaptive output
+# =============================================================================
+
+def allreduce_sum(values: np.ndarray) -> np.ndarray:
+    from mpi4py import MPI
+
+    total = np.empty_like(values)
+    MPI.COMM_WORLD.Allreduce(values, total, op=MPI.SUM)
+    return total
+
+
+def full_triangles(domain):
+    """Index of the triangles this rank owns (all of them in a serial run)."""
+    full = getattr(domain, "tri_full_flag", None)
+    return slice(None) if full is None else np.flatnonzero(np.asarray(full) == 1)
+
+
+def build_output_scheduler(domain, cfg: Config, final_time: float, is_parallel: bool):
+    """OutputScheduler plus a function returning (depth, area) of this rank's full triangles."""
+    owned = full_triangles(domain)
+    area = np.asarray(domain.areas)[owned]
+    stage = domain.quantities["stage"]
+    elevation = domain.quantities["elevation"]
+
+    def state():
+        return stage.centroid_values[owned] - elevation.centroid_values[owned], area
+
+    scheduler = OutputScheduler(
+        min_interval_s=cfg.simulation.min_output_interval_s,
+        max_interval_s=cfg.simulation.max_output_interval_s,
+        wet_area_change=cfg.simulation.wet_area_change,
+        depth_change=cfg.simulation.depth_change,
+        wet_threshold=cfg.postprocessing.wet_threshold_m,
+        final_time=final_time,
+        reduce=allreduce_sum if is_parallel else None,
+    )
+    return scheduler, state
+
+
+# =============================================================================
+# Mass balance
+# =============================================================================
+
+def boundary_inflow(domain) -> Callable[[], float]:
+    """This rank's net inflow through the domain boundary so far (m^3).
+
+    Read from the domain's boundary_flux_integral_operator, which the DE
+    flow algorithms update on every rank's full triangles. This is the
+    per-rank value behind ``domain.get_boundary_flux_integral()``, which
+    sums to rank 0 only; MassBalance reduces it across ranks itself.
+    """
+    if domain.get_compute_fluxes_method() != "DE":
+        raise RuntimeError("Mass balance needs a DE flow algorithm: ANUGA only integrates the boundary flux there")
+    operator = domain.boundary_flux_integral
+    return lambda: float(np.sum(operator.boundary_flux_integral))
+
+
+def build_mass_balance(domain, cfg: Config, dam_Q: Callable[[float], float],
+                       rain_rate: Optional[Callable[[float], float]], is_parallel: bool, rank: int):
+    """MassBalance plus a function returning the depth of this rank's full triangles.
+
+    ``rain_rate`` is None when no rainfall operator is attached.
+    """
+    owned = full_triangles(domain)
+    area = np.asarray(domain.areas, dtype=np.float64)[owned]
+    stage = domain.quantities["stage"]
+    elevation = domain.quantities["elevation"]
+
+    rain_area = 0.0
+    if rain_rate is not None:
+        local = np.array([float(area.sum())])
+        rain_area = float((allreduce_sum(local) if is_parallel else local)[0])
+
+    def inflow_rate(t):
+        return dam_Q(t) + (rain_rate(t) * rain_area if rain_rate is not None else 0.0)
+
+    def depth():
+        return stage.centroid_values[owned] - elevation.centroid_values[owned]
+
+    balance = MassBalance(
+        inflow_rate=inflow_rate,
+        area=area,
+        boundary_flux=boundary_inflow(domain),
+        threshold_pct=cfg.simulation.mass_balance_threshold_pct,
+        reduce=allreduce_sum if is_parallel else None,
+        log_path=os.path.join(cfg.paths.output_dir, f"{cfg.paths.output_file}_mass_balance.jsonl") if rank == 0 else None,
+    )
+    return balance, depth
+
+
+def balance_note(record: Dict[str, float]) -> str:
+    """Progress-line suffix for one mass balance record."""
+    if record["imbalance_pct"] is None:
+        return ""
+    return f"  balance {record['imbalance_pct']:+.2f}%" + (" !" if record["flagged"] else "")
+
+
 def get_mesh_filepath(cfg: Config) -> str:
     boundary_suffix = ""
     if cfg.boundary.use_polygon_boundary:
@@ -144,7 +446,11 @@ def get_mesh_filepath(cfg: Config) -> str:
     else:
         boundary_suffix = f"_rect_{cfg.boundary.boundary_type}"
         
-    mesh_filename = f"{cfg.paths.name_stem}{boundary_suffix}.msh"
+    refinement_suffix = "_dem" if cfg.mesh.refinement == "dem" else ""
+    simplify_suffix = ""
+    if cfg.boundary.use_polygon_boundary and cfg.boundary.simplify_factor > 0:
+        simplify_suffix = f"_s{boundary_tolerance(cfg):.0f}"
+    mesh_filename = f"{cfg.paths.name_stem}{boundary_suffix}{refinement_suffix}{simplify_suffix}.msh"
     return os.path.join(cfg.mesh.mesh_cache_dir, mesh_filename)
 
 
@@ -152,10 +458,13 @@ def get_mesh_filepath(cfg: Config) -> str:
 # Main simulation runner
 # =============================================================================
 
-def run_simulation(cfg: Config) -> None:
+def run_simulation(cfg: Config) -> Dict[str, float]:
+    """Run the scenario; returns per-phase seconds plus triangle/step counts."""
     from anuga import myid, numprocs, distribute, barrier, finalize
 
+    timings: Dict[str, float] = {}
     is_parallel = bool(cfg.parallel.enable) and numprocs > 1
+    lean_setup = cfg.parallel.setup_mode != "full"
 
     if myid == 0:
         print("=" * 70)
@@ -183,6 +492,9 @@ def run_simulation(cfg: Config) -> None:
         print(f"  Initial stage: {cfg.initial_conditions.initial_water_level_m} m")
         print(f"  Manning n: {cfg.initial_conditions.friction_mannings_n}")
         print(f"  Max triangle area: {cfg.mesh.max_triangle_area_m2} m^2")
+        if cfg.mesh.refinement == "dem":
+            print(f"  Mesh refinement: DEM (background {cfg.mesh.background_triangle_area_m2} m^2)")
+        print(f"  Setup mode: {cfg.parallel.setup_mode.upper()}")
         print("=" * 70)
 
     os.makedirs(cfg.paths.output_dir, exist_ok=True)
@@ -192,32 +504,44 @@ def run_simulation(cfg: Config) -> None:
     dam_x = dam_y = None
 
     if myid == 0:
+        phase_start = time.time()
+
         # Load DEM header + extent
         header = read_asc_header(cfg.paths.asc_path)
         xmin, ymin, xmax, ymax = asc_extent(header)
 
-        # Load dam location + check inside DEM
-        dam_x, dam_y = read_first_point(cfg.paths.dam_shp_path)
-        
+        interior_holes = None
+        hole_tags = None
+
         # Determine bounding polygon and boundary tags based on configuration
         if cfg.boundary.use_polygon_boundary:
-            # Use polygon from shapefile
-            bounding_polygon = read_polygon_from_shapefile(cfg.paths.aoi_shp_path)
-            
+            # Validated, simplified AOI + dam point (raises if the dam is outside)
+            geometry = prepare_geometry(
+                cfg.paths.aoi_shp_path,
+                cfg.paths.dam_shp_path,
+                boundary_tolerance(cfg),
+                cache_dir=cfg.mesh.mesh_cache_dir,
+            )
+            bounding_polygon = geometry.bounding_polygon
+            dam_x, dam_y = geometry.dam_xy
+
             # Tag all polygon edges with a single tag
             num_edges = len(bounding_polygon) - 1  # -1 because polygon is closed
             boundary_tags = {"exterior": list(range(num_edges))}
-            
-            print(f"[rank 0] Using polygon boundary with {num_edges} edges")
-            
-            # Verify dam is inside polygon (simple bounding box check)
-            poly_xs = [p[0] for p in bounding_polygon]
-            poly_ys = [p[1] for p in bounding_polygon]
-            poly_xmin, poly_xmax = min(poly_xs), max(poly_xs)
-            poly_ymin, poly_ymax = min(poly_ys), max(poly_ys)
-            
-            if not (poly_xmin <= dam_x <= poly_xmax and poly_ymin <= dam_y <= poly_ymax):
-                print(f"WARNING: Dam point ({dam_x:.1f}, {dam_y:.1f}) may be outside polygon bounds!")
+
+            if geometry.interior_holes:
+                interior_holes = geometry.interior_holes
+                hole_tags = [{"hole": list(range(len(hole) - 1))} for hole in interior_holes]
+
+            print(
+                f"[rank 0] Using polygon boundary with {num_edges} edges"
+                f" ({geometry.original_segments} -> {geometry.segments} boundary segments"
+                f" at {geometry.tolerance_m:.1f} m tolerance"
+                + (f", {len(interior_holes)} holes" if interior_holes else "")
+                + (f", {geometry.dropped_parts} disjoint parts dropped" if geometry.dropped_parts else "")
+                + ")"
+            )
+            timings["boundary_segments"] = float(geometry.segments)
         else:
             # Use rectangular DEM extent
             bounding_polygon = [(xmin, ymin), (xmax, ymin), (xmax, ymax), (xmin, ymax)]
@@ -226,14 +550,28 @@ def run_simulation(cfg: Config) -> None:
             print(f"[rank 0] Using rectangular DEM boundary")
             
             # Check dam inside DEM
+            dam_x, dam_y = read_first_point(cfg.paths.dam_shp_path)
             if not (xmin <= dam_x <= xmax and ymin <= dam_y <= ymax):
                 raise ValueError("Dam point is outside DEM extent!")
 
-        # Convert DEM -> .dem -> .pts (cached for speed)
-        anuga.asc2dem(cfg.paths.asc_path, use_cache=False, verbose=False)
-        dem_path = os.path.join(os.path.dirname(cfg.paths.asc_path), f"{cfg.paths.name_stem}.dem")
-        pts_path = os.path.join(os.path.dirname(cfg.paths.asc_path), f"{cfg.paths.name_stem}.pts")
-        anuga.dem2pts(dem_path, use_cache=False, verbose=False)
+        if lean_setup:
+            # Memory-mapped grid shared by all ranks for their own elevation
+            asc_to_grid(cfg.paths.asc_path)
+        else:
+            # Convert DEM -> .dem -> .pts (cached for speed)
+            anuga.asc2dem(cfg.paths.asc_path, use_cache=False, verbose=False)
+            dem_path = os.path.join(os.path.dirname(cfg.paths.asc_path), f"{cfg.paths.name_stem}.dem")
+            pts_path = os.path.join(os.path.dirname(cfg.paths.asc_path), f"{cfg.paths.name_stem}.pts")
+            anuga.dem2pts(dem_path, use_cache=False, verbose=False)
+
+        # Fine triangles only where the DEM says the flow is
+        interior_regions = None
+        maximum_triangle_area = cfg.mesh.max_triangle_area_m2
+        if cfg.mesh.refinement == "dem":
+            refine_start = time.time()
+            interior_regions = build_refinement_regions(cfg, bounding_polygon, (dam_x, dam_y), interior_holes)
+            maximum_triangle_area = cfg.mesh.background_triangle_area_m2
+            timings["refinement"] = time.time() - refine_start
 
         # Build mesh + domain        
         mesh_filepath = get_mesh_filepath(cfg)
@@ -248,7 +586,10 @@ def run_simulation(cfg: Config) -> None:
         domain = anuga.create_domain_from_regions(
             bounding_polygon,
             boundary_tags=boundary_tags,
-            maximum_triangle_area=cfg.mesh.max_triangle_area_m2,
+            maximum_triangle_area=maximum_triangle_area,
+            interior_regions=interior_regions,
+            interior_holes=interior_holes,
+            hole_tags=hole_tags,
             minimum_triangle_angle=cfg.mesh.min_angle_deg,
             mesh_filename=mesh_filepath if cfg.mesh.use_cached_mesh else None,
             use_cache=cfg.mesh.use_cached_mesh,
@@ -262,30 +603,61 @@ def run_simulation(cfg: Config) -> None:
             print(f"[rank 0] SAVED MESH TO: {mesh_filepath}")
 
         # Domain settings
-        domain.set_minimum_storable_height(0.01)
-        domain.set_flow_algorithm("DE0")
-        domain.set_CFL(cfg.simulation.cfl)
+        configure_domain(domain, cfg)
 
-        # Elevation (rank 0 only before distribute)
-        domain.set_quantity(
-            "elevation",
-            filename=pts_path,
-            use_cache=True,
-            verbose=False,
-            alpha=0.1,
-        )
+        timings["mesh"] = time.time() - phase_start
+        timings["triangles"] = float(domain.number_of_elements)
+
+        if not lean_setup:
+            phase_start = time.time()
+
+            # Elevation (rank 0 only before distribute)
+            domain.set_quantity(
+                "elevation",
+                filename=pts_path,
+                use_cache=True,
+                verbose=False,
+                alpha=0.1,
+            )
+
+            timings["elevation"] = time.time() - phase_start
 
         if myid == 0:
             print(f"[rank 0] Mesh triangles: {domain.number_of_elements:,}")
-            print(f"[rank 0] PTS used: {pts_path}")
+            if pts_path:
+                print(f"[rank 0] PTS used: {pts_path}")
             print(f"[rank 0] Dam at: ({dam_x:.1f}, {dam_y:.1f})")
 
     if is_parallel:
-        domain = distribute(domain)
+        phase_start = time.time()
+        if cfg.parallel.setup_mode == "streamed":
+            if myid == 0:
+                dump_partitions(domain, cfg)
+            # Only this frame holds the full domain; free it before loading
+            del domain
+            gc.collect()
+            domain = load_partition(cfg)
+        else:
+            domain = distribute(domain)
+        timings["distribute"] = time.time() - phase_start
 
     if domain is None:
         raise RuntimeError("Domain was not created. Check MPI/parallel setup.")
 
+    if lean_setup:
+        # Each rank samples the DEM for its own (full + ghost) triangles only
+        phase_start = time.time()
+        domain.set_quantity(
+            "elevation",
+            function=build_dem_sampler(cfg.paths.asc_path),
+            location="vertices",
+        )
+        timings["elevation"] = time.time() - phase_start
+
+    timings["peak_rss_setup_mb"] = peak_rss_mb()
+    if myid == 0:
+        print(f"[rank 0] Peak RSS after setup: {timings['peak_rss_setup_mb']:,.0f} MB")
+
     domain.set_quantity("stage", cfg.initial_conditions.initial_water_level_m)
     domain.set_quantity("friction", cfg.initial_conditions.friction_mannings_n)
 
@@ -295,27 +667,42 @@ def run_simulation(cfg: Config) -> None:
         bc = anuga.Transmissive_boundary(domain)
     
     if cfg.boundary.use_polygon_boundary:
-        domain.set_boundary({"exterior": bc})
+        # Holes in the AOI are islands/embankments: always walls
+        domain.set_boundary({"exterior": bc, "hole": anuga.Reflective_boundary(domain)})
     else:
         domain.set_boundary({"west": bc, "east": bc, "south": bc, "north": bc})
 
     dam_Q = build_dam_release(cfg)
     rain_rate = build_rainfall(cfg)
 
-    dam_x, dam_y = read_first_point(cfg.paths.dam_shp_path)
+    if dam_x is None:
+        # Rank 0 already has it from the geometry stage
+        dam_x, dam_y = read_first_point(cfg.paths.dam_shp_path)
 
     inlet_region = anuga.Region(domain, center=(dam_x, dam_y), radius=cfg.dam_release.inlet_radius_m)
     anuga.Inlet_operator(domain, inlet_region, Q=dam_Q)
 
+    rain_attached = False
     if cfg.rainfall.enable:
         try:
             from anuga.operators.rate_operators import Rate_operator
             Rate_operator(domain, rate=rain_rate, factor=1.0)
+            rain_attached = True
         except Exception as e:
             if myid == 0:
                 print("Rainfall operator not available:", e)
 
+    probe_op = None
+    if cfg.probes.shapefiles:
+        phase_start = time.time()
+        probe_op = attach_probes(domain, cfg, myid)
+        timings["probe_setup"] = time.time() - phase_start
+
     final_time = cfg.simulation.final_time_hours * 3600.0
+    # Rain only counts as inflow when its operator is adding it to the domain
+    balance, depth = build_mass_balance(domain, cfg, dam_Q, rain_rate if rain_attached else None,
+                                        is_parallel, myid)
+    balance.start(domain.get_time(), depth())
 
     if is_parallel:
         barrier()
@@ -325,20 +712,100 @@ def run_simulation(cfg: Config) -> None:
     if cfg.simulation.print_simulation_logs and myid == 0:
         print(f"{'Time':>10s} {'Progress':>10s}")
 
-    for t in domain.evolve(yieldstep=cfg.simulation.yieldstep_s, finaltime=final_time):
-        if cfg.simulation.print_simulation_logs and myid == 0:
-            progress = 100.0 * t / final_time
-            print(f"{t/3600:8.2f} hr {progress:9.1f}%")
+    frames = []
+    if cfg.simulation.output_mode == "adaptive":
+        scheduler, state = build_output_scheduler(domain, cfg, final_time, is_parallel)
+        # Frames are stored below when the scheduler asks for one, not at every yield
+        domain.set_store(False)
+        domain.initialise_storage()
+
+        for t in domain.evolve(yieldstep=cfg.simulation.min_output_interval_s, finaltime=final_time):
+            record = balance.update(t, depth())
+            reason = scheduler.check(t, *state())
+            if reason is None:
+                continue
+            domain.store_timestep()
+            if cfg.simulation.print_simulation_logs and myid == 0:
+                progress = 100.0 * t / final_time
+                print(f"{t/3600:8.2f} hr {progress:9.1f}%  frame {len(scheduler.frames)} ({reason}){balance_note(record)}")
+        frames = scheduler.frames
+    else:
+        for t in domain.evolve(yieldstep=cfg.simulation.yieldstep_s, finaltime=final_time):
+            frames.append((t, "yieldstep"))
+            record = balance.update(t, depth())
+            if cfg.simulation.print_simulation_logs and myid == 0:
+                progress = 100.0 * t / final_time
+                print(f"{t/3600:8.2f} hr {progress:9.1f}%{balance_note(record)}")
+
+    timings["evolve"] = time.time() - start
+    timings["frames"] = float(len(frames))
+    if myid == 0:
+        write_frame_log(
+            os.path.join(cfg.paths.output_dir, f"{cfg.paths.output_file}_frames.json"),
+            cfg.simulation.output_mode,
+            start_datetime(cfg.simulation.start_datetime, cfg.paths.output_file),
+            frames,
+        )
+    timings["steps"] = float(getattr(domain, "number_of_steps", 0))
+    timings["ranks"] = float(numprocs)
+
+    timings.update(balance.summary())
 
     if is_parallel:
+        phase_start = time.time()
         domain.sww_merge(delete_old=True)
+        timings["merge"] = time.time() - phase_start
+
+    if probe_op is not None:
+        probe_op.sampler.flush()
+        timings["probe_sampling"] = probe_op.elapsed
+        if is_parallel:
+            barrier()
+        if myid == 0:
+            phase_start = time.time()
+            prefix = probe_prefix(cfg)
+            found = merge_probe_files(
+                read_probe_features(cfg.probes.shapefiles),
+                prefix,
+                f"{prefix}.nc",
+                f"{prefix}_summary.geojson",
+                wet_threshold_m=cfg.postprocessing.wet_threshold_m,
+            )
+            timings["probes"] = time.time() - phase_start
+            print(
+                f"Probes: {found['samples']:,d} samples, {found['points_found']} points and "
+                f"{found['lines_found']} lines inside the domain -> {os.path.basename(prefix)}.nc"
+            )
 
     if myid == 0:
         elapsed = time.time() - start
         print("=" * 70)
         print(f"DONE | parallel={is_parallel} | ranks={numprocs} | time={elapsed/60:.1f} min")
+        print("Phase timings: " + ", ".join(
+            f"{name}={timings[name]:.1f}s"
+            for name in ("mesh", "elevation", "distribute", "evolve", "merge")
+            if name in timings
+        ))
+        print(f"Peak rank-0 RSS: {peak_rss_mb():,.0f} MB")
+        if "mass_error_pct" in timings:
+            outflow = timings.get("outflow_m3")
+            print(
+                f"Volume: stored {timings['volume_change_m3']:,.0f} m^3 of {timings['inflow_m3']:,.0f} m^3 inflow, "
+                + ("boundary outflow not tracked" if outflow is None else f"{outflow:,.0f} m^3 boundary outflow")
+                + f" ({timings['mass_error_pct']:+.3f}%; "
+                f"accounting {timings['mass_balance']:.2f}s = {100.0 * timings['mass_balance'] / max(timings['evolve'], 1e-9):.2f}% of evolve)"
+            )
+            if outflow is None:
+                print("WARNING: boundary outflow was not tracked, so the volume balance is flagged as unreliable")
+            elif timings["mass_balance_flagged"]:
+                print(
+                    f"WARNING: volume imbalance exceeds {cfg.simulation.mass_balance_threshold_pct:g}% of the inflow; "
+                    f"see {cfg.paths.output_file}_mass_balance.jsonl"
+                )
         print(f"Outputs: {os.path.abspath(cfg.paths.output_dir)}")
         print("=" * 70)
 
     if is_parallel:
-        finalize()
\ No newline at end of file
+        finalize()
+
+    return timings
\ No newline at end of file
@@ -0,0 +1,477 @@
+"""Flood extent and depth-band polygons straight from the triangular mesh.
+
+Depth is linear on every triangle, so the part of a triangle inside a band
+``lo <= depth < hi`` is a convex polygon whose corners are the triangle
+vertices inside the band and the points where its edges cross ``lo``/``hi``
+(marching triangles). All triangles of a frame are clipped at once with
+whole-array operations; triangles entirely inside one band are kept whole
+and only the ones spanning several bands are cut.
+
+Corners are identified symbolically (a mesh vertex, or a level crossing on a
+mesh edge), so neighbouring pieces share their corners exactly: dissolving a
+band is dropping every directed edge whose reverse is also present and
+chaining what is left into rings. Outer rings come out counter-clockwise and
+holes clockwise. The extent is the dissolve of all bands together.
+
+No raster is involved, and GDAL is not needed: the GeoPackage is written
+with the standard library ``sqlite3``.
+"""
+from __future__ import annotations
+
+import datetime
+import os
+import sqlite3
+import struct
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# (outer ring, [hole rings]); rings are (n, 2) arrays, not repeated at the end
+Polygon = Tuple[np.ndarray, List[np.ndarray]]
+
+
+class MeshContours:
+    """Band polygons of per-vertex values on one mesh.
+
+    ``levels`` are the ascending band boundaries; the last band is open
+    above. Values below ``levels[0]`` are outside every band.
+    """
+
+    def __init__(self, x: np.ndarray, y: np.ndarray, triangles: np.ndarray, levels: Sequence[float]):
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.levels = np.asarray(levels, dtype=float)
+        if len(self.levels) == 0 or np.any(np.diff(self.levels) <= 0):
+            raise ValueError("levels must be non-empty and strictly ascending")
+
+        tri = np.array(triangles, dtype=np.int64)
+        x0, y0 = self.x[tri[:, 0]], self.y[tri[:, 0]]
+        twice_area = (self.x[tri[:, 1]] - x0) * (self.y[tri[:, 2]] - y0) - \
+                     (self.x[tri[:, 2]] - x0) * (self.y[tri[:, 1]] - y0)
+        clockwise = twice_area < 0
+        tri[clockwise, 1], tri[clockwise, 2] = tri[clockwise, 2], tri[clockwise, 1].copy()
+        self.triangles = tri
+
+        # Mesh edge ids: edge k of a triangle runs from vertex k to vertex k+1
+        starts = tri.ravel()
+        ends = tri[:, [1, 2, 0]].ravel()
+        pairs = np.stack([np.minimum(starts, ends), np.maximum(starts, ends)], axis=1)
+        unique, inverse = np.unique(pairs, axis=0, return_inverse=True)
+        self.edge_ends = unique
+        self.edge_ids = inverse.reshape(-1, 3)
+
+    @property
+    def nbytes(self) -> int:
+        return (self.x.nbytes + self.y.nbytes + self.triangles.nbytes
+                + self.edge_ends.nbytes + self.edge_ids.nbytes)
+
+    @property
+    def bands(self) -> List[Tuple[float, float]]:
+        return list(zip(self.levels, list(self.levels[1:]) + [np.inf]))
+
+    def contour(self, values: np.ndarray) -> Tuple[List[Polygon], List[List[Polygon]]]:
+        """(extent polygons, polygons of every band) of per-vertex ``values``."""
+        values = np.asarray(values, dtype=float)
+        num_levels = len(self.levels)
+        num_points = len(self.x)
+
+        # Band of every vertex (-1: below the first level) and range per triangle
+        band = np.searchsorted(self.levels, values, side="right") - 1
+        tri_band = band[self.triangles]
+        lowest, highest = tri_band.min(axis=1), tri_band.max(axis=1)
+
+        frm, to, edge_band = [], [], []
+
+        def add(keys, valid, b):
+            f, t = _piece_edges(keys, valid)
+            frm.append(f)
+            to.append(t)
+            edge_band.append(np.full(len(f), b, dtype=np.int64))
+
+        whole = (lowest == highest) & (lowest >= 0)
+        for b in np.unique(lowest[whole]):
+            keys = self.triangles[whole & (lowest == b)]
+            add(keys, np.ones(keys.shape, dtype=bool), b)
+
+        split = np.flatnonzero((lowest != highest) & (highest >= 0))
+        if len(split):
+            tri = self.triangles[split]
+            tri_values = values[tri]
+            crossing_base = num_points + self.edge_ids[split] * num_levels
+            for b in range(max(0, int(lowest[split].min())), int(highest[split].max()) + 1):
+                spans = (lowest[split] <= b) & (highest[split] >= b)
+                if not spans.any():
+                    continue
+                keys, valid = _clip_band(
+                    tri[spans], tri_values[spans], crossing_base[spans],
+                    b, self.levels[b], self.levels[b + 1] if b + 1 < num_levels else None,
+                )
+                add(keys, valid, b)
+
+        if not frm:
+            return [], [[] for _ in range(num_levels)]
+        frm, to, edge_band = np.concatenate(frm), np.concatenate(to), np.concatenate(edge_band)
+
+        points = lambda keys: self._key_points(keys, values)
+        extent = _polygons(*_dissolve(frm, to), points)
+        bands = []
+        for b in range(num_levels):
+            in_band = edge_band == b
+            bands.append(_polygons(*_dissolve(frm[in_band], to[in_band]), points) if in_band.any() else [])
+        return extent, bands
+
+    def _key_points(self, keys: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """Coordinates of corner keys: mesh vertices, or level crossings on mesh edges."""
+        num_points, num_levels = len(self.x), len(self.levels)
+        xy = np.empty((len(keys), 2))
+
+        vertex = keys < num_points
+        xy[vertex, 0] = self.x[keys[vertex]]
+        xy[vertex, 1] = self.y[keys[vertex]]
+
+        edge, level = np.divmod(keys[~vertex] - num_points, num_levels)
+        a, b = self.edge_ends[edge, 0], self.edge_ends[edge, 1]
+        # Computed from the canonical (a < b) edge direction, so shared exactly
+        t = (self.levels[level] - values[a]) / (values[b] - values[a])
+        xy[~vertex, 0] = self.x[a] + t * (self.x[b] - self.x[a])
+        xy[~vertex, 1] = self.y[a] + t * (self.y[b] - self.y[a])
+        return xy
+
+
+def _clip_band(tri: np.ndarray, tri_values: np.ndarray, crossing_base: np.ndarray,
+               band: int, lo: float, hi: Optional[float]) -> Tuple[np.ndarray, np.ndarray]:
+    """Corner keys (triangles x 9) and validity of each triangle clipped to [lo, hi).
+
+    Walking the (counter-clockwise) edges, each contributes its start vertex
+    if inside the band, then its lo/hi crossings in the order met.
+    """
+    keys, valid = [], []
+    for k in range(3):
+        vp, vq = tri_values[:, k], tri_values[:, (k + 1) % 3]
+        inside = vp >= lo if hi is None else (vp >= lo) & (vp < hi)
+        cross_lo = (vp >= lo) != (vq >= lo)
+        cross_hi = np.zeros_like(cross_lo) if hi is None else (vp >= hi) != (vq >= hi)
+        key_lo = crossing_base[:, k] + band
+        key_hi = crossing_base[:, k] + band + 1
+        rising = vq > vp
+
+        keys += [tri[:, k], np.where(rising, key_lo, key_hi), np.where(rising, key_hi, key_lo)]
+        valid += [inside, np.where(rising, cross_lo, cross_hi), np.where(rising, cross_hi, cross_lo)]
+    return np.stack(keys, axis=1), np.stack(valid, axis=1)
+
+
+def _piece_edges(keys: np.ndarray, valid: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Directed edges around every row's valid corners, closing back to the first."""
+    rows, cols = np.nonzero(valid)
+    corners = keys[rows, cols]
+    if len(corners) == 0:
+        return corners, corners
+
+    # Each corner connects to the next one in its row; the last wraps to the first
+    first = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+    group = np.cumsum(np.r_[True, rows[1:] != rows[:-1]]) - 1
+    following = np.arange(1, len(corners) + 1)
+    last = np.r_[rows[1:] != rows[:-1], True]
+    following[last] = first[group[last]]
+    return corners, corners[following]
+
+
+def _dissolve(frm: np.ndarray, to: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Boundary edges: what is left of each edge once its reverse uses cancel it.
+
+    Counting (rather than dropping every edge with a reverse) keeps the
+    boundary closed around zero-area pieces, e.g. where a vertex lies
+    exactly on a level.
+    """
+    lo, hi = np.minimum(frm, to), np.maximum(frm, to)
+    scale = int(hi.max()) + 1
+    codes, inverse = np.unique(lo * scale + hi, return_inverse=True)
+    net = np.bincount(inverse, weights=np.sign(to - frm), minlength=len(codes)).astype(np.int64)
+
+    repeat = np.abs(net)
+    lo, hi = np.divmod(np.repeat(codes, repeat), scale)
+    forward = np.repeat(net > 0, repeat)
+    return np.where(forward, lo, hi), np.where(forward, hi, lo)
+
+
+def _rings(frm: np.ndarray, to: np.ndarray) -> List[np.ndarray]:
+    """Chain boundary edges into closed rings of corner keys.
+
+    Every corner has as many boundary edges in as out, so pairing the i-th
+    incoming edge (by end key) with the i-th outgoing one (by start key)
+    links all edges into cycles, also where two rings touch at a corner.
+    """
+    incoming = np.argsort(to, kind="stable")
+    outgoing = np.argsort(frm, kind="stable")
+    if not np.array_equal(to[incoming], frm[outgoing]):
+        raise RuntimeError("Band boundary is not closed")
+    following = np.empty(len(frm), dtype=np.int64)
+    following[incoming] = outgoing
+
+    rings = []
+    seen = np.zeros(len(frm), dtype=bool)
+    for start in range(len(frm)):
+        if seen[start]:
+            continue
+        ring = []
+        edge = start
+        while not seen[edge]:
+            seen[edge] = True
+            ring.append(edge)
+            edge = following[edge]
+        rings.append(frm[ring])
+    return rings
+
+
+def _polygons(frm: np.ndarray, to: np.ndarray, points) -> List[Polygon]:
+    """Polygons (outer ring + holes) from dissolved boundary edges."""
+    from geometry import points_in_polygon
+
+    if len(frm) == 0:
+        return []
+
+    outers, holes = [], []
+    for keys in _rings(frm, to):
+        ring = points(keys)
+        # Corners that coincide (a vertex exactly on a level) leave zero-length edges
+        distinct = np.any(ring != np.roll(ring, 1, axis=0), axis=1)
+        ring = ring[distinct]
+        if len(ring) < 3:
+            continue
+        area = _ring_area(ring)
+        if area > 0:
+            outers.append((ring, area))
+        elif area < 0:
+            holes.append(ring)
+
+    polygons = [(ring, []) for ring, _ in outers]
+    boxes = np.array([[*ring.min(axis=0), *ring.max(axis=0)] for ring, _ in outers]).reshape(-1, 4)
+    areas = np.array([area for _, area in outers])
+    for hole in holes:
+        # The smallest outer ring around the hole owns it (islands may nest)
+        hole_box = [*hole.min(axis=0), *hole.max(axis=0)]
+        candidates = np.flatnonzero((boxes[:, 0] <= hole_box[0]) & (boxes[:, 1] <= hole_box[1])
+                                    & (boxes[:, 2] >= hole_box[2]) & (boxes[:, 3] >= hole_box[3]))
+        for i in candidates[np.argsort(areas[candidates])]:
+            # Test a hole corner that is not also a corner of the outer ring
+            outer = outers[i][0]
+            free = ~np.isin(hole[:, 0] + 1j * hole[:, 1], outer[:, 0] + 1j * outer[:, 1])
+            if free.any() and points_in_polygon(hole[free, 0][:1], hole[free, 1][:1], outer)[0]:
+                polygons[i][1].append(hole)
+                break
+    return polygons
+
+
+def _ring_area(ring: np.ndarray) -> float:
+    """Signed shoelace area: positive for counter-clockwise rings."""
+    x, y = ring[:, 0], ring[:, 1]
+    return 0.5 * float(np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y))
+
+
+# =============================================================================
+# Flood layers of a run
+# =============================================================================
+
+EXTENT_FIELDS = {"area_m2": "DOUBLE"}
+BAND_FIELDS = {"band_min": "DOUBLE", "band_max": "DOUBLE", "area_m2": "DOUBLE"}
+
+# Layer suffix -> (attribute fields, one feature per frame)
+VECTOR_LAYERS = {
+    "flood_extent": (EXTENT_FIELDS, False),
+    "depth_bands": (BAND_FIELDS, False),
+    "flood_extent_frames": (EXTENT_FIELDS, True),
+    "depth_bands_frames": (BAND_FIELDS, True),
+}
+
+
+class FloodVectors:
+    """Extent and depth-band polygons of the max depth and of every frame.
+
+    Filled during the single SWW pass of ``sww_products``: ``set_mesh`` once,
+    ``add_frame`` per exported frame and ``add_max`` at the end, then
+    ``write`` stores every layer in one GeoPackage. Layers are named
+    ``<layer_prefix>_<suffix>`` for the suffixes in ``VECTOR_LAYERS``; the
+    frame layers carry a ``time`` attribute for the GeoServer time dimension.
+    """
+
+    def __init__(self, gpkg_path: str, layer_prefix: str, wet_threshold: float,
+                 depth_bands: Sequence[float], start: datetime.datetime, epsg: int = 32645):
+        self.path = gpkg_path
+        self.layer_prefix = layer_prefix
+        self.levels = [wet_threshold] + [float(b) for b in depth_bands]
+        self.start = start
+        self.epsg = epsg
+        self.contours: Optional[MeshContours] = None
+        self.features: Dict[str, List[Tuple[List[Polygon], dict]]] = {suffix: [] for suffix in VECTOR_LAYERS}
+
+    @property
+    def nbytes(self) -> int:
+        return self.contours.nbytes if self.contours else 0
+
+    def set_mesh(self, x: np.ndarray, y: np.ndarray, triangles: np.ndarray) -> None:
+        self.contours = MeshContours(x, y, triangles, self.levels)
+
+    def add_frame(self, time_s: float, depth: np.ndarray) -> None:
+        stamp = self.start + datetime.timedelta(seconds=float(time_s))
+        self._add("flood_extent_frames", "depth_bands_frames", depth,
+                  {"time": f"{stamp:%Y-%m-%dT%H:%M:%S}.000Z"})
+
+    def add_max(self, max_depth: np.ndarray) -> None:
+        self._add("flood_extent", "depth_bands", max_depth, {})
+
+    def _add(self, extent_layer: str, bands_layer: str, depth: np.ndarray, attributes: dict) -> None:
+        extent, bands = self.contours.contour(depth)
+        self.features[extent_layer].append((extent, {"area_m2": _area(extent), **attributes}))
+        for (lo, hi), polygons in zip(self.contours.bands, bands):
+            if polygons:
+                self.features[bands_layer].append((polygons, {
+                    "band_min": float(lo),
+                    "band_max": None if np.isinf(hi) else float(hi),
+                    "area_m2": _area(polygons),
+                    **attributes,
+                }))
+
+    def layer_names(self) -> Dict[str, str]:
+        return {suffix: f"{self.layer_prefix}_{suffix}" for suffix in VECTOR_LAYERS}
+
+    def write(self) -> str:
+        names = self.layer_names()
+        layers = {}
+        for suffix, (fields, per_frame) in VECTOR_LAYERS.items():
+            if per_frame:
+                fields = {**fields, "time": "DATETIME"}
+            layers[names[suffix]] = (fields, self.features[suffix])
+        return write_geopackage(self.path, layers, self.epsg)
+
+
+def _area(polygons: List[Polygon]) -> float:
+    return sum(_ring_area(outer) + sum(_ring_area(hole) for hole in holes) for outer, holes in polygons)
+
+
+# =============================================================================
+# GeoPackage output
+# =============================================================================
+
+GPKG_SCHEMA = """
+CREATE TABLE gpkg_spatial_ref_sys (
+    srs_name TEXT NOT NULL,
+    srs_id INTEGER PRIMARY KEY,
+    organization TEXT NOT NULL,
+    organization_coordsys_id INTEGER NOT NULL,
+    definition TEXT NOT NULL,
+    description TEXT
+);
+CREATE TABLE gpkg_contents (
+    table_name TEXT NOT NULL PRIMARY KEY,
+    data_type TEXT NOT NULL,
+    identifier TEXT UNIQUE,
+    description TEXT DEFAULT '',
+    last_change DATETIME NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ','now')),
+    min_x DOUBLE, min_y DOUBLE, max_x DOUBLE, max_y DOUBLE,
+    srs_id INTEGER REFERENCES gpkg_spatial_ref_sys(srs_id)
+);
+CREATE TABLE gpkg_geometry_columns (
+    table_name TEXT NOT NULL REFERENCES gpkg_contents(table_name),
+    column_name TEXT NOT NULL,
+    geometry_type_name TEXT NOT NULL,
+    srs_id INTEGER NOT NULL REFERENCES gpkg_spatial_ref_sys(srs_id),
+    z TINYINT NOT NULL,
+    m TINYINT NOT NULL,
+    PRIMARY KEY (table_name, column_name)
+);
+"""
+
+WGS84_WKT = (
+    'GEOGCS["WGS 84",DATUM["WGS_1984",SPHEROID["WGS 84",6378137,298.257223563]],'
+    'PRIMEM["Greenwich",0],UNIT["degree",0.0174532925199433],AUTHORITY["EPSG","4326"]]'
+)
+
+
+def utm_wkt(epsg: int) -> str:
+    """OGC WKT of a WGS 84 / UTM zone (EPSG:326xx north, 327xx south)."""
+    zone, southern = epsg % 100, epsg // 100 == 327
+    if epsg // 100 not in (326, 327) or not 1 <= zone <= 60:
+        raise ValueError(f"EPSG:{epsg} is not a WGS 84 / UTM zone")
+    return (
+        f'PROJCS["WGS 84 / UTM zone {zone}{"S" if southern else "N"}",{WGS84_WKT},'
+        'PROJECTION["Transverse_Mercator"],PARAMETER["latitude_of_origin",0],'
+        f'PARAMETER["central_meridian",{6 * zone - 183}],PARAMETER["scale_factor",0.9996],'
+        f'PARAMETER["false_easting",500000],PARAMETER["false_northing",{10000000 if southern else 0}],'
+        f'UNIT["metre",1],AXIS["Easting",EAST],AXIS["Northing",NORTH],AUTHORITY["EPSG","{epsg}"]]'
+    )
+
+
+def write_geopackage(path: str, layers: Dict[str, Tuple[Dict[str, str], List[Tuple[List[Polygon], dict]]]],
+                     epsg: int) -> str:
+    """Write MultiPolygon feature tables (name -> (fields, features)) to a new GeoPackage."""
+    if os.path.exists(path):
+        os.remove(path)
+
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("PRAGMA application_id = 1196444487")  # 'GPKG'
+        conn.execute("PRAGMA user_version = 10200")
+        conn.executescript(GPKG_SCHEMA)
+        srs = [
+            ("Undefined cartesian SRS", -1, "NONE", -1, "undefined", None),
+            ("Undefined geographic SRS", 0, "NONE", 0, "undefined", None),
+            ("WGS 84", 4326, "EPSG", 4326, WGS84_WKT, None),
+        ]
+        if epsg != 4326:
+            srs.append((f"EPSG:{epsg}", epsg, "EPSG", epsg, utm_wkt(epsg), None))
+        conn.executemany("INSERT INTO gpkg_spatial_ref_sys VALUES (?, ?, ?, ?, ?, ?)", srs)
+
+        for name, (fields, features) in layers.items():
+            quoted = [f'"{field}"' for field in fields]
+            columns = "".join(f", {column} {kind}" for column, kind in zip(quoted, fields.values()))
+            conn.execute(f'CREATE TABLE "{name}" (fid INTEGER PRIMARY KEY AUTOINCREMENT, geom MULTIPOLYGON{columns})')
+            insert = (f'INSERT INTO "{name}" (geom{"".join(", " + column for column in quoted)})'
+                      f' VALUES ({", ".join("?" * (len(fields) + 1))})')
+
+            bounds = None
+            rows = []
+            for polygons, attributes in features:
+                blob, box = _gpkg_geometry(polygons, epsg)
+                if box is not None:
+                    bounds = box if bounds is None else (
+                        min(bounds[0], box[0]), min(bounds[1], box[1]),
+                        max(bounds[2], box[2]), max(bounds[3], box[3]),
+                    )
+                rows.append((blob, *(attributes.get(field) for field in fields)))
+            conn.executemany(insert, rows)
+
+            conn.execute(
+                "INSERT INTO gpkg_contents (table_name, data_type, identifier, min_x, min_y, max_x, max_y, srs_id)"
+                " VALUES (?, 'features', ?, ?, ?, ?, ?, ?)",
+                (name, name, *(bounds or (None,) * 4), epsg),
+            )
+            conn.execute(
+                "INSERT INTO gpkg_geometry_columns VALUES (?, 'geom', 'MULTIPOLYGON', ?, 0, 0)",
+                (name, epsg),
+            )
+        conn.commit()
+    finally:
+        conn.close()
+    return path
+
+
+def _gpkg_geometry(polygons: List[Polygon], srs_id: int) -> Tuple[bytes, Optional[Tuple[float, ...]]]:
+    """GeoPackage binary (header + little-endian WKB MultiPolygon) and its bounds."""
+    parts = [struct.pack("<BII", 1, 6, len(polygons))]
+    for outer, holes in polygons:
+        rings = [outer, *holes]
+        parts.append(struct.pack("<BII", 1, 3, len(rings)))
+        for ring in rings:
+            closed = np.vstack([ring, ring[:1]])
+            parts.append(struct.pack("<I", len(closed)))
+            parts.append(np.ascontiguousarray(closed, dtype="<f8").tobytes())
+
+    if not polygons:
+        # Empty geometry: flag bit 4 set, no envelope
+        return struct.pack("<2sBBi", b"GP", 0, 0b10001, srs_id) + b"".join(parts), None
+
+    xy = np.vstack([outer for outer, _ in polygons])
+    box = (float(xy[:, 0].min()), float(xy[:, 1].min()), float(xy[:, 0].max()), float(xy[:, 1].max()))
+    # Flags: little endian, envelope [minx, maxx, miny, maxy]
+    header = struct.pack("<2sBBi4d", b"GP", 0, 0b011, srs_id, box[0], box[2], box[1], box[3])
+    return header + b"".join(parts), box
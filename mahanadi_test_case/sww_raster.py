@@ -0,0 +1,414 @@
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from sww_contours import FloodVectors
+
+# Same conventions as anuga.sww2dem so the published grids are interchangeable
+NODATA = -9999.0
+
+# Derived flood products: name -> (description, needs momentum)
+PRODUCTS = {
+    "max_depth": ("Maximum depth (m)", False),
+    "max_velocity": ("Maximum flow speed (m/s)", True),
+    "max_hazard": ("Maximum depth x velocity (m^2/s)", True),
+    "arrival_time": ("First time depth exceeds the wet threshold (hours)", False),
+    "inundation_duration": ("Total time above the wet threshold (hours)", False),
+}
+
+# Below this depth the speed |uh|/h is numerically meaningless, as in ANUGA
+VELOCITY_MIN_DEPTH = 0.01
+
+
+@dataclass(frozen=True)
+class GridSpec:
+    xllcorner: float
+    yllcorner: float
+    cellsize: float
+    ncols: int
+    nrows: int
+    nodata: float = NODATA
+
+
+def grid_for_mesh(x: np.ndarray, y: np.ndarray, cellsize: float) -> GridSpec:
+    """Grid covering the mesh bounding box, laid out like sww2dem."""
+    xmin, xmax = float(np.min(x)), float(np.max(x))
+    ymin, ymax = float(np.min(y)), float(np.max(y))
+    return GridSpec(
+        xllcorner=xmin,
+        yllcorner=ymin,
+        cellsize=float(cellsize),
+        ncols=int((xmax - xmin) / cellsize) + 1,
+        nrows=int((ymax - ymin) / cellsize) + 1,
+    )
+
+
+def polygon_mask(grid: GridSpec, polygon: Sequence[Tuple[float, float]],
+                 rows_per_chunk: int = 512) -> np.ndarray:
+    """Flat (north row first) boolean mask of the grid points inside ``polygon``."""
+    from geometry import scanline_crossings
+
+    mask = np.zeros(grid.nrows * grid.ncols, dtype=bool)
+    for r0 in range(0, grid.nrows, rows_per_chunk):
+        rows = np.arange(r0, min(r0 + rows_per_chunk, grid.nrows))
+        y = grid.yllcorner + (grid.nrows - 1 - rows) * grid.cellsize
+
+        # Mark the start/end column of every inside span, then cumsum along rows
+        edges = np.zeros((len(rows), grid.ncols + 1), dtype=np.int8)
+        for i, xs in enumerate(scanline_crossings(polygon, y)):
+            cols = np.ceil((xs - grid.xllcorner) / grid.cellsize).astype(np.int64)
+            cols = np.clip(cols, 0, grid.ncols)
+            np.add.at(edges[i], cols[0::2], 1)
+            np.add.at(edges[i], cols[1::2], -1)
+
+        inside = np.cumsum(edges[:, :-1], axis=1) > 0
+        mask[r0 * grid.ncols:(r0 + len(rows)) * grid.ncols] = inside.ravel()
+    return mask
+
+
+# =============================================================================
+# Triangle -> grid interpolation
+# =============================================================================
+
+class GridInterpolator:
+    """Linear interpolation from mesh vertices onto the points of a grid.
+
+    Every grid point inside the mesh is assigned its containing triangle and
+    barycentric weights once; each frame is then a gather + weighted sum.
+    Triangles are binned onto the grid through their bounding boxes, so only
+    nearby points are ever tested. Points outside ``mask`` (e.g. the AOI) are
+    skipped before any barycentric work and stay NODATA.
+    """
+
+    def __init__(self, x: np.ndarray, y: np.ndarray, triangles: np.ndarray,
+                 grid: GridSpec, chunk_size: int = 20_000, max_candidates: int = 25_000,
+                 mask: Optional[np.ndarray] = None):
+        self.grid = grid
+
+        # Points on shared edges fall in several triangles; keep the first so
+        # the pieces below never hold duplicates. Masked-out points start taken.
+        taken = np.zeros(grid.nrows * grid.ncols, dtype=bool) if mask is None else ~mask
+        cells, verts, weights = [], [], []
+        for start in range(0, len(triangles), chunk_size):
+            tri = triangles[start:start + chunk_size]
+            jmin, kmin, nj, nk = self._bounding_boxes(x, y, tri)
+
+            # Split the chunk so no piece expands to more than ~max_candidates
+            # grid points; this bounds the temporaries whatever the mesh/grid ratio
+            ends = np.cumsum(nj * nk)
+            cuts = np.searchsorted(ends, np.arange(max_candidates, ends[-1] if len(ends) else 0, max_candidates))
+            for piece in np.split(np.arange(len(tri)), np.unique(cuts)):
+                if len(piece) == 0:
+                    continue
+                c, v, w = self._locate(x, y, tri[piece], jmin[piece], kmin[piece], nj[piece], nk[piece], taken)
+                c, first = np.unique(c, return_index=True)
+                new = ~taken[c]
+                taken[c[new]] = True
+                cells.append(c[new])
+                verts.append(v[first[new]])
+                weights.append(w[first[new]])
+
+        del taken
+        self.cells = np.concatenate(cells) if cells else np.zeros(0, dtype=np.int64)
+        self.verts = np.concatenate(verts) if verts else np.zeros((0, 3), dtype=np.int64)
+        self.weights = np.concatenate(weights) if weights else np.zeros((0, 3))
+
+    def _bounding_boxes(self, x, y, tri):
+        """Grid index range of each triangle's bounding box (k counts rows from the south)."""
+        g = self.grid
+        tx, ty = x[tri], y[tri]
+        jmin = np.ceil((tx.min(axis=1) - g.xllcorner) / g.cellsize).astype(np.int64)
+        jmax = np.floor((tx.max(axis=1) - g.xllcorner) / g.cellsize).astype(np.int64)
+        kmin = np.ceil((ty.min(axis=1) - g.yllcorner) / g.cellsize).astype(np.int64)
+        kmax = np.floor((ty.max(axis=1) - g.yllcorner) / g.cellsize).astype(np.int64)
+        jmin, jmax = np.maximum(jmin, 0), np.minimum(jmax, g.ncols - 1)
+        kmin, kmax = np.maximum(kmin, 0), np.minimum(kmax, g.nrows - 1)
+        return jmin, kmin, np.maximum(jmax - jmin + 1, 0), np.maximum(kmax - kmin + 1, 0)
+
+    def _locate(self, x, y, tri, jmin, kmin, nj, nk, taken):
+        g = self.grid
+        ax, bx, cx = x[tri[:, 0]], x[tri[:, 1]], x[tri[:, 2]]
+        ay, by, cy = y[tri[:, 0]], y[tri[:, 1]], y[tri[:, 2]]
+
+        # Barycentric coefficients per triangle: l0 = a0*(px-cx) + b0*(py-cy), ...
+        denom = (by - cy) * (ax - cx) + (cx - bx) * (ay - cy)
+        valid = denom != 0
+        inv = np.where(valid, 1.0 / np.where(valid, denom, 1.0), 0.0)
+        a0, b0 = (by - cy) * inv, (cx - bx) * inv
+        a1, b1 = (cy - ay) * inv, (ax - cx) * inv
+        count = np.where(valid, nj * nk, 0)
+
+        # Expand every triangle into the grid points of its bounding box
+        owner = np.repeat(np.arange(len(tri)), count)
+        offset = np.arange(int(count.sum())) - np.repeat(np.cumsum(count) - count, count)
+        jj = jmin[owner] + offset % nj[owner]
+        kk = kmin[owner] + offset // nj[owner]
+        del offset
+
+        # Drop points outside the mask or already assigned by an earlier piece
+        cells = (g.nrows - 1 - kk) * g.ncols + jj
+        todo = ~taken[cells]
+        owner, jj, kk, cells = owner[todo], jj[todo], kk[todo], cells[todo]
+
+        dx = g.xllcorner + jj * g.cellsize - cx[owner]
+        dy = g.yllcorner + kk * g.cellsize - cy[owner]
+        l0 = a0[owner] * dx + b0[owner] * dy
+        l1 = a1[owner] * dx + b1[owner] * dy
+        del dx, dy
+        l2 = 1.0 - l0 - l1
+
+        eps = -1.0e-12
+        inside = (l0 >= eps) & (l1 >= eps) & (l2 >= eps)
+
+        cells = cells[inside]
+        verts = tri[owner[inside]]
+        weights = np.column_stack((l0[inside], l1[inside], l2[inside]))
+        return cells, verts, weights
+
+    @property
+    def nbytes(self) -> int:
+        return self.cells.nbytes + self.verts.nbytes + self.weights.nbytes
+
+    def interpolate(self, values: np.ndarray) -> np.ndarray:
+        """(nrows, ncols) grid, north row first, NODATA outside the mesh."""
+        g = self.grid
+        out = np.full(g.nrows * g.ncols, g.nodata, dtype=float)
+        out[self.cells] = np.einsum("ij,ij->i", self.weights, np.asarray(values, dtype=float)[self.verts])
+        return out.reshape(g.nrows, g.ncols)
+
+
+# Interpolators keyed by SWW file, grid and AOI, so repeated exports of the
+# same run (frames, products) locate the grid points in the mesh only once
+_INTERPOLATOR_CACHE: Dict[tuple, GridInterpolator] = {}
+_INTERPOLATOR_CACHE_SIZE = 4
+
+
+def clear_interpolator_cache() -> None:
+    _INTERPOLATOR_CACHE.clear()
+
+
+def cached_interpolator(sww_path: str, x: np.ndarray, y: np.ndarray, triangles: np.ndarray,
+                        cellsize: float,
+                        aoi_polygon: Optional[Sequence[Tuple[float, float]]] = None) -> GridInterpolator:
+    """GridInterpolator for the mesh of ``sww_path``, reused while the file is unchanged."""
+    grid = grid_for_mesh(x, y, cellsize)
+    polygon = tuple(map(tuple, aoi_polygon)) if aoi_polygon is not None else None
+    key = (os.path.realpath(sww_path), os.stat(sww_path).st_mtime_ns, grid, polygon)
+
+    interpolator = _INTERPOLATOR_CACHE.get(key)
+    if interpolator is None:
+        mask = polygon_mask(grid, polygon) if polygon is not None else None
+        interpolator = GridInterpolator(x, y, triangles, grid, mask=mask)
+        if len(_INTERPOLATOR_CACHE) >= _INTERPOLATOR_CACHE_SIZE:
+            _INTERPOLATOR_CACHE.pop(next(iter(_INTERPOLATOR_CACHE)))
+        _INTERPOLATOR_CACHE[key] = interpolator
+    return interpolator
+
+
+# =============================================================================
+# Fused products
+# =============================================================================
+
+class FloodProducts:
+    """Per-vertex running reductions for all requested products.
+
+    ``update`` takes a ``(timesteps x points)`` slab of every variable at
+    once and folds it into the accumulators with whole-array operations, so
+    the SWW is traversed once whatever the number of products.
+    """
+
+    def __init__(self, products: Iterable[str], num_points: int, wet_threshold: float):
+        self.products = tuple(products)
+        unknown = set(self.products) - set(PRODUCTS)
+        if unknown:
+            raise ValueError(f"Unknown products: {sorted(unknown)}")
+
+        self.wet_threshold = wet_threshold
+        self.needs_momentum = any(PRODUCTS[p][1] for p in self.products)
+
+        self.values: Dict[str, np.ndarray] = {}
+        for name in self.products:
+            fill = np.nan if name == "arrival_time" else (0.0 if name == "inundation_duration" else -np.inf)
+            self.values[name] = np.full(num_points, fill)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(v.nbytes for v in self.values.values())
+
+    def update(self, times_s: np.ndarray, dt_s: np.ndarray, depth: np.ndarray,
+               xmomentum: Optional[np.ndarray] = None, ymomentum: Optional[np.ndarray] = None,
+               points: slice = slice(None)) -> None:
+        """Fold a slab in: ``depth``/momentum are (len(times_s), n) for ``points``.
+
+        ``dt_s`` is the time since the previous stored timestep (0 for the first).
+        """
+        v = {name: values[points] for name, values in self.values.items()}
+
+        if "max_depth" in v:
+            np.maximum(v["max_depth"], depth.max(axis=0), out=v["max_depth"])
+
+        if self.needs_momentum:
+            flowing = depth > VELOCITY_MIN_DEPTH
+            momentum = np.hypot(xmomentum, ymomentum)
+            if "max_velocity" in v:
+                speed = np.where(flowing, momentum / np.where(flowing, depth, 1.0), 0.0)
+                np.maximum(v["max_velocity"], speed.max(axis=0), out=v["max_velocity"])
+            if "max_hazard" in v:
+                # depth * speed is the unit discharge |uh|
+                hazard = np.where(flowing, momentum, 0.0)
+                np.maximum(v["max_hazard"], hazard.max(axis=0), out=v["max_hazard"])
+
+        if "arrival_time" in v or "inundation_duration" in v:
+            wet = depth >= self.wet_threshold
+
+            if "arrival_time" in v:
+                ever_wet = wet.any(axis=0)
+                first = np.asarray(times_s)[wet.argmax(axis=0)] / 3600.0
+                fill = ever_wet & np.isnan(v["arrival_time"])
+                v["arrival_time"][fill] = first[fill]
+
+            if "inundation_duration" in v:
+                v["inundation_duration"] += (wet * np.asarray(dt_s)[:, np.newaxis]).sum(axis=0) / 3600.0
+
+
+def sww_products(sww_path: str, outputs: Dict[str, str], cellsize: float = 10.0,
+                 wet_threshold: float = 0.05, frames: Optional[Dict[int, str]] = None,
+                 frame_cellsize: Optional[float] = None,
+                 memory_budget_mb: Optional[float] = None,
+                 aoi_polygon: Optional[Sequence[Tuple[float, float]]] = None,
+                 vectors: Optional["FloodVectors"] = None) -> Dict[str, str]:
+    """Write every product in ``outputs`` (name -> .asc path) in one SWW pass.
+
+    ``frames`` maps timestep index -> .asc path for depth snapshots written
+    during the same pass. Cells never wet get NODATA in ``arrival_time``.
+    Time-varying data is streamed in slabs that fit ``memory_budget_mb``.
+    With ``aoi_polygon`` only grid cells inside it are evaluated.
+    ``vectors`` (sww_contours.FloodVectors) is given the mesh, every frame
+    and the max depth, contoured on the mesh itself; it is written last.
+    """
+    from sww_reader import SwwReader
+
+    frames = frames or {}
+    frame_cellsize = frame_cellsize or cellsize
+
+    with SwwReader(sww_path, memory_budget_mb) as reader:
+        x, y, triangles = reader.mesh()
+        times = reader.times
+        dt = np.diff(times, prepend=times[:1])
+        prj = reader.prj_text()
+
+        interpolator = cached_interpolator(sww_path, x, y, triangles, cellsize, aoi_polygon)
+        grid = interpolator.grid
+        frame_interpolator = interpolator
+        if frames and frame_cellsize != cellsize:
+            frame_interpolator = cached_interpolator(sww_path, x, y, triangles, frame_cellsize, aoi_polygon)
+        reductions = list(outputs)
+        if vectors is not None and "max_depth" not in reductions:
+            reductions.append("max_depth")
+        accumulator = FloodProducts(reductions, len(x), wet_threshold)
+        if vectors is not None:
+            vectors.set_mesh(x, y, triangles)
+
+        names = ["stage", "elevation"]
+        if accumulator.needs_momentum:
+            names += ["xmomentum", "ymomentum"]
+
+        # A frame split across point slabs is assembled here before writing
+        frame_buffer = np.zeros(reader.num_points) if frames else None
+        resident = (x.nbytes + y.nbytes + triangles.nbytes + accumulator.nbytes + interpolator.nbytes
+                    + (frame_interpolator.nbytes if frame_interpolator is not interpolator else 0)
+                    + (frame_buffer.nbytes if frames else 0)
+                    + (vectors.nbytes if vectors is not None else 0))
+
+        for timesteps, points, data in reader.blocks(names, resident):
+            depth = data["stage"] - data["elevation"]
+            accumulator.update(
+                times[timesteps], dt[timesteps], depth,
+                data.get("xmomentum"), data.get("ymomentum"), points,
+            )
+
+            for row, t in enumerate(range(timesteps.start, timesteps.stop)):
+                if t not in frames:
+                    continue
+                frame_buffer[points] = depth[row]
+                if points.stop == reader.num_points:
+                    write_asc(frames[t], frame_interpolator.grid, frame_interpolator.interpolate(frame_buffer), prj)
+                    if vectors is not None:
+                        vectors.add_frame(times[t], frame_buffer)
+
+    # Only the accumulators and weights are needed from here on
+    del x, y, triangles, frame_buffer
+    if vectors is not None:
+        vectors.add_max(accumulator.values["max_depth"])
+        vectors.write()
+    for name, path in outputs.items():
+        values = interpolator.interpolate(accumulator.values[name])
+        values[np.isnan(values)] = grid.nodata
+        write_asc(path, grid, values, prj)
+
+    return dict(outputs)
+
+
+# =============================================================================
+# Output
+# =============================================================================
+
+def write_asc(asc_path: str, grid: GridSpec, values: np.ndarray, prj: str = None) -> str:
+    with open(asc_path, "w", encoding="utf-8") as f:
+        f.write(f"ncols {grid.ncols}\n")
+        f.write(f"nrows {grid.nrows}\n")
+        f.write(f"xllcorner {grid.xllcorner:.6f}\n")
+        f.write(f"yllcorner {grid.yllcorner:.6f}\n")
+        f.write(f"cellsize {grid.cellsize:g}\n")
+        f.write(f"NODATA_value {grid.nodata:g}\n")
+        np.savetxt(f, values, fmt="%.6g")
+
+    if prj:
+        with open(os.path.splitext(asc_path)[0] + ".prj", "w", encoding="utf-8") as f:
+            f.write(prj)
+    return asc_path
+
+
+def sww_to_asc(sww_path: str, asc_path: str, quantity: str = "depth",
+               reduction: Union[Callable, int] = max, cellsize: float = 10.0,
+               memory_budget_mb: Optional[float] = None,
+               aoi_polygon: Optional[Sequence[Tuple[float, float]]] = None) -> str:
+    """NumPy/netCDF4 replacement for the ``anuga.sww2dem`` calls in the bridge.
+
+    ``quantity`` is 'depth', 'stage' or 'elevation'; ``reduction`` is ``max``
+    (maximum over all timesteps, per vertex) or a timestep index. Cells
+    outside ``aoi_polygon`` are written as NODATA.
+    """
+    from sww_reader import SwwReader
+
+    if quantity not in ("depth", "stage", "elevation"):
+        raise ValueError(f"Unsupported quantity '{quantity}'")
+    if reduction is not max and not isinstance(reduction, (int, np.integer)):
+        raise ValueError("reduction must be max or a timestep index")
+
+    with SwwReader(sww_path, memory_budget_mb) as reader:
+        x, y, triangles = reader.mesh()
+        prj = reader.prj_text()
+        interpolator = cached_interpolator(sww_path, x, y, triangles, cellsize, aoi_polygon)
+        grid = interpolator.grid
+
+        names = ["elevation"] if quantity == "elevation" else ["stage", "elevation"]
+        values = np.full(reader.num_points, -np.inf)
+        resident = x.nbytes + y.nbytes + triangles.nbytes + interpolator.nbytes + values.nbytes
+
+        selected = slice(None) if reduction is max else slice(int(reduction), int(reduction) + 1)
+        for _, points, data in reader.blocks(names, resident, selected):
+            if quantity == "elevation":
+                block = data["elevation"]
+            elif quantity == "stage":
+                block = data["stage"]
+            else:
+                block = data["stage"] - data["elevation"]
+            np.maximum(values[points], block.max(axis=0), out=values[points])
+
+    return write_asc(asc_path, grid, interpolator.interpolate(values), prj)
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Working arrays held per (timestep, point) on top of the variables read:
+# depth, wet mask, speed, momentum magnitude and the np.where intermediates
+# (measured with tracemalloc on benchmarks/check_sww_budget.py).
+_TEMPORARIES_PER_VALUE = 8
+_BYTES_PER_VALUE = 8
+_MIN_POINT_BLOCK = 1024
+
+
+class SwwReader:
+    """Chunked, read-only access to an SWW file within a memory budget.
+
+    Time-varying variables are never loaded whole: ``blocks`` yields
+    ``(timestep x point)`` slabs sized so that the slab plus its working
+    arrays fit in what is left of the budget after ``resident_bytes``
+    (mesh, accumulators, interpolation weights) have been accounted for.
+    """
+
+    def __init__(self, sww_path: str, memory_budget_mb: Optional[float] = None):
+        import netCDF4
+
+        self.path = sww_path
+        self.nc = netCDF4.Dataset(sww_path, "r")
+        # Plain ndarrays: masked arrays double the footprint of every slab
+        self.nc.set_auto_mask(False)
+
+        self.num_points = len(self.nc.dimensions["number_of_points"])
+        self.num_timesteps = len(self.nc.variables["time"])
+        self.budget_bytes = None if memory_budget_mb is None else int(memory_budget_mb * 1024 * 1024)
+
+    def close(self) -> None:
+        self.nc.close()
+
+    def __enter__(self) -> "SwwReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # -------------------------------------------------------------------------
+    # Static data
+    # -------------------------------------------------------------------------
+
+    @property
+    def times(self) -> np.ndarray:
+        return np.asarray(self.nc.variables["time"][:], dtype=float)
+
+    @property
+    def static_elevation(self) -> bool:
+        return self.nc.variables["elevation"].ndim == 1
+
+    def mesh(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Absolute vertex coordinates and triangle connectivity."""
+        xll = float(getattr(self.nc, "xllcorner", 0.0))
+        yll = float(getattr(self.nc, "yllcorner", 0.0))
+        x = np.asarray(self.nc.variables["x"][:], dtype=float) + xll
+        y = np.asarray(self.nc.variables["y"][:], dtype=float) + yll
+        triangles = np.asarray(self.nc.variables["volumes"][:], dtype=np.int64)
+        return x, y, triangles
+
+    def prj_text(self) -> str:
+        zone = int(getattr(self.nc, "zone", -1))
+        false_easting = int(getattr(self.nc, "false_easting", 500000))
+        # The false northing attribute defaults to the southern value even for
+        # northern zones, so only apply it when the SWW says it is southern
+        southern = str(getattr(self.nc, "hemisphere", "")).lower() == "southern"
+        false_northing = int(getattr(self.nc, "false_northing", 10000000)) if southern else 0
+        return (
+            "Projection    UTM\n"
+            f"Zone          {zone}\n"
+            "Datum         WGS84\n"
+            "Zunits        NO\n"
+            "Units         METERS\n"
+            "Spheroid      WGS84\n"
+            f"Xshift        {false_easting}\n"
+            f"Yshift        {false_northing}\n"
+            "Parameters\n"
+        )
+
+    # -------------------------------------------------------------------------
+    # Time-varying data
+    # -------------------------------------------------------------------------
+
+    def read(self, name: str, timesteps: slice = slice(None), points: slice = slice(None)) -> np.ndarray:
+        """``name`` over a timestep/point range as float64 (static variables ignore ``timesteps``)."""
+        var = self.nc.variables[name]
+        if var.ndim == 1:
+            return np.asarray(var[points], dtype=float)
+        return np.asarray(var[timesteps, points], dtype=float)
+
+    def plan(self, num_variables: int, resident_bytes: int = 0) -> Tuple[int, int]:
+        """(timesteps per block, points per block) for reading ``num_variables`` together."""
+        if self.budget_bytes is None:
+            return self.num_timesteps, self.num_points
+
+        per_value = (num_variables + _TEMPORARIES_PER_VALUE) * _BYTES_PER_VALUE
+        available = self.budget_bytes - resident_bytes
+        if available < per_value * _MIN_POINT_BLOCK:
+            print(
+                f"Warning: memory budget {self.budget_bytes / 2**20:.0f} MB leaves no room for "
+                f"streaming after {resident_bytes / 2**20:.0f} MB of resident data; "
+                f"using minimal chunks"
+            )
+            return 1, min(self.num_points, _MIN_POINT_BLOCK)
+
+        row_bytes = per_value * self.num_points
+        if available >= row_bytes:
+            return max(1, min(self.num_timesteps, available // row_bytes)), self.num_points
+
+        # A single timestep does not fit: split it across points
+        return 1, max(_MIN_POINT_BLOCK, available // per_value)
+
+    def blocks(self, names: Sequence[str], resident_bytes: int = 0, timesteps: slice = slice(None)
+               ) -> Iterator[Tuple[slice, slice, Dict[str, np.ndarray]]]:
+        """Yield ``(timesteps, points, {name: values})`` slabs in time order.
+
+        Each point sees its timesteps in increasing order, so running
+        reductions (first arrival, duration) can be updated slab by slab.
+        """
+        t_block, p_block = self.plan(len(names), resident_bytes)
+        t_start, t_stop, _ = timesteps.indices(self.num_timesteps)
+
+        for t0 in range(t_start, t_stop, t_block):
+            timesteps = slice(t0, min(t0 + t_block, t_stop))
+            for p0 in range(0, self.num_points, p_block):
+                points = slice(p0, min(p0 + p_block, self.num_points))
+                data = {}
+                for name in names:
+                    values = self.read(name, timesteps, points)
+                    if values.ndim == 1:
+                        # Static elevation broadcasts against the time axis
+                        values = values[np.newaxis, :]
+                    data[name] = values
+                yield timesteps, points, data